@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark the figure generators.
+
+Each generator runs in its own fresh interpreter so import cost and peak
+memory are measured cleanly:
+
+- matplotlib (generate_diagrams.py): import, then per figure setup, draw,
+  tight_layout and savefig;
+- PIL (generate_diagrams_pil.py): import, then per figure draw
+  (supersampled), resize and save;
+- Graphviz (generate_seagap_diagram.py): per DOT file a cold layout and
+  the encode from that layout.
+
+Every figure is rendered ``--repeat`` times into a scratch directory (the
+build caches and the shared artifact store are bypassed) and the median
+of each phase is kept, along with the output size and the process's peak
+RSS after the figure.
+
+Results are JSON. ``--save FILE`` stores them as a baseline; ``--compare
+FILE`` checks the new run against one and exits 1 if any figure's total
+time grew by more than ``--threshold`` (and by more than ``--min-delta``
+seconds, so timer noise on fast figures does not fail the run). The
+baseline is read before the run, so both options may name the same file
+to compare each run with the one before it.
+
+Usage: bench_figures.py [--repeat N] [--generator NAME] [--save FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+GENERATORS = ('matplotlib', 'pil', 'graphviz')
+BENCH_VERSION = 1
+# The shared artifact store is off in the workers: a layout or output
+# stored by an earlier run (or checkout) would turn the cold case into a
+# store hit
+WORKER_ENV = {**os.environ, 'ARTIFACT_STORE': ''}
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far, in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # bytes on macOS
+
+
+def summarize(samples):
+    """Median of each phase over repeated {phase: seconds} samples, in phase order."""
+    phases = dict.fromkeys(phase for sample in samples for phase in sample)
+    medians = {phase: statistics.median(s.get(phase, 0.0) for s in samples) for phase in phases}
+    return {'total': sum(medians.values()), 'phases': medians}
+
+
+def bench_matplotlib(repeat, out_dir):
+    start = time.perf_counter()
+    import generate_diagrams
+    generate_diagrams.load_matplotlib()
+    import_seconds = time.perf_counter() - start
+
+    import figure_scenes
+    figures = {}
+    for name, _ in generate_diagrams.FIGURES:
+        path = out_dir / f"{name}.png"
+        samples = []
+        for _ in range(repeat):
+            timings = {}
+            generate_diagrams.render_scene(figure_scenes.SCENES[name], str(path), timings=timings)
+            samples.append(timings)
+        figures[name] = {**summarize(samples), 'bytes': path.stat().st_size, 'peak_rss_kb': peak_rss_kb()}
+    return import_seconds, figures
+
+
+def bench_pil(repeat, out_dir):
+    start = time.perf_counter()
+    import generate_diagrams_pil as pil
+    import_seconds = time.perf_counter() - start
+
+    import figure_scenes
+    samples = {name: [] for name, _ in pil.FIGURES}
+    for _ in range(repeat):
+        for name, _ in pil.FIGURES:
+            timings = {}
+            pil.render_scene(figure_scenes.SCENES[name], str(out_dir / f"{name}.png"), timings=timings)
+            samples[name].append(timings)
+
+    figures = {name: {**summarize(s), 'bytes': (out_dir / f"{name}.png").stat().st_size,
+                      'peak_rss_kb': peak_rss_kb()}
+               for name, s in samples.items()}
+    return import_seconds, figures
+
+
+def bench_graphviz(repeat, out_dir):
+    start = time.perf_counter()
+    import graphviz_cache
+    from generate_seagap_diagram import discover
+    import_seconds = time.perf_counter() - start
+    if graphviz_cache.graphviz_version() is None:
+        raise RuntimeError("Graphviz 'dot' executable not found")
+
+    figures = {}
+    for dot in discover():
+        source = dot.read_text()
+        samples = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as cache:
+                cache = Path(cache)
+                t0 = time.perf_counter()
+                graphviz_cache.layout(source, cache_dir=cache)
+                t1 = time.perf_counter()
+                data = graphviz_cache.render(source, 'png', cache_dir=cache)
+                samples.append({'layout': t1 - t0, 'render': time.perf_counter() - t1})
+        (out_dir / f"{dot.stem}.png").write_bytes(data)
+        figures[dot.stem] = {**summarize(samples), 'bytes': len(data), 'peak_rss_kb': peak_rss_kb()}
+    return import_seconds, figures
+
+
+BENCHES = {'matplotlib': bench_matplotlib, 'pil': bench_pil, 'graphviz': bench_graphviz}
+
+
+def worker(generator, repeat):
+    """Benchmark one generator in this process and print its result as JSON."""
+    sys.path.insert(0, str(SCRIPT_DIR))
+    with tempfile.TemporaryDirectory() as out_dir:
+        try:
+            import_seconds, figures = BENCHES[generator](repeat, Path(out_dir))
+        except (ImportError, RuntimeError) as e:
+            result = {'skipped': str(e)}
+        except SystemExit:
+            # generate_seagap_diagram exits when the graphviz package is missing
+            result = {'skipped': 'graphviz Python package not installed'}
+        else:
+            result = {'import': import_seconds, 'peak_rss_kb': peak_rss_kb(), 'figures': figures}
+    json.dump(result, sys.stdout)
+
+
+def run(generators, repeat):
+    """Benchmark each generator in a fresh interpreter; return the full result."""
+    results = {
+        'version': BENCH_VERSION,
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'generators': {},
+    }
+    for generator in generators:
+        proc = subprocess.run([sys.executable, __file__, '--worker', generator, '--repeat', str(repeat)],
+                              cwd=SCRIPT_DIR, capture_output=True, text=True, env=WORKER_ENV)
+        if proc.returncode != 0:
+            results['generators'][generator] = {'skipped': (proc.stderr.strip().splitlines() or ['failed'])[-1]}
+            continue
+        results['generators'][generator] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return results
+
+
+def print_results(results):
+    for generator, result in results['generators'].items():
+        print()
+        if 'skipped' in result:
+            print(f"{generator}: skipped ({result['skipped']})")
+            continue
+        print(f"{generator}: import {result['import'] * 1000:.0f} ms, "
+              f"peak RSS {result['peak_rss_kb'] / 1024:.0f} MiB")
+        for name, figure in result['figures'].items():
+            phases = ', '.join(f"{p} {s * 1000:.0f}" for p, s in figure['phases'].items())
+            print(f"  {name:<30} {figure['total'] * 1000:7.0f} ms  {figure['bytes'] / 1024:6.0f} KiB  ({phases})")
+
+
+def compare(baseline, current, threshold, min_delta):
+    """Return a list of regression messages (empty if none)."""
+    regressions = []
+    for generator, result in current['generators'].items():
+        base = baseline['generators'].get(generator, {})
+        if 'figures' not in result or 'figures' not in base:
+            continue
+        for name, figure in result['figures'].items():
+            old = base['figures'].get(name)
+            if old is None:
+                continue
+            delta = figure['total'] - old['total']
+            if delta > min_delta and delta > threshold * old['total']:
+                worst = max(figure['phases'], key=lambda p: figure['phases'][p] - old['phases'].get(p, 0.0))
+                regressions.append(f"{generator}/{name}: {old['total'] * 1000:.0f} ms → "
+                                   f"{figure['total'] * 1000:.0f} ms (+{delta / old['total']:.0%}, "
+                                   f"mostly {worst})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the figure generators.")
+    parser.add_argument('--generator', action='append', choices=GENERATORS,
+                        help='generator to benchmark; repeatable (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='renders per figure (default: 3)')
+    parser.add_argument('--save', type=Path, help='write the results to this JSON file')
+    parser.add_argument('--compare', type=Path, metavar='BASELINE',
+                        help='fail if a figure is slower than in this baseline JSON')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative slowdown per figure (default: 0.2)')
+    parser.add_argument('--min-delta', type=float, default=0.01,
+                        help='ignore slowdowns smaller than this many seconds (default: 0.01)')
+    parser.add_argument('--worker', choices=GENERATORS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker, args.repeat)
+        return 0
+
+    # Read before the run, so --compare may name the file --save overwrites
+    # (the previous run) without comparing the new results with themselves
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    results = run(args.generator or GENERATORS, max(1, args.repeat))
+    print_results(results)
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(results, indent=2) + '\n')
+        print(f"\nSaved results to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold, args.min_delta)
+        print()
+        for message in regressions:
+            print(f"✗ {message}")
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Distribute master figures to the paper figures/ directories.
+
+Driven by figures-source/distribution.json, which maps each source file to
+a target file name and the documents that use it. A target whose content
+hash already matches its source is left untouched, so unchanged figures
+keep their mtimes and do not trigger downstream rebuilds; so is a PNG
+target that differs in bytes but not visibly (image_diff.py), unless
+``--exact`` is given. Changed targets
+are placed by reflink, hardlink or atomic copy, whichever the filesystem
+supports first.
+
+The run can write a machine-readable change list (``--changes``) naming
+every target that changed and the documents that need rebuilding.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from fanout import METHODS, place, same_image
+from figure_cache import file_digest
+from render_pool import span
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+MAPPING = REPO_ROOT / "figures-source" / "distribution.json"
+
+
+def load_mapping(path=MAPPING):
+    """Load the distribution mapping and check that it is self-consistent."""
+    with open(path) as f:
+        mapping = json.load(f)
+    documents = mapping['documents']
+    for figure in mapping['figures']:
+        unknown = set(figure['documents']) - set(documents)
+        if unknown:
+            raise ValueError(f"{path}: {figure['source']} names unknown document(s) "
+                             f"{', '.join(sorted(unknown))}")
+    return mapping
+
+
+def distribute(mapping, root=REPO_ROOT, methods=METHODS, dry_run=False, exact=False):
+    """
+    Bring every target in ``mapping`` up to date with its source.
+
+    Returns a change list: {'changed': [...], 'unchanged': [...],
+    'missing': [...], 'documents': [...]} where 'documents' lists the
+    documents whose figures changed. Unless ``exact``, a PNG target that
+    looks the same as its source is unchanged, with action
+    'visually-unchanged'.
+    """
+    changes = {'changed': [], 'unchanged': [], 'missing': [], 'documents': []}
+    affected = set()
+
+    for figure in mapping['figures']:
+        source = root / figure['source']
+        source_hash = file_digest(source)
+        if source_hash is None:
+            changes['missing'].append(figure['source'])
+            continue
+
+        for document in figure['documents']:
+            target = root / mapping['documents'][document] / figure['target']
+            entry = {
+                'source': figure['source'],
+                'target': str(target.relative_to(root)),
+                'document': document,
+                'sha256': source_hash,
+            }
+            if file_digest(target) == source_hash:
+                changes['unchanged'].append(entry)
+                continue
+            if (not exact and source.suffix == '.png' and target.exists()
+                    and same_image(source, target)):
+                entry['action'] = 'visually-unchanged'
+                changes['unchanged'].append(entry)
+                continue
+
+            if dry_run:
+                entry['action'] = 'would-update'
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                entry['action'] = place(str(source), str(target), methods)
+            changes['changed'].append(entry)
+            affected.add(document)
+
+    changes['documents'] = sorted(affected)
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distribute master figures to all papers.")
+    parser.add_argument('--mapping', type=Path, default=MAPPING,
+                        help='distribution mapping (default: figures-source/distribution.json)')
+    parser.add_argument('--method', action='append', choices=METHODS,
+                        help='placement method to try, in order; repeatable '
+                             '(default: reflink, then link, then copy)')
+    parser.add_argument('--changes', type=Path,
+                        help="write the change list as JSON to this file ('-' for stdout)")
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='report what would change without touching any file')
+    parser.add_argument('--exact', action='store_true',
+                        help='update every target whose bytes differ, even if it looks the same')
+    args = parser.parse_args(argv)
+
+    with span('distribute') as record:
+        changes = distribute(load_mapping(args.mapping), methods=tuple(args.method or METHODS),
+                             dry_run=args.dry_run, exact=args.exact)
+        record['cache'] = 'miss' if changes['changed'] else 'hit'
+        record['bytes_out'] = sum((REPO_ROOT / entry['target']).stat().st_size
+                                  for entry in changes['changed'] if not args.dry_run)
+
+    if args.changes:
+        text = json.dumps(changes, indent=2) + '\n'
+        if str(args.changes) == '-':
+            sys.stdout.write(text)
+        else:
+            args.changes.parent.mkdir(parents=True, exist_ok=True)
+            args.changes.write_text(text)
+
+    if str(args.changes) != '-':
+        for source in changes['missing']:
+            print(f"⚠ Warning: {source} not found")
+        for entry in changes['changed']:
+            print(f"✓ {entry['source']} → {entry['target']} ({entry['action']})")
+        print(f"{len(changes['changed'])} updated, {len(changes['unchanged'])} unchanged")
+        if changes['documents']:
+            print(f"Documents to rebuild: {', '.join(changes['documents'])}")
+
+    return 1 if changes['missing'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
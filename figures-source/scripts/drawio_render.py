@@ -0,0 +1,808 @@
+#!/usr/bin/env python3
+"""
+Headless renderer for the draw.io sources in figures-source/drawio/.
+
+Each ``.drawio`` file is an ``<mxfile>`` with one ``<diagram>`` per page.
+A page holds its ``<mxGraphModel>`` either as plain XML or compressed the
+way the draw.io editor saves it: deflated, base64-encoded and
+URL-encoded. Both are read.
+
+The renderer supports the subset of draw.io that the figures use:
+
+- vertices: rectangles (``rounded``, ``arcSize``), ellipses, ``line``
+  and ``text`` shapes, with fill, stroke, stroke width and dashes.
+  Children of a container are placed relative to it;
+- labels: plain or HTML (``html=1``, tags stripped, ``<br>`` kept),
+  word-wrapped with ``whiteSpace=wrap``. ``align``, ``verticalAlign``,
+  ``spacing*``, ``fontSize``, ``fontStyle`` (bold, italic) and
+  ``fontColor`` are honoured;
+- edges: straight or orthogonal (``edgeStyle=orthogonalEdgeStyle``),
+  with waypoints, ``exitX/Y`` and ``entryX/Y`` constraints, floating
+  terminals and ``classic``/``block``/``open`` arrow heads.
+
+The shapes are drawn on one of two canvases: SVG (text stays text) or
+PNG (PIL, drawn at SUPERSAMPLE times the output resolution and reduced,
+with fonts from pil_text.py). Both are cropped to the drawing plus
+BORDER. Line breaks in wrapped labels are measured with the same fonts,
+so both formats break lines in the same places.
+
+Encoded outputs are cached in figures-source/.cache/drawio/ under a hash
+of the page's model, the format, the DPI and the renderer (this script
+and the fonts), and in the artifact store shared by all checkouts
+(scripts/artifact_store.py). Files render in parallel, one worker
+process each, and the outputs are written to figures-source/png/ as
+``<stem>.<format>``, or ``<stem>-<n>.<format>`` for page n > 1. A PNG that looks the same as
+the existing one (image_diff.py) is not rewritten.
+
+Usage: drawio_render.py [FILE.drawio ...] [--format png,svg] [--dpi N] [-o DIR] [--jobs N]
+"""
+
+import argparse
+import base64
+import hashlib
+import html
+import io
+import math
+import re
+import sys
+import xml.etree.ElementTree as ET
+import zlib
+from collections import namedtuple
+from functools import lru_cache, partial
+from pathlib import Path
+from urllib.parse import unquote
+from xml.sax.saxutils import escape, quoteattr
+
+import PIL
+from PIL import Image, ImageDraw
+
+import pil_text
+from fanout import atomic_write, fan_out, same_image
+from figure_cache import shared_store
+from render_pool import default_jobs, report, run_jobs, span
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DRAWIO_DIR = SCRIPT_DIR.parent / "drawio"
+OUTPUT_DIR = SCRIPT_DIR.parent / "png"
+CACHE_DIR = SCRIPT_DIR.parent / ".cache" / "drawio"
+FORMATS = ('png', 'svg')
+
+DPI = 300
+CSS_DPI = 96        # draw.io units are CSS pixels
+SUPERSAMPLE = 2
+BORDER = 10
+FONT_FAMILY = 'Helvetica, Arial, sans-serif'
+MEASURE_SCALE = 4   # labels are measured at 4x the font size for sub-pixel widths
+
+# draw.io defaults (mxConstants)
+FONT_SIZE = 11
+LINE_HEIGHT = 1.2
+ARC_SIZE = 15       # percent of the shorter side
+ARROW_SIZE = 6
+SPACING = 2
+DASH_PATTERN = '3 3'
+
+Box = namedtuple('Box', ['x', 'y', 'width', 'height'])
+Vertex = namedtuple('Vertex', ['id', 'box', 'label', 'style'])
+Edge = namedtuple('Edge', ['id', 'points', 'label', 'style'])
+
+
+# -- parsing ------------------------------------------------------------------
+
+def decode_diagram(payload):
+    """The mxGraphModel XML of a compressed ``<diagram>`` payload."""
+    data = base64.b64decode(payload.strip())
+    return unquote(zlib.decompress(data, -15).decode('utf-8'))
+
+
+def read_pages(path):
+    """[(page name, mxGraphModel element)] for every page of a .drawio file."""
+    root = ET.parse(path).getroot()
+    if root.tag == 'mxGraphModel':
+        return [(Path(path).stem, root)]
+    pages = []
+    for diagram in root.iter('diagram'):
+        model = diagram.find('mxGraphModel')
+        if model is None:
+            model = ET.fromstring(decode_diagram(diagram.text or ''))
+        pages.append((diagram.get('name', ''), model))
+    return pages
+
+
+def parse_style(style):
+    """A draw.io style string as a dict; bare names such as ``text`` map to '1'."""
+    result = {}
+    for item in (style or '').split(';'):
+        if not item:
+            continue
+        key, sep, value = item.partition('=')
+        result[key] = value if sep else '1'
+    return result
+
+
+def label_text(value, style):
+    """Plain text of a cell label, with HTML tags stripped for ``html=1``."""
+    if style.get('html') == '1':
+        value = re.sub(r'<br\s*/?>|</div>\s*<div[^>]*>|</p>\s*<p[^>]*>|<div[^>]*>', '\n', value,
+                       flags=re.I)
+        value = html.unescape(re.sub(r'<[^>]+>', '', value))
+    return value.strip('\n')
+
+
+def _num(element, name, default=0.0):
+    return float(element.get(name, default)) if element is not None else default
+
+
+def _point(element):
+    return (_num(element, 'x'), _num(element, 'y'))
+
+
+def parse_model(model):
+    """(vertices, edges) of a page in drawing order, in absolute page coordinates."""
+    cells = {cell.get('id'): cell for cell in model.iter('mxCell')}
+    origins = {}
+
+    def origin(cell_id):
+        """Top-left corner of a vertex's coordinate system (its parent's position)."""
+        if cell_id not in origins:
+            parent = cells.get(cells[cell_id].get('parent')) if cell_id in cells else None
+            if parent is None or parent.get('vertex') != '1':
+                origins[cell_id] = (0.0, 0.0)
+            else:
+                px, py = origin(parent.get('id'))
+                geometry = parent.find('mxGeometry')
+                origins[cell_id] = (px + _num(geometry, 'x'), py + _num(geometry, 'y'))
+        return origins[cell_id]
+
+    vertices, boxes, edge_cells = [], {}, []
+    for cell in model.iter('mxCell'):
+        style = parse_style(cell.get('style'))
+        if cell.get('edge') == '1':
+            edge_cells.append((cell, style))
+        elif cell.get('vertex') == '1':
+            geometry = cell.find('mxGeometry')
+            ox, oy = origin(cell.get('id'))
+            box = Box(ox + _num(geometry, 'x'), oy + _num(geometry, 'y'),
+                      _num(geometry, 'width'), _num(geometry, 'height'))
+            boxes[cell.get('id')] = box
+            vertices.append(Vertex(cell.get('id'), box,
+                                   label_text(cell.get('value', ''), style), style))
+
+    edges = []
+    for cell, style in edge_cells:
+        geometry = cell.find('mxGeometry')
+        ox, oy = origin(cell.get('id'))
+        hints = {p.get('as'): (ox + _point(p)[0], oy + _point(p)[1])
+                 for p in (geometry.findall('mxPoint') if geometry is not None else ())}
+        array = geometry.find('Array') if geometry is not None else None
+        waypoints = [(ox + x, oy + y) for x, y in map(_point, array.findall('mxPoint'))] \
+            if array is not None else []
+        points = route(boxes.get(cell.get('source')), boxes.get(cell.get('target')), style,
+                       waypoints, hints.get('sourcePoint'), hints.get('targetPoint'))
+        if points:
+            edges.append(Edge(cell.get('id'), points,
+                              label_text(cell.get('value', ''), style), style))
+    return vertices, edges
+
+
+# -- edge routing -------------------------------------------------------------
+
+def _center(box):
+    return (box.x + box.width / 2, box.y + box.height / 2)
+
+
+def _constraint(box, style, prefix):
+    """(point, side) for an ``exitX/Y`` or ``entryX/Y`` constraint, or (None, None)."""
+    if box is None or f'{prefix}X' not in style:
+        return None, None
+    fx, fy = float(style[f'{prefix}X']), float(style.get(f'{prefix}Y', 0.5))
+    point = (box.x + fx * box.width + float(style.get(f'{prefix}Dx', 0)),
+             box.y + fy * box.height + float(style.get(f'{prefix}Dy', 0)))
+    distances = {'top': fy, 'bottom': 1 - fy, 'left': fx, 'right': 1 - fx}
+    return point, min(distances, key=distances.get)
+
+
+def _toward(box, point):
+    """Where an orthogonal edge leaves ``box`` to head for ``point``; returns (point, side)."""
+    cx, cy = _center(box)
+    x, y = point
+    if box.x <= x <= box.x + box.width and not box.y < y < box.y + box.height:
+        side = 'bottom' if y >= cy else 'top'
+        return (x, box.y + box.height if side == 'bottom' else box.y), side
+    if box.y <= y <= box.y + box.height and not box.x < x < box.x + box.width:
+        side = 'right' if x >= cx else 'left'
+        return (box.x + box.width if side == 'right' else box.x, y), side
+    if abs(y - cy) * box.width >= abs(x - cx) * box.height:
+        side = 'bottom' if y >= cy else 'top'
+        return (cx, box.y + box.height if side == 'bottom' else box.y), side
+    side = 'right' if x >= cx else 'left'
+    return (box.x + box.width if side == 'right' else box.x, cy), side
+
+
+def _perimeter(box, toward):
+    """Where the line from the centre of ``box`` to ``toward`` crosses its outline."""
+    cx, cy = _center(box)
+    dx, dy = toward[0] - cx, toward[1] - cy
+    if dx == dy == 0:
+        return cx, cy
+    t = min(box.width / 2 / abs(dx) if dx else math.inf, box.height / 2 / abs(dy) if dy else math.inf)
+    return cx + dx * t, cy + dy * t
+
+
+def _auto_ports(src, tgt):
+    """Terminals and orientation of an orthogonal edge between two boxes with no hints."""
+    if tgt.y >= src.y + src.height or tgt.y + tgt.height <= src.y:
+        down = tgt.y >= src.y + src.height
+        lo, hi = max(src.x, tgt.x), min(src.x + src.width, tgt.x + tgt.width)
+        sx = tx = (lo + hi) / 2 if lo <= hi else None
+        if sx is None:
+            sx, tx = _center(src)[0], _center(tgt)[0]
+        return ((sx, src.y + src.height if down else src.y),
+                (tx, tgt.y if down else tgt.y + tgt.height), True)
+    right = tgt.x >= src.x + src.width
+    lo, hi = max(src.y, tgt.y), min(src.y + src.height, tgt.y + tgt.height)
+    sy = ty = (lo + hi) / 2 if lo <= hi else None
+    if sy is None:
+        sy, ty = _center(src)[1], _center(tgt)[1]
+    return ((src.x + src.width if right else src.x, sy),
+            (tgt.x if right else tgt.x + tgt.width, ty), False)
+
+
+def _along_side(side, terminal, neighbour):
+    """True if the segment from ``terminal`` to ``neighbour`` runs along the box side."""
+    if side in ('top', 'bottom'):
+        return neighbour[1] == terminal[1] and neighbour[0] != terminal[0]
+    return neighbour[0] == terminal[0] and neighbour[1] != terminal[1]
+
+
+def _elbow(start, end, vertical):
+    if start[0] == end[0] or start[1] == end[1]:
+        return [start, end]
+    if vertical:
+        mid = (start[1] + end[1]) / 2
+        return [start, (start[0], mid), (end[0], mid), end]
+    mid = (start[0] + end[0]) / 2
+    return [start, (mid, start[1]), (mid, end[1]), end]
+
+
+def _dedupe(points):
+    result = []
+    for p in points:
+        if not result or (abs(p[0] - result[-1][0]) > 1e-6 or abs(p[1] - result[-1][1]) > 1e-6):
+            result.append(p)
+    return result
+
+
+def route(src, tgt, style, waypoints=(), source_point=None, target_point=None):
+    """
+    Points of an edge from box ``src`` to box ``tgt``; either box may be
+    None for a floating terminal at ``source_point``/``target_point``.
+    Returns [] if an end is neither connected nor placed.
+    """
+    orthogonal = style.get('edgeStyle') in ('orthogonalEdgeStyle', 'elbowEdgeStyle')
+    waypoints = list(waypoints)
+    start, start_side = _constraint(src, style, 'exit')
+    end, end_side = _constraint(tgt, style, 'entry')
+    if src is None:
+        start = source_point
+    if tgt is None:
+        end = target_point
+    if (src is None and start is None) or (tgt is None and end is None):
+        return []
+
+    if not orthogonal:
+        first = waypoints[0] if waypoints else (end or _center(tgt))
+        last = waypoints[-1] if waypoints else (start or _center(src))
+        start = start or _perimeter(src, first)
+        end = end or _perimeter(tgt, last)
+        return _dedupe([start, *waypoints, end])
+
+    if waypoints:
+        # A constrained terminal whose first segment would run along its own
+        # side gives way to the waypoint, as the editor's router does
+        if start is None or (start_side and _along_side(start_side, start, waypoints[0])):
+            start = _toward(src, waypoints[0])[0]
+        if end is None or (end_side and _along_side(end_side, end, waypoints[-1])):
+            end = _toward(tgt, waypoints[-1])[0]
+        points = [start, *waypoints, end]
+        path = [points[0]]
+        for p, q in zip(points, points[1:]):
+            if p[0] != q[0] and p[1] != q[1]:
+                path.append((p[0], q[1]))
+            path.append(q)
+        return _dedupe(path)
+
+    if start is None and end is None:
+        start, end, vertical = _auto_ports(src, tgt)
+    else:
+        if start is None:
+            start, start_side = _toward(src, end)
+        if end is None:
+            end, end_side = _toward(tgt, start)
+        vertical = (start_side or end_side) in ('top', 'bottom')
+    return _dedupe(_elbow(start, end, vertical))
+
+
+# -- text ---------------------------------------------------------------------
+
+def _face(style):
+    font_style = int(style.get('fontStyle', 0))
+    if font_style & 1:
+        return 'bold'
+    return 'italic' if font_style & 2 else 'regular'
+
+
+@lru_cache(maxsize=None)
+def _metrics(face, size):
+    """Ascent and descent of a font at ``size`` page units."""
+    m = pil_text.line_metrics(pil_text.FontSpec(face, max(1, round(size * MEASURE_SCALE))))
+    return m.ascent / MEASURE_SCALE, m.descent / MEASURE_SCALE
+
+
+def _width(face, size, text):
+    spec = pil_text.FontSpec(face, max(1, round(size * MEASURE_SCALE)))
+    return pil_text.measure(spec, text) / MEASURE_SCALE
+
+
+def wrap(text, face, size, width):
+    """Break each paragraph of ``text`` into lines no wider than ``width`` where possible."""
+    lines = []
+    for paragraph in text.split('\n'):
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f'{line} {word}' if line else word
+            if line and _width(face, size, candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def label_lines(text, style, box):
+    """[(x, baseline, line)] and the alignment of a label laid out in ``box``."""
+    face, size = _face(style), float(style.get('fontSize', FONT_SIZE))
+    spacing = float(style.get('spacing', SPACING))
+    left = box.x + spacing + float(style.get('spacingLeft', 0))
+    right = box.x + box.width - spacing - float(style.get('spacingRight', 0))
+    top = box.y + spacing + float(style.get('spacingTop', 0))
+    bottom = box.y + box.height - spacing - float(style.get('spacingBottom', 0))
+
+    lines = (wrap(text, face, size, right - left) if style.get('whiteSpace') == 'wrap'
+             else text.split('\n'))
+    ascent, descent = _metrics(face, size)
+    line_height = size * LINE_HEIGHT
+    block = len(lines) * line_height
+    valign = style.get('verticalAlign', 'middle')
+    if valign == 'top':
+        y = top
+    elif valign == 'bottom':
+        y = bottom - block
+    else:
+        y = (top + bottom) / 2 - block / 2
+    align = style.get('align', 'center')
+    x = {'left': left, 'right': right}.get(align, (left + right) / 2)
+    # Centre each line's glyph box (ascent + descent) within its line height
+    first = y + (line_height + ascent - descent) / 2
+    return [(x, first + i * line_height, line) for i, line in enumerate(lines)], align
+
+
+# -- drawing ------------------------------------------------------------------
+
+def _color(value, default):
+    if value in (None, '', 'default'):
+        return default
+    return None if value == 'none' else value
+
+
+def _dash(style, width):
+    if style.get('dashed') != '1':
+        return None
+    return [float(v) * width for v in style.get('dashPattern', DASH_PATTERN).split()]
+
+
+def _rect_outline(box, radius, steps=8):
+    """Closed outline of a (rounded) rectangle as points, for dashed strokes."""
+    x0, y0, x1, y1 = box.x, box.y, box.x + box.width, box.y + box.height
+    if radius <= 0:
+        return [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]
+    points = []
+    for cx, cy, a0 in ((x1 - radius, y0 + radius, -90), (x1 - radius, y1 - radius, 0),
+                       (x0 + radius, y1 - radius, 90), (x0 + radius, y0 + radius, 180)):
+        for i in range(steps + 1):
+            a = math.radians(a0 + 90 * i / steps)
+            points.append((cx + radius * math.cos(a), cy + radius * math.sin(a)))
+    return points + points[:1]
+
+
+def _arrow_head(tip, previous, kind, size, width):
+    """(polygon, filled, line end) for an arrow head at ``tip``; None for no head."""
+    if kind in (None, '', 'none'):
+        return None
+    dx, dy = tip[0] - previous[0], tip[1] - previous[1]
+    length = math.hypot(dx, dy) or 1.0
+    ux, uy = dx / length, dy / length
+    nx, ny = -uy, ux
+    head = size + width       # the editor grows markers with the stroke
+    half = head * 0.45
+    back = (tip[0] - ux * head, tip[1] - uy * head)
+    left = (back[0] + nx * half, back[1] + ny * half)
+    right = (back[0] - nx * half, back[1] - ny * half)
+    if kind == 'open':
+        return [left, tip, right], False, tip
+    if kind == 'classic':
+        notch = (tip[0] - ux * head * 0.7, tip[1] - uy * head * 0.7)
+        return [tip, left, notch, right], True, notch
+    return [tip, left, right], True, back
+
+
+def draw(canvas, vertices, edges):
+    """Draw a page on ``canvas`` (SvgCanvas, PilCanvas or Bounds)."""
+    for v in vertices:
+        style, box = v.style, v.box
+        text_shape = style.get('text') == '1' or style.get('shape') == 'text'
+        fill = _color(style.get('fillColor'), None if text_shape else '#FFFFFF')
+        stroke = _color(style.get('strokeColor'), None if text_shape else '#000000')
+        width = float(style.get('strokeWidth', 1))
+        dash = _dash(style, width)
+        shape = style.get('shape', 'ellipse' if style.get('ellipse') == '1' else
+                          'line' if style.get('line') == '1' else 'rect')
+        if shape == 'line':
+            if stroke:
+                y = box.y + box.height / 2
+                canvas.polyline([(box.x, y), (box.x + box.width, y)], stroke, width, dash)
+        elif shape == 'ellipse':
+            canvas.ellipse(box, fill, stroke, width, dash)
+        elif not text_shape or fill or stroke:
+            radius = 0
+            if style.get('rounded') == '1':
+                radius = min(box.width, box.height) * float(style.get('arcSize', ARC_SIZE)) / 100
+            canvas.rect(box, radius, fill, stroke, width, dash)
+        if v.label:
+            _draw_label(canvas, v.label, style, box)
+
+    for e in edges:
+        style = e.style
+        stroke = _color(style.get('strokeColor'), '#000000')
+        width = float(style.get('strokeWidth', 1))
+        points = list(e.points)
+        if stroke is None:
+            continue
+        heads = []
+        for end, index, neighbour in (('end', -1, -2), ('start', 0, 1)):
+            kind = style.get(f'{end}Arrow', 'classic' if end == 'end' else 'none')
+            head = _arrow_head(points[index], points[neighbour], kind,
+                               float(style.get(f'{end}Size', ARROW_SIZE)), width)
+            if head:
+                polygon, filled, line_end = head
+                points[index] = line_end
+                heads.append((polygon, filled and style.get(f'{end}Fill', '1') != '0'))
+        canvas.polyline(points, stroke, width, _dash(style, width))
+        for polygon, filled in heads:
+            if filled:
+                canvas.polygon(polygon, stroke, stroke, width)
+            else:
+                canvas.polyline(polygon, stroke, width, None)
+        if e.label:
+            mid = _midpoint(e.points)
+            size = float(style.get('fontSize', FONT_SIZE))
+            box = Box(mid[0] - 200, mid[1] - size, 400, 2 * size)
+            background = _color(style.get('labelBackgroundColor'), None)
+            lines, _ = label_lines(e.label, {**style, 'whiteSpace': ''}, box)
+            if background:
+                face = _face(style)
+                w = max(_width(face, size, line) for _, _, line in lines) + 4
+                h = len(lines) * size * LINE_HEIGHT
+                canvas.rect(Box(mid[0] - w / 2, mid[1] - h / 2, w, h), 0, background, None, 0, None)
+            _draw_label(canvas, e.label, {**style, 'whiteSpace': ''}, box)
+
+
+def _midpoint(points):
+    """The point halfway along a polyline."""
+    lengths = [math.dist(p, q) for p, q in zip(points, points[1:])]
+    remaining = sum(lengths) / 2
+    for (p, q), length in zip(zip(points, points[1:]), lengths):
+        if remaining <= length and length:
+            t = remaining / length
+            return (p[0] + (q[0] - p[0]) * t, p[1] + (q[1] - p[1]) * t)
+        remaining -= length
+    return points[-1]
+
+
+def _draw_label(canvas, text, style, box):
+    lines, align = label_lines(text, style, box)
+    face, size = _face(style), float(style.get('fontSize', FONT_SIZE))
+    color = _color(style.get('fontColor'), '#000000') or '#000000'
+    for x, y, line in lines:
+        if line:
+            canvas.text(x, y, line, face, size, color, align)
+
+
+class Bounds:
+    """A canvas that only records the extent of what is drawn."""
+
+    def __init__(self):
+        self.x0 = self.y0 = math.inf
+        self.x1 = self.y1 = -math.inf
+
+    def _add(self, points, margin=0.0):
+        for x, y in points:
+            self.x0, self.y0 = min(self.x0, x - margin), min(self.y0, y - margin)
+            self.x1, self.y1 = max(self.x1, x + margin), max(self.y1, y + margin)
+
+    def rect(self, box, radius, fill, stroke, width, dash):
+        self._add([(box.x, box.y), (box.x + box.width, box.y + box.height)], width / 2 if stroke else 0)
+
+    def ellipse(self, box, fill, stroke, width, dash):
+        self.rect(box, 0, fill, stroke, width, dash)
+
+    def polyline(self, points, stroke, width, dash):
+        self._add(points, width / 2)
+
+    def polygon(self, points, fill, stroke, width):
+        self._add(points, width / 2)
+
+    def text(self, x, y, line, face, size, color, align):
+        w = _width(face, size, line)
+        left = {'left': x, 'right': x - w}.get(align, x - w / 2)
+        ascent, descent = _metrics(face, size)
+        self._add([(left, y - ascent), (left + w, y + descent)])
+
+    def box(self, border=BORDER):
+        if self.x0 > self.x1:
+            return Box(0, 0, 2 * border, 2 * border)
+        x0, y0 = math.floor(self.x0 - border), math.floor(self.y0 - border)
+        return Box(x0, y0, math.ceil(self.x1 + border) - x0, math.ceil(self.y1 + border) - y0)
+
+
+def _n(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+class SvgCanvas:
+    """Collects SVG elements in page units."""
+
+    ANCHORS = {'left': 'start', 'center': 'middle', 'right': 'end'}
+
+    def __init__(self):
+        self.elements = []
+
+    def _paint(self, fill, stroke, width, dash):
+        attrs = f' fill="{fill or "none"}"'
+        if stroke:
+            attrs += f' stroke="{stroke}" stroke-width="{_n(width)}"'
+            if dash:
+                attrs += f' stroke-dasharray="{" ".join(map(_n, dash))}"'
+        else:
+            attrs += ' stroke="none"'
+        return attrs
+
+    def rect(self, box, radius, fill, stroke, width, dash):
+        r = f' rx="{_n(radius)}"' if radius else ''
+        self.elements.append(f'<rect x="{_n(box.x)}" y="{_n(box.y)}" width="{_n(box.width)}" '
+                             f'height="{_n(box.height)}"{r}{self._paint(fill, stroke, width, dash)}/>')
+
+    def ellipse(self, box, fill, stroke, width, dash):
+        cx, cy = _center(box)
+        self.elements.append(f'<ellipse cx="{_n(cx)}" cy="{_n(cy)}" rx="{_n(box.width / 2)}" '
+                             f'ry="{_n(box.height / 2)}"{self._paint(fill, stroke, width, dash)}/>')
+
+    def polyline(self, points, stroke, width, dash):
+        coords = ' '.join(f'{_n(x)},{_n(y)}' for x, y in points)
+        self.elements.append(f'<polyline points="{coords}"{self._paint(None, stroke, width, dash)}'
+                             f' stroke-linejoin="round"/>')
+
+    def polygon(self, points, fill, stroke, width):
+        coords = ' '.join(f'{_n(x)},{_n(y)}' for x, y in points)
+        self.elements.append(f'<polygon points="{coords}"{self._paint(fill, stroke, width, None)}/>')
+
+    def text(self, x, y, line, face, size, color, align):
+        weight = ' font-weight="bold"' if face == 'bold' else ''
+        italic = ' font-style="italic"' if face == 'italic' else ''
+        self.elements.append(f'<text x="{_n(x)}" y="{_n(y)}" font-family={quoteattr(FONT_FAMILY)} '
+                             f'font-size="{_n(size)}"{weight}{italic} fill="{color}" '
+                             f'text-anchor="{self.ANCHORS.get(align, "middle")}">{escape(line)}</text>')
+
+    def encode(self, view):
+        head = (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<svg xmlns="http://www.w3.org/2000/svg" width="{_n(view.width)}" '
+                f'height="{_n(view.height)}" viewBox="{_n(view.x)} {_n(view.y)} '
+                f'{_n(view.width)} {_n(view.height)}">\n'
+                f'<rect x="{_n(view.x)}" y="{_n(view.y)}" width="{_n(view.width)}" '
+                f'height="{_n(view.height)}" fill="#FFFFFF"/>\n')
+        return (head + '\n'.join(self.elements) + '\n</svg>\n').encode()
+
+
+class PilCanvas:
+    """Draws on a PIL image; page coordinates are mapped through ``view`` and ``scale``."""
+
+    ANCHORS = {'left': 'ls', 'center': 'ms', 'right': 'rs'}
+
+    def __init__(self, view, scale):
+        self.view, self.scale = view, scale
+        self.image = Image.new('RGB', (max(1, round(view.width * scale)),
+                                       max(1, round(view.height * scale))), 'white')
+        self.draw = ImageDraw.Draw(self.image)
+
+    def _xy(self, point):
+        return ((point[0] - self.view.x) * self.scale, (point[1] - self.view.y) * self.scale)
+
+    def _width(self, width):
+        return max(1, round(width * self.scale))
+
+    def _dashed(self, points, stroke, width, dash):
+        """Stroke a polyline with a repeating on/off ``dash`` pattern (page units)."""
+        pattern = [d * self.scale for d in dash]
+        index, left, on = 0, pattern[0], True
+        for p, q in zip(points, points[1:]):
+            (x0, y0), (x1, y1) = self._xy(p), self._xy(q)
+            length = math.hypot(x1 - x0, y1 - y0)
+            pos = 0.0
+            while pos < length:
+                step = min(left, length - pos)
+                if on:
+                    t0, t1 = pos / length, (pos + step) / length
+                    self.draw.line([(x0 + (x1 - x0) * t0, y0 + (y1 - y0) * t0),
+                                    (x0 + (x1 - x0) * t1, y0 + (y1 - y0) * t1)],
+                                   fill=stroke, width=self._width(width))
+                pos += step
+                left -= step
+                if left <= 1e-9:
+                    index = (index + 1) % len(pattern)
+                    left, on = pattern[index], not on
+
+    def rect(self, box, radius, fill, stroke, width, dash):
+        # PIL strokes inside the shape; draw.io centres the stroke on the outline
+        grow = width / 2 if stroke and not dash else 0
+        (x0, y0) = self._xy((box.x - grow, box.y - grow))
+        (x1, y1) = self._xy((box.x + box.width + grow, box.y + box.height + grow))
+        outline = stroke if not dash else None
+        r = (radius + grow) * self.scale
+        self.draw.rounded_rectangle((x0, y0, x1 - 1, y1 - 1), radius=r, fill=fill, outline=outline,
+                                    width=self._width(width) if outline else 0)
+        if stroke and dash:
+            self._dashed(_rect_outline(box, radius), stroke, width, dash)
+
+    def ellipse(self, box, fill, stroke, width, dash):
+        grow = width / 2 if stroke else 0
+        (x0, y0) = self._xy((box.x - grow, box.y - grow))
+        (x1, y1) = self._xy((box.x + box.width + grow, box.y + box.height + grow))
+        self.draw.ellipse((x0, y0, x1 - 1, y1 - 1), fill=fill, outline=stroke if not dash else None,
+                          width=self._width(width) if stroke else 0)
+
+    def polyline(self, points, stroke, width, dash):
+        if dash:
+            self._dashed(points, stroke, width, dash)
+        else:
+            self.draw.line([self._xy(p) for p in points], fill=stroke, width=self._width(width),
+                           joint='curve')
+
+    def polygon(self, points, fill, stroke, width):
+        self.draw.polygon([self._xy(p) for p in points], fill=fill, outline=stroke)
+
+    def text(self, x, y, line, face, size, color, align):
+        font = pil_text.get_font(face, max(1, round(size * self.scale)))
+        self.draw.text(self._xy((x, y)), line, fill=color, font=font, anchor=self.ANCHORS[align])
+
+
+# -- rendering and caching ----------------------------------------------------
+
+@lru_cache(maxsize=None)
+def renderer_signature():
+    """What besides the model decides the output: this script, the fonts and Pillow."""
+    h = hashlib.sha256(Path(__file__).read_bytes())
+    h.update(repr((pil_text.signature(), PIL.__version__)).encode())
+    return h.hexdigest()
+
+
+def page_key(model, fmt, dpi=DPI):
+    """Cache key of one page rendered to ``fmt`` at ``dpi``."""
+    h = hashlib.sha256(ET.tostring(model))
+    for part in (fmt, str(dpi), renderer_signature()):
+        h.update(b'\0' + part.encode())
+    return h.hexdigest()
+
+
+def encode_page(model, fmt='png', dpi=DPI):
+    """Render one page (an mxGraphModel element) to encoded bytes."""
+    vertices, edges = parse_model(model)
+    bounds = Bounds()
+    draw(bounds, vertices, edges)
+    view = bounds.box()
+    if fmt == 'svg':
+        canvas = SvgCanvas()
+        draw(canvas, vertices, edges)
+        return canvas.encode(view)
+    if fmt != 'png':
+        raise ValueError(f"unsupported format: {fmt}")
+    canvas = PilCanvas(view, dpi / CSS_DPI * SUPERSAMPLE)
+    draw(canvas, vertices, edges)
+    img = canvas.image.reduce(SUPERSAMPLE) if SUPERSAMPLE > 1 else canvas.image
+    buf = io.BytesIO()
+    img.save(buf, format='png', dpi=(dpi, dpi))
+    return buf.getvalue()
+
+
+def render_page(model, fmt='png', dpi=DPI, cache_dir=CACHE_DIR):
+    """(bytes, cache hit) for one page, from the cache when the model is unchanged."""
+    key = page_key(model, fmt, dpi)
+    path = cache_dir / f"{key}.{fmt}"
+    if path.exists():
+        return path.read_bytes(), True
+    store = shared_store()
+    stored = store.get(f"drawio:{key}") if store else None
+    hit = bool(stored)
+    data = stored['data'] if hit else encode_page(model, fmt, dpi)
+    if store and not hit:
+        store.put(f"drawio:{key}", {'data': data}, stage='drawio')
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    atomic_write(str(path), data)
+    return data, hit
+
+
+def output_name(stem, page, fmt):
+    """File name of one page: ``stem.fmt``, or ``stem-<n>.fmt`` for page n > 1."""
+    return f"{stem}.{fmt}" if page == 1 else f"{stem}-{page}.{fmt}"
+
+
+def render_file(path, formats=('png',), output_dir=OUTPUT_DIR, dpi=DPI, cache_dir=CACHE_DIR):
+    """Render every page of one .drawio file in every format into ``output_dir``."""
+    path = Path(path)
+    with span('drawio', figure=path.stem) as record:
+        hits, written = [], 0
+        for page, (_, model) in enumerate(read_pages(path), start=1):
+            for fmt in formats:
+                data, hit = render_page(model, fmt, dpi, cache_dir)
+                hits.append(hit)
+                target = Path(output_dir) / output_name(path.stem, page, fmt)
+                same = same_image if fmt == 'png' else None
+                action = fan_out(data, [str(target)], same)[str(target)]
+                print(f"{'✓' if action == 'write' else '·'} {target.name} "
+                      f"({action}{', cached' if hit else ''})")
+                written += len(data)
+        record['bytes_out'] = written
+        record['cache'] = 'hit' if all(hits) else 'miss'
+
+
+def discover(drawio_dir=DRAWIO_DIR):
+    """All draw.io sources, in name order."""
+    return sorted(drawio_dir.glob("*.drawio"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render draw.io diagrams to PNG/SVG headlessly.")
+    parser.add_argument('files', nargs='*', type=Path,
+                        help='.drawio files (default: every file in figures-source/drawio/)')
+    parser.add_argument('--format', default='png',
+                        help=f"comma-separated output formats from {', '.join(FORMATS)} "
+                             "(default: png)")
+    parser.add_argument('--dpi', type=int, default=DPI, help=f'PNG resolution (default: {DPI})')
+    parser.add_argument('-o', '--output-dir', type=Path, default=OUTPUT_DIR,
+                        help='output directory (default: figures-source/png/)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help=f'worker processes (default: {default_jobs()})')
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.format.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"unsupported format(s): {', '.join(unknown)}")
+    files = args.files or discover()
+    missing = [f for f in files if not f.exists()]
+    if missing:
+        for f in missing:
+            print(f"Error: draw.io file not found: {f}")
+        return 1
+    if not files:
+        print(f"Error: no .drawio files found in {DRAWIO_DIR}")
+        return 1
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    results = run_jobs([(f.stem, partial(render_file, f, formats, args.output_dir, args.dpi))
+                        for f in files], max_workers=args.jobs)
+    return report(results, noun='diagrams')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
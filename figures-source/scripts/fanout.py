@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Distribute one rendered artifact to several target paths.
+
+The first target receives an atomic write of the bytes; every other target
+is a hardlink to it where the filesystem allows, or an atomic copy where
+it does not (different device, no link support). Targets that already hold
+identical content are left alone so their mtimes do not change.
+
+A caller may pass ``same(path, data)`` to treat an existing target as
+current even when its bytes differ, e.g. ``same_image`` for PNGs whose
+re-render only changed in compression or metadata. ``same_image`` wraps
+image_diff.same_image and imports it (and NumPy) on its first call, so
+runs that compare nothing do not pay for the import.
+
+``place`` can also try a reflink (copy-on-write clone, Linux FICLONE)
+before the hardlink, for callers that want independent files without
+paying for the copy.
+"""
+
+import fcntl
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# atomic_file lives with the repository build scripts
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "scripts"))
+from atomic_file import atomic_write, temp_path  # atomic_write is re-exported
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+METHODS = ('reflink', 'link', 'copy')
+
+
+def same_image(old, new):
+    """image_diff.same_image(old, new), imported on first use; False without NumPy."""
+    try:
+        from image_diff import same_image as compare
+    except ImportError:  # NumPy missing: any byte change counts
+        return False
+    return compare(old, new)
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def _same_bytes(path, data):
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def reflink(src, dest):
+    """Clone ``src`` to a new file ``dest`` sharing its blocks; raises OSError if unsupported."""
+    with open(src, 'rb') as fsrc, open(dest, 'xb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dest)
+            raise
+
+
+def place(src, dest, methods=('link', 'copy')):
+    """
+    Make ``dest`` hold the content of ``src``; return the method used or 'unchanged'.
+
+    ``methods`` are tried in order from 'reflink', 'link' (hardlink) and
+    'copy'; the result is renamed over ``dest`` atomically.
+    """
+    if _same_file(src, dest):
+        return 'unchanged'
+    tmp = temp_path(dest)
+    for candidate in methods:
+        try:
+            if candidate == 'reflink':
+                reflink(src, tmp)
+            elif candidate == 'link':
+                os.link(src, tmp)
+            else:
+                shutil.copyfile(src, tmp)
+        except OSError:
+            if candidate == methods[-1]:
+                raise
+            continue
+        method = candidate
+        break
+    try:
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return method
+
+
+def fan_out(data, targets, same=None):
+    """
+    Write ``data`` to every path in ``targets``; return {path: action}.
+
+    Actions are 'write', 'link', 'copy', 'unchanged' or, when ``same``
+    accepts a target whose bytes differ, 'visually-unchanged'. Such a
+    primary target is kept and the others are brought in line with it.
+    """
+    actions = {}
+    primary = None
+    for dest in targets:
+        os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+        if primary is None:
+            if _same_bytes(dest, data):
+                actions[dest] = 'unchanged'
+            elif same is not None and os.path.exists(dest) and same(dest, data):
+                actions[dest] = 'visually-unchanged'
+                data = _read(dest)
+            else:
+                atomic_write(dest, data)
+                actions[dest] = 'write'
+            primary = dest
+        elif _same_bytes(dest, data):
+            # Already correct; linking would only churn the mtime
+            actions[dest] = 'unchanged'
+        else:
+            actions[dest] = place(primary, dest)
+    return actions
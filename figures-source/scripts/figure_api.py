@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+In-memory rendering API for the matplotlib and PIL figure generators.
+
+``render()`` encodes any number of figures in any number of formats and
+resolutions in one call and returns the encoded buffers, without touching
+the filesystem:
+
+    buffers = figure_api.render(['fig01_current_architecture'], ['svg', 'png'], [300, 100])
+    svg = buffers['fig01_current_architecture', 'svg', 300]
+
+Each figure is drawn once per call and then encoded for every (format,
+DPI) pair. The buffers are memoryviews: over each encoder's BytesIO when
+rendering in process, or slices of the one receive buffer when the warm
+render server (render_server.py) does the work, which it does whenever it
+is running. Either way nothing is copied on the way to the caller.
+
+The generator CLIs are thin wrappers that ``write()`` these buffers to
+their output files.
+"""
+
+import os
+
+import figure_scenes
+import render_server
+from fanout import atomic_write, same_image
+
+DEFAULT_DPI = 300
+FORMATS = {
+    'matplotlib': ('png', 'svg', 'pdf'),
+    'pil': ('png',),
+}
+
+
+def _as_list(value, default):
+    if value is None:
+        return list(default)
+    if isinstance(value, (str, int)):
+        return [value]
+    return list(value)
+
+
+def _backend(name):
+    """The generator module for a backend, imported on first use."""
+    if name == 'matplotlib':
+        import generate_diagrams
+        return generate_diagrams
+    if name == 'pil':
+        import generate_diagrams_pil
+        return generate_diagrams_pil
+    raise ValueError(f"unknown backend: {name}")
+
+
+def encode(figures, formats, dpis, backend='matplotlib'):
+    """render() in this process, without asking the render server."""
+    module = _backend(backend)
+    outputs = [(fmt, dpi) for fmt in formats for dpi in dpis]
+    buffers = {}
+    for figure in figures:
+        for (fmt, dpi), buf in module.encode_scene(figure_scenes.SCENES[figure], outputs).items():
+            buffers[figure, fmt, dpi] = buf
+    return buffers
+
+
+def render(figures=None, formats=None, dpi=None, backend='matplotlib', use_server=True):
+    """
+    Encode ``figures`` (default: all) in every one of ``formats`` (default:
+    PNG) at every one of ``dpi`` (default: 300); each may be a single value.
+
+    Returns {(figure, format, dpi): memoryview}. Raises ValueError for an
+    unknown figure, format or backend.
+    """
+    figures = _as_list(figures, figure_scenes.SCENES)
+    formats = _as_list(formats, ['png'])
+    dpis = [int(d) for d in _as_list(dpi, [DEFAULT_DPI])]
+    if backend not in FORMATS:
+        raise ValueError(f"unknown backend: {backend}")
+    unknown = [f for f in figures if f not in figure_scenes.SCENES]
+    if unknown:
+        raise ValueError(f"unknown figure(s): {', '.join(unknown)}")
+    unsupported = [f for f in formats if f not in FORMATS[backend]]
+    if unsupported:
+        raise ValueError(f"unsupported format(s) for {backend}: {', '.join(unsupported)}")
+
+    if use_server:
+        try:
+            return render_server.render_batch(figures, formats, dpis, backend)
+        except render_server.ServerUnavailable:
+            pass
+    return encode(figures, formats, dpis, backend)
+
+
+def write(buffer, path, visual=True):
+    """
+    Write one rendered buffer to ``path`` atomically; returns False if the
+    file was left alone. With ``visual``, an existing PNG that looks the
+    same as the new render (image_diff.same_image) is kept, so its mtime
+    does not trigger rebuilds.
+    """
+    if (visual and str(path).endswith('.png') and os.path.exists(path)
+            and same_image(path, buffer)):
+        return False
+    atomic_write(path, buffer)
+    return True
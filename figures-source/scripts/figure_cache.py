@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Content-hash incremental build cache for the figure generators.
+
+Each figure is keyed on a hash of everything its drawing function depends
+on: the source of the function and of the module-level helpers it calls,
+the module constants it reads (layout numbers, the COLOR_* palette, DPI,
+rcParams), the source files of the modules on the render path, and the
+versions of the rendering libraries. The key and the hash of the written
+output are stored in a per-generator manifest next to the figures, so an
+unchanged figure is skipped without importing the plotting stack at all.
+A stale figure is first looked up in the artifact store shared by all
+checkouts (scripts/artifact_store.py), under the same key minus the
+output directory, and every figure rendered is stored there.
+"""
+
+import builtins
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+from importlib import metadata
+from pathlib import Path
+
+from fanout import atomic_write
+from render_pool import report, run_jobs, span
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "scripts"))
+try:
+    from artifact_store import open_store
+except ImportError:  # figures-source used on its own
+    def open_store():
+        return None
+
+MANIFEST_VERSION = 2
+_PLAIN_TYPES = (str, int, float, bool, tuple, list, dict, type(None))
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file, or None if it does not exist."""
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+def library_versions(*distributions):
+    """Installed versions of the given distributions, without importing them."""
+    versions = {'python': sys.version.split()[0]}
+    for dist in distributions:
+        try:
+            versions[dist] = metadata.version(dist)
+        except metadata.PackageNotFoundError:
+            versions[dist] = None
+    return versions
+
+
+def module_digests(*modules):
+    """
+    SHA-256 of each module's source file, by file name; a module may also
+    be given as the path of its file. For code function_inputs() cannot
+    follow: the render path goes through figure_api and the scene graph
+    into the backend's helpers, none of which the figure's own function
+    calls directly. Pass a generator as its own ``__file__``, not as
+    ``sys.modules['__main__']``, which is the wrapper under ``python -m
+    cProfile`` and the like.
+    """
+    paths = [getattr(module, '__file__', module) for module in modules]
+    return {Path(path).stem: file_digest(path) for path in paths}
+
+
+def _builtin_id(obj):
+    """
+    Stable identifier of a builtin or C function: its qualified name and
+    the version of Python or of the library that provides it.
+    """
+    module = getattr(obj, '__module__', None) or 'builtins'
+    top = module.split('.')[0]
+    version = None if top == 'builtins' else getattr(sys.modules.get(top), '__version__', None)
+    return f"{module}.{getattr(obj, '__qualname__', obj.__name__)} {version or sys.version.split()[0]}"
+
+
+def _code_names(code):
+    """Global names referenced by a code object and any nested code objects."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def function_inputs(func):
+    """
+    Collect the source of ``func`` and everything it reaches in its module.
+
+    Module-level functions are followed transitively; plain constants are
+    recorded by value, as are the arguments bound by a functools.partial.
+    Builtins and C functions are recorded by name and Python or library
+    version. Other imported modules and library objects are covered by the
+    library versions instead.
+    """
+    bound = []
+    while isinstance(func, functools.partial):
+        bound.append([list(func.args), func.keywords])
+        func = func.func
+
+    module_globals = func.__globals__
+    sources, constants, builtins_used = {}, {}, {}
+    pending = [func]
+    while pending:
+        fn = pending.pop()
+        if fn.__name__ in sources:
+            continue
+        sources[fn.__name__] = inspect.getsource(fn)
+        for name in sorted(_code_names(fn.__code__)):
+            # co_names also holds attribute names; those match neither
+            if name in module_globals:
+                obj = module_globals[name]
+            elif hasattr(builtins, name):
+                builtins_used[name] = _builtin_id(getattr(builtins, name))
+                continue
+            else:
+                continue
+            if inspect.isfunction(obj) and obj.__module__ == func.__module__:
+                pending.append(obj)
+            elif inspect.isbuiltin(obj):
+                builtins_used[name] = _builtin_id(obj)
+            elif isinstance(obj, _PLAIN_TYPES):
+                constants[name] = obj
+
+    # The palette is always part of the key, even for figures that only
+    # reach a colour through a default argument.
+    for name, value in module_globals.items():
+        if name.startswith('COLOR_'):
+            constants[name] = value
+
+    return {'sources': sources, 'constants': constants, 'builtins': builtins_used, 'bound': bound}
+
+
+def figure_key(func, extra=None):
+    """Hash of a drawing function's inputs plus any generator-specific extras."""
+    payload = {'version': MANIFEST_VERSION, 'function': function_inputs(func), 'extra': extra}
+    blob = json.dumps(payload, sort_keys=True, default=repr).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class Manifest:
+    """Per-generator record of the key and digest of every output file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.entries = data.get('figures', {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def is_fresh(self, name, key, output):
+        """True if ``output`` was produced from ``key`` and has not been touched since."""
+        entry = self.entries.get(name)
+        if not entry or entry['key'] != key or entry['output'] != output:
+            return False
+        try:
+            st = os.stat(output)
+        except FileNotFoundError:
+            return False
+        if st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']:
+            return True
+        # Touched but possibly unchanged (e.g. a checkout); fall back to content.
+        if file_digest(output) == entry['sha256']:
+            entry['mtime_ns'] = st.st_mtime_ns
+            return True
+        return False
+
+    def record(self, name, figure, key, output):
+        st = os.stat(output)
+        self.entries[name] = {
+            'figure': figure,
+            'key': key,
+            'output': output,
+            'sha256': file_digest(output),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+        }
+
+    def evict(self, figures):
+        """Drop outputs of figures not in ``figures`` and delete the files they own."""
+        removed = []
+        for name in sorted(n for n, e in self.entries.items() if e['figure'] not in figures):
+            entry = self.entries.pop(name)
+            # Only delete the file if it is still the one this generator wrote.
+            if file_digest(entry['output']) == entry['sha256']:
+                os.remove(entry['output'])
+                removed.append(entry['output'])
+        return removed
+
+    def save(self):
+        atomic_write(self.path, json.dumps({'version': MANIFEST_VERSION, 'figures': self.entries},
+                                           indent=2, sort_keys=True).encode())
+
+
+def _portable(func):
+    """
+    ``func`` without its ``out_dir`` binding, so store keys do not depend
+    on where the figures are written.
+    """
+    if isinstance(func, functools.partial) and 'out_dir' in func.keywords:
+        keywords = {k: v for k, v in func.keywords.items() if k != 'out_dir'}
+        return functools.partial(func.func, *func.args, **keywords)
+    return func
+
+
+@functools.lru_cache(maxsize=None)
+def shared_store():
+    """The artifact store shared across checkouts, or None when it is off."""
+    return open_store()
+
+
+def _bytes(paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+def _traced(generator, label, paths, func):
+    """Run one figure job inside a trace span (a no-op unless tracing is on)."""
+    with span('figure', figure=label, generator=generator, cache='miss') as record:
+        func()
+        record['bytes_out'] = _bytes(paths)
+
+
+def build(jobs, generator, out_dir='figures', extra=None, inputs=None, max_workers=None,
+          force=False, threads=False):
+    """
+    Render the stale subset of ``jobs`` and update the manifest.
+
+    ``jobs`` is a list of (figure, output, func) triples; each func writes
+    ``<out_dir>/<output>``. ``output`` may also be a tuple of file names
+    that one call writes together; the job reruns if any of them is
+    stale. ``extra`` is hashed into every key and ``inputs`` maps figure
+    names to figure-specific data (such as a scene digest) that the
+    drawing function reads from another module. Outputs of figures that
+    are no longer in ``jobs`` are evicted. ``threads`` runs the jobs on
+    threads rather than processes (see run_jobs).
+    Returns a process exit code.
+    """
+    inputs = inputs or {}
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(out_dir, f".manifest-{generator}.json"))
+
+    store = shared_store()
+    keys, figures, stale, outputs_of, store_keys = {}, {}, [], {}, {}
+    for figure, outputs, func in jobs:
+        outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
+        label = ' + '.join(outputs)
+        key_extra = {'generator': extra, 'figure': inputs.get(figure)}
+        key = figure_key(func, key_extra)
+        paths = [os.path.join(out_dir, output) for output in outputs]
+        for output in outputs:
+            figures[output], keys[output] = figure, key
+        outputs_of[label] = outputs
+        if force or not all(manifest.is_fresh(o, key, p) for o, p in zip(outputs, paths)):
+            store_key = store and f"{generator}:{figure_key(_portable(func), key_extra)}"
+            store_keys[label] = store_key
+            if not force and store and store.fetch(store_key, dict(zip(outputs, paths))):
+                for output, path in zip(outputs, paths):
+                    manifest.record(output, figure, key, path)
+                with span('figure', figure=label, generator=generator, cache='store') as record:
+                    record['bytes_out'] = _bytes(paths)
+                print(f"· {label} restored from the artifact store")
+                continue
+            stale.append((label, functools.partial(_traced, generator, label, paths, func)))
+        else:
+            with span('figure', figure=label, generator=generator, cache='hit') as record:
+                record['bytes_out'] = _bytes(paths)
+            print(f"· {label} is up to date")
+
+    for path in manifest.evict(set(figures.values())):
+        print(f"✓ Removed stale {path}")
+
+    status = 0
+    if stale:
+        results = run_jobs(stale, max_workers=max_workers, threads=threads)
+        status = report(results)
+        for result in results:
+            if result.ok:
+                written = {}
+                for output in outputs_of[result.name]:
+                    written[output] = os.path.join(out_dir, output)
+                    manifest.record(output, figures[output], keys[output], written[output])
+                if store:
+                    store.store(store_keys[result.name], written, stage=generator)
+    manifest.save()
+    return status
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Scene descriptions of the four architectural figures.
+
+Layers are drawn bottom to top: containers (with their dividers), user
+intents, the highlighted component, arrows, then text labels. This is the
+z-order the figures were first drawn in: the arrows leaving the
+highlighted component are drawn over its edge, not under it.
+"""
+
+from scene_graph import Arrow, Box, Line, Scene, Text
+
+USER_VIZ = 'User Visualization\nIntent\n("show feeds")'
+USER_BEHAV = 'User Behavioral\nIntent\n("anonymize")'
+
+FIG01 = Scene('fig01_current_architecture', 'Figure 1: Current Architecture (Status Quo)', [
+    ('containers', {
+        'ui': Box(0.2, 4.5, 9.6, 3.5, '', 'ui', 'square', 2.5),
+        'cube': Box(0.2, 0.5, 9.6, 3, '', 'cube', 'square', 2.5),
+        'ui_react_divider': Line(0.3, 7.3, 9.7, 7.3),
+        'ui_js_divider': Line(0.3, 5.2, 9.7, 5.2),
+        'cube_api_divider': Line(0.3, 2.8, 9.7, 2.8),
+        'cube_internals_divider': Line(0.3, 2.2, 9.7, 2.2),
+    }),
+    ('intents', {
+        'viz_intent': Box(0.5, 8.5, 2, 0.8, USER_VIZ, 'user'),
+        'behav_intent': Box(7.5, 8.5, 2, 0.8, USER_BEHAV, 'user'),
+    }),
+    ('components', {
+        'translator': Box(6.5, 5.5, 2.5, 1.2, 'Intent\nTranslator\n(embedded)',
+                          'emphasis', 'emphasis'),
+    }),
+    ('arrows', {
+        'viz_intent_down': Arrow(1.5, 8.5, 1.5, 8.0),
+        'behav_intent_down': Arrow(8.5, 8.5, 8.5, 6.7),
+        'viz_to_cube': Arrow(1.5, 7.3, 1.5, 3.5),
+        'translator_to_cube': Arrow(7, 5.5, 4, 3.5, 'multi'),
+    }),
+    ('labels', {
+        'ui_label': Text(5, 7.7, 'ChRIS UI', 11, 'bold'),
+        'react_label': Text(5, 7, 'React Components'),
+        'react_note': Text(2, 6.5, 'handles "show feeds" intent', 8, style='italic'),
+        'js_label': Text(5, 4.9, 'JavaScript Thin Client Library'),
+        'cube_label': Text(5, 3.2, 'CUBE', 11, 'bold'),
+        'cube_api_label': Text(5, 2.5, 'Collection+JSON API'),
+        'cube_internals_label': Text(5, 1.5, 'CUBE Python/Django Internals'),
+    }),
+])
+
+# The null case is the status quo with the translator refactored in place
+FIG02 = FIG01.derive('fig02_null_case', title='Figure 2: Null Case (Do Nothing)', replace={
+    'translator': {'text': 'Intent\nTranslator\n(refactored)'},
+})
+
+FIG03 = Scene('fig03_embedded_cube', 'Figure 3: Embedding Intent Logic Inside CUBE', [
+    ('containers', {
+        'ui': Box(0.2, 5.5, 9.6, 2.5, '', 'ui', 'square', 2.5),
+        'cube': Box(0.2, 0.5, 9.6, 4.5, '', 'cube', 'square', 2.5),
+        'ui_react_divider': Line(0.3, 7.3, 9.7, 7.3),
+        'ui_js_divider': Line(0.3, 6.2, 9.7, 6.2),
+        'cube_api_divider': Line(0.3, 4.3, 9.7, 4.3),
+        'cube_api_split': Line(5, 4.3, 5, 3.8),
+        'cube_internals_divider': Line(0.3, 2.2, 9.7, 2.2),
+    }),
+    ('intents', {
+        'viz_intent': Box(0.5, 8.5, 2, 0.8, 'User Visualization\nIntent', 'user'),
+        'behav_intent': Box(7.5, 8.5, 2, 0.8, 'User Behavioral\nIntent', 'user'),
+    }),
+    ('components', {
+        'intent_handler': Box(6, 2.5, 3, 1, 'Intent Logic\nHandler', 'emphasis', 'emphasis'),
+    }),
+    ('arrows', {
+        'viz_intent_down': Arrow(1.5, 8.5, 1.5, 8.0),
+        'behav_intent_down': Arrow(8.5, 8.5, 8.5, 8.0),
+        'viz_to_cube': Arrow(1.5, 5.5, 1.5, 5.0),
+        'behav_to_cube': Arrow(8.5, 5.5, 8.5, 5.0),
+        'viz_through_api': Arrow(1.5, 4.3, 1.5, 2.2),
+        'behav_to_handler': Arrow(8.5, 4.3, 7.5, 3.5),
+        'handler_to_internals': Arrow(7.5, 2.5, 5, 2.2, 'multi'),
+    }),
+    ('labels', {
+        'ui_label': Text(5, 7.7, 'ChRIS UI', 11, 'bold'),
+        'react_label': Text(5, 7, 'React Components'),
+        'js_label': Text(5, 5.9, 'JavaScript Thin Client Library'),
+        'cube_label': Text(5, 4.7, 'CUBE', 11, 'bold'),
+        'cube_api_label': Text(2.5, 4, 'Collection+JSON API'),
+        'intent_api_label': Text(7.5, 4, 'Intent API'),
+        'cube_internals_label': Text(5, 1.5, 'CUBE Python/Django Internals'),
+    }),
+])
+
+FIG04 = Scene('fig04_external_ias', 'Figure 4: External Intent-Action Service (Proposed)', [
+    ('containers', {
+        'ui': Box(0.2, 6.5, 9.6, 2, '', 'ui', 'square', 2.5),
+        'ias': Box(6, 4, 3.5, 2, '', 'ias', 'square', 2.5),
+        'cube': Box(0.2, 0.5, 9.6, 3, '', 'cube', 'square', 2.5),
+        'ui_react_divider': Line(0.3, 7.9, 9.7, 7.9),
+        'ui_js_divider': Line(0.3, 7.2, 9.7, 7.2),
+        'cube_api_divider': Line(0.3, 2.8, 9.7, 2.8),
+        'cube_internals_divider': Line(0.3, 2.2, 9.7, 2.2),
+    }),
+    ('intents', {
+        'viz_intent': Box(0.5, 8.8, 2, 0.8, USER_VIZ, 'user'),
+        'behav_intent': Box(7.5, 8.8, 2, 0.8, USER_BEHAV, 'user'),
+    }),
+    ('components', {
+        'orchestrator': Box(6.3, 4.3, 2.9, 1.2, 'Intent Logic\nOrchestrator',
+                            'emphasis', 'emphasis'),
+    }),
+    ('arrows', {
+        'viz_intent_down': Arrow(1.5, 8.8, 1.5, 8.5),
+        'behav_intent_down': Arrow(8.5, 8.8, 8.5, 8.5),
+        'viz_to_cube': Arrow(1.5, 6.5, 1.5, 3.5),
+        'behav_to_ias': Arrow(8.5, 6.5, 7.75, 6.0),
+        'ias_to_cube': Arrow(7.5, 4, 5, 3.5, 'multi'),
+    }),
+    ('labels', {
+        'ui_label': Text(5, 8.2, 'ChRIS UI', 11, 'bold'),
+        'react_label': Text(5, 7.6, 'React Components (presentation only)'),
+        'js_label': Text(5, 6.9, 'JavaScript Thin Client Library'),
+        'ias_label': Text(7.75, 5.8, 'Intent-Action\nService (IAS)', 10, 'bold'),
+        'cube_label': Text(5, 3.2, 'CUBE', 11, 'bold'),
+        'cube_api_label': Text(5, 2.5, 'Collection+JSON API'),
+        'cube_internals_label': Text(5, 1.5, 'CUBE Python/Django Internals'),
+        'cube_note': Text(5, 0.9, '(declarative substrate preserved)', 8, style='italic'),
+    }),
+], size=(10, 9))
+
+SCENES = {scene.name: scene for scene in (FIG01, FIG02, FIG03, FIG04)}
+
+# Anchors of the measured-traffic labels that ias-reference/loadtest.py
+# puts next to the client/CUBE arrows: scene -> {arrow id: (x, y)}
+MEASURED_LABELS = {
+    'fig01_current_architecture': {'translator_to_cube': (3.2, 4.0)},
+    'fig04_external_ias': {'behav_to_ias': (5.6, 6.25), 'ias_to_cube': (3.6, 3.95)},
+}
+
+
+def measured(name, labels):
+    """Scene ``name`` with a label ({arrow id: text}) next to each measured arrow."""
+    anchors = MEASURED_LABELS[name]
+    return SCENES[name].derive(f"{name}_measured", add={'labels': {
+        f"{arrow}_measured": Text(*anchors[arrow], text, 8, style='italic')
+        for arrow, text in labels.items()}})
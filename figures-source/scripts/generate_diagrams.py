@@ -1,18 +1,69 @@
 #!/usr/bin/env python3
 """
 Generate publication-quality architectural diagrams for the Intent-Action Service paper.
+
+This is the matplotlib backend for the scene graph in figure_scenes.py.
+
+Figures are independent, so they are rendered in a process pool; use
+``--jobs N`` to control the number of worker processes. Unchanged figures
+are skipped using the build manifest in figures/ (see figure_cache.py).
+
+Output can be PNG, SVG or PDF (``--format``). ``--consumer`` picks the
+format for a document path: PDF for the LaTeX build, SVG for HTML and
+300 DPI PNG for print, which is the default.
 """
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.patches import FancyBboxPatch, FancyArrowPatch
-import matplotlib.lines as mlines
+import argparse
+import functools
+import io
+import os
+import sys
+
+import figure_api
+import figure_scenes
+import render_server
+import scene_graph
+from figure_cache import build, library_versions, module_digests
+from render_pool import Stopwatch, default_jobs
+from scene_graph import XLIM, YLIM, Arrow, Box, Line, Text
 
 # Publication settings
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'Helvetica']
-plt.rcParams['font.size'] = 10
-plt.rcParams['axes.linewidth'] = 1.5
+DPI = 300
+RC_PARAMS = {
+    'font.family': 'sans-serif',
+    'font.sans-serif': ['DejaVu Sans', 'Arial', 'Helvetica'],
+    'font.size': 10,
+    'axes.linewidth': 1.5,
+    'svg.hashsalt': 'intent-action-service',  # stable element ids in SVG output
+}
+
+FORMATS = ('png', 'svg', 'pdf')
+CONSUMERS = {
+    'print': ['png'],
+    'latex': ['pdf'],
+    'html': ['svg'],
+}
+# Drop timestamps so vector output is byte-for-byte reproducible
+SAVE_METADATA = {
+    'pdf': {'CreationDate': None, 'ModDate': None},
+    'svg': {'Date': None},
+    'png': {},
+}
+
+# matplotlib is imported on first use so that up-to-date checks stay cheap
+plt = mpatches = FancyBboxPatch = FancyArrowPatch = None
+
+def load_matplotlib():
+    """Import matplotlib and apply the publication settings."""
+    global plt, mpatches, FancyBboxPatch, FancyArrowPatch
+    if plt is not None:
+        return
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as mpatches
+    from matplotlib.patches import FancyBboxPatch, FancyArrowPatch
+    plt.rcParams.update(RC_PARAMS)
 
 # Color scheme (professional, colorblind-friendly)
 COLOR_USER = '#E8F4F8'      # Light blue
@@ -70,235 +121,169 @@ def add_arrow(ax, x1, y1, x2, y2, style='single', color=COLOR_ARROW):
                                mutation_scale=20)
         ax.add_patch(arrow)
 
-def create_figure_01_current_architecture():
-    """Figure 1: Current Architecture (Status Quo)"""
-    fig, ax = plt.subplots(figsize=(10, 8))
-    ax.set_xlim(0, 10)
-    ax.set_ylim(0, 10)
+PALETTE = {
+    'user': COLOR_USER,
+    'ui': COLOR_UI,
+    'ias': COLOR_IAS,
+    'cube': COLOR_CUBE,
+    'emphasis': COLOR_EMPHASIS,
+    'border': COLOR_BORDER,
+    'arrow': COLOR_ARROW,
+    'text': 'black',
+}
+
+def draw_scene(ax, scene):
+    """Draw every element of a scene onto a 0-10 data-unit axes."""
+    for _, _, element in scene.elements():
+        if isinstance(element, Box):
+            add_box(ax, element.x, element.y, element.width, element.height, element.text,
+                    PALETTE[element.color], style=element.style, linewidth=element.linewidth)
+        elif isinstance(element, Arrow):
+            add_arrow(ax, element.x1, element.y1, element.x2, element.y2,
+                      style=element.style, color=PALETTE[element.color])
+        elif isinstance(element, Line):
+            ax.plot([element.x1, element.x2], [element.y1, element.y2],
+                    color=PALETTE[element.color], linewidth=element.linewidth)
+        elif isinstance(element, Text):
+            ax.text(element.x, element.y, element.text, ha='center', va='center',
+                    fontsize=element.fontsize, weight=element.weight, style=element.style,
+                    color=PALETTE[element.color])
+
+def draw_figure(scene, watch):
+    """Draw a scene on a new figure, ready to save; returns the figure."""
+    load_matplotlib()
+    fig, ax = plt.subplots(figsize=scene.size)
+    ax.set_xlim(*XLIM)
+    ax.set_ylim(*YLIM)
     ax.axis('off')
+    watch.lap('setup')
 
-    # User intents at top
-    add_box(ax, 0.5, 8.5, 2, 0.8, 'User Visualization\nIntent\n("show feeds")', COLOR_USER)
-    add_box(ax, 7.5, 8.5, 2, 0.8, 'User Behavioral\nIntent\n("anonymize")', COLOR_USER)
-
-    # ChRIS UI container
-    add_box(ax, 0.2, 4.5, 9.6, 3.5, '', COLOR_UI, style='square', linewidth=2.5)
-    ax.text(5, 7.7, 'ChRIS UI', ha='center', va='center', fontsize=11, weight='bold')
-
-    # React components layer
-    ax.plot([0.3, 9.7], [7.3, 7.3], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 7, 'React Components', ha='center', va='center', fontsize=9)
-    ax.text(2, 6.5, 'handles "show feeds" intent', ha='center', va='center', fontsize=8, style='italic')
-
-    # Intent Translator (emphasized)
-    add_box(ax, 6.5, 5.5, 2.5, 1.2, 'Intent\nTranslator\n(embedded)', COLOR_EMPHASIS, style='emphasis', linewidth=2)
+    draw_scene(ax, scene)
 
-    # JS library layer
-    ax.plot([0.3, 9.7], [5.2, 5.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 4.9, 'JavaScript Thin Client Library', ha='center', va='center', fontsize=9)
-
-    # CUBE container
-    add_box(ax, 0.2, 0.5, 9.6, 3, '', COLOR_CUBE, style='square', linewidth=2.5)
-    ax.text(5, 3.2, 'CUBE', ha='center', va='center', fontsize=11, weight='bold')
-
-    ax.plot([0.3, 9.7], [2.8, 2.8], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 2.5, 'Collection+JSON API', ha='center', va='center', fontsize=9)
-
-    ax.plot([0.3, 9.7], [2.2, 2.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 1.5, 'CUBE Python/Django Internals', ha='center', va='center', fontsize=9)
-
-    # Arrows
-    add_arrow(ax, 1.5, 8.5, 1.5, 8.0)  # Viz intent down
-    add_arrow(ax, 8.5, 8.5, 8.5, 6.7)  # Behavioral intent down
-
-    add_arrow(ax, 1.5, 7.3, 1.5, 3.5)  # Viz through to CUBE
-
-    # Multiple arrows from Intent Translator to CUBE
-    add_arrow(ax, 7, 5.5, 4, 3.5, style='multi')
-
-    plt.title('Figure 1: Current Architecture (Status Quo)', fontsize=12, weight='bold', pad=20)
+    plt.title(scene.title, fontsize=12, weight='bold', pad=20)
+    watch.lap('draw')
     plt.tight_layout()
-    plt.savefig('figures/fig01_current_architecture.png', dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Generated fig01_current_architecture.png")
-
-def create_figure_02_null_case():
-    """Figure 2: Null Case (Do Nothing) - nearly identical to Figure 1"""
-    fig, ax = plt.subplots(figsize=(10, 8))
-    ax.set_xlim(0, 10)
-    ax.set_ylim(0, 10)
-    ax.axis('off')
-
-    # User intents at top
-    add_box(ax, 0.5, 8.5, 2, 0.8, 'User Visualization\nIntent\n("show feeds")', COLOR_USER)
-    add_box(ax, 7.5, 8.5, 2, 0.8, 'User Behavioral\nIntent\n("anonymize")', COLOR_USER)
-
-    # ChRIS UI container
-    add_box(ax, 0.2, 4.5, 9.6, 3.5, '', COLOR_UI, style='square', linewidth=2.5)
-    ax.text(5, 7.7, 'ChRIS UI', ha='center', va='center', fontsize=11, weight='bold')
-
-    # React components layer
-    ax.plot([0.3, 9.7], [7.3, 7.3], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 7, 'React Components', ha='center', va='center', fontsize=9)
-    ax.text(2, 6.5, 'handles "show feeds" intent', ha='center', va='center', fontsize=8, style='italic')
-
-    # Intent Translator (refactored but still embedded)
-    add_box(ax, 6.5, 5.5, 2.5, 1.2, 'Intent\nTranslator\n(refactored)', COLOR_EMPHASIS, style='emphasis', linewidth=2)
-
-    # JS library layer
-    ax.plot([0.3, 9.7], [5.2, 5.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 4.9, 'JavaScript Thin Client Library', ha='center', va='center', fontsize=9)
-
-    # CUBE container
-    add_box(ax, 0.2, 0.5, 9.6, 3, '', COLOR_CUBE, style='square', linewidth=2.5)
-    ax.text(5, 3.2, 'CUBE', ha='center', va='center', fontsize=11, weight='bold')
-
-    ax.plot([0.3, 9.7], [2.8, 2.8], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 2.5, 'Collection+JSON API', ha='center', va='center', fontsize=9)
-
-    ax.plot([0.3, 9.7], [2.2, 2.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 1.5, 'CUBE Python/Django Internals', ha='center', va='center', fontsize=9)
+    watch.lap('tight_layout')
+    return fig
+
+def save_figure(fig, target, fmt, dpi=DPI):
+    """Encode a drawn figure to a path or binary file object."""
+    fig.savefig(target, format=fmt, dpi=dpi, bbox_inches='tight', facecolor='white',
+                metadata=SAVE_METADATA.get(fmt))
+
+def render_scene(scene, path, dpi=DPI, timings=None, fmt=None):
+    """
+    Render a scene to ``path`` with matplotlib; the extension picks the
+    format unless ``fmt`` is given (required when ``path`` is a file object).
+
+    ``timings``, if given, accumulates seconds per phase (setup, draw,
+    tight_layout, savefig).
+    """
+    watch = Stopwatch(timings)
+    fig = draw_figure(scene, watch)
+    save_figure(fig, path, fmt or os.path.splitext(path)[1].lstrip('.'), dpi)
+    plt.close(fig)
+    watch.lap('savefig')
+
+def encode_scene(scene, outputs):
+    """
+    Draw a scene once and encode it for each (format, dpi) in ``outputs``;
+    returns {(format, dpi): memoryview}.
+    """
+    fig = draw_figure(scene, Stopwatch())
+    buffers = {}
+    try:
+        for fmt, dpi in outputs:
+            buf = io.BytesIO()
+            save_figure(fig, buf, fmt, dpi)
+            buffers[fmt, dpi] = buf.getbuffer()
+    finally:
+        plt.close(fig)
+    return buffers
+
+def output_name(name, fmt='png', dpi=DPI):
+    """File name for a figure; off-default PNG resolutions get a suffix."""
+    if fmt == 'png' and dpi != DPI:
+        return f'{name}-{dpi}dpi.png'
+    return f'{name}.{fmt}'
+
+def render_figure(name, fmt='png', dpi=DPI, out_dir='figures'):
+    """Render the named figure from figure_scenes into ``out_dir`` (see figure_api.py)."""
+    filename = output_name(name, fmt, dpi)
+    buffers = figure_api.render([name], [fmt], [dpi], backend='matplotlib')
+    if figure_api.write(buffers[name, fmt, dpi], os.path.join(out_dir, filename)):
+        print(f"✓ Generated {filename}")
+    else:
+        print(f"· {filename} unchanged")
 
-    # Arrows
-    add_arrow(ax, 1.5, 8.5, 1.5, 8.0)
-    add_arrow(ax, 8.5, 8.5, 8.5, 6.7)
-    add_arrow(ax, 1.5, 7.3, 1.5, 3.5)
-    add_arrow(ax, 7, 5.5, 4, 3.5, style='multi')
+def create_figure_01_current_architecture(fmt='png', dpi=DPI, out_dir='figures'):
+    """Figure 1: Current Architecture (Status Quo)"""
+    render_figure('fig01_current_architecture', fmt, dpi, out_dir)
 
-    plt.title('Figure 2: Null Case (Do Nothing)', fontsize=12, weight='bold', pad=20)
-    plt.tight_layout()
-    plt.savefig('figures/fig02_null_case.png', dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Generated fig02_null_case.png")
+def create_figure_02_null_case(fmt='png', dpi=DPI, out_dir='figures'):
+    """Figure 2: Null Case (Do Nothing) - Figure 1 with a refactored translator"""
+    render_figure('fig02_null_case', fmt, dpi, out_dir)
 
-def create_figure_03_embedded_cube():
+def create_figure_03_embedded_cube(fmt='png', dpi=DPI, out_dir='figures'):
     """Figure 3: Embedded Intent Logic Inside CUBE"""
-    fig, ax = plt.subplots(figsize=(10, 8))
-    ax.set_xlim(0, 10)
-    ax.set_ylim(0, 10)
-    ax.axis('off')
-
-    # User intents at top
-    add_box(ax, 0.5, 8.5, 2, 0.8, 'User Visualization\nIntent', COLOR_USER)
-    add_box(ax, 7.5, 8.5, 2, 0.8, 'User Behavioral\nIntent', COLOR_USER)
-
-    # ChRIS UI container (simpler now)
-    add_box(ax, 0.2, 5.5, 9.6, 2.5, '', COLOR_UI, style='square', linewidth=2.5)
-    ax.text(5, 7.7, 'ChRIS UI', ha='center', va='center', fontsize=11, weight='bold')
-
-    # React components layer
-    ax.plot([0.3, 9.7], [7.3, 7.3], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 7, 'React Components', ha='center', va='center', fontsize=9)
+    render_figure('fig03_embedded_cube', fmt, dpi, out_dir)
 
-    # JS library layer
-    ax.plot([0.3, 9.7], [6.2, 6.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 5.9, 'JavaScript Thin Client Library', ha='center', va='center', fontsize=9)
-
-    # CUBE container (now contains intent logic)
-    add_box(ax, 0.2, 0.5, 9.6, 4.5, '', COLOR_CUBE, style='square', linewidth=2.5)
-    ax.text(5, 4.7, 'CUBE', ha='center', va='center', fontsize=11, weight='bold')
-
-    # Dual API layer
-    ax.plot([0.3, 9.7], [4.3, 4.3], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(2.5, 4, 'Collection+JSON API', ha='center', va='center', fontsize=9)
-    ax.text(7.5, 4, 'Intent API', ha='center', va='center', fontsize=9)
-    ax.plot([5, 5], [4.3, 3.8], color=COLOR_BORDER, linewidth=1.5)  # Vertical divider
-
-    # Intent Logic Handler (emphasized)
-    add_box(ax, 6, 2.5, 3, 1, 'Intent Logic\nHandler', COLOR_EMPHASIS, style='emphasis', linewidth=2)
-
-    ax.plot([0.3, 9.7], [2.2, 2.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 1.5, 'CUBE Python/Django Internals', ha='center', va='center', fontsize=9)
-
-    # Arrows
-    add_arrow(ax, 1.5, 8.5, 1.5, 8.0)
-    add_arrow(ax, 8.5, 8.5, 8.5, 8.0)
-
-    add_arrow(ax, 1.5, 5.5, 1.5, 5.0)  # Viz path
-    add_arrow(ax, 8.5, 5.5, 8.5, 5.0)  # Behavioral path
-
-    add_arrow(ax, 1.5, 4.3, 1.5, 2.2)  # Viz through Cj API
-    add_arrow(ax, 8.5, 4.3, 7.5, 3.5)  # Behavioral to Intent Handler
-
-    # Multiple arrows from Intent Handler to internals
-    add_arrow(ax, 7.5, 2.5, 5, 2.2, style='multi')
-
-    plt.title('Figure 3: Embedding Intent Logic Inside CUBE', fontsize=12, weight='bold', pad=20)
-    plt.tight_layout()
-    plt.savefig('figures/fig03_embedded_cube.png', dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Generated fig03_embedded_cube.png")
-
-def create_figure_04_external_ias():
+def create_figure_04_external_ias(fmt='png', dpi=DPI, out_dir='figures'):
     """Figure 4: External Intent-Action Service"""
-    fig, ax = plt.subplots(figsize=(10, 9))
-    ax.set_xlim(0, 10)
-    ax.set_ylim(0, 10)
-    ax.axis('off')
-
-    # User intents at top
-    add_box(ax, 0.5, 8.8, 2, 0.8, 'User Visualization\nIntent\n("show feeds")', COLOR_USER)
-    add_box(ax, 7.5, 8.8, 2, 0.8, 'User Behavioral\nIntent\n("anonymize")', COLOR_USER)
-
-    # ChRIS UI container (thin again)
-    add_box(ax, 0.2, 6.5, 9.6, 2, '', COLOR_UI, style='square', linewidth=2.5)
-    ax.text(5, 8.2, 'ChRIS UI', ha='center', va='center', fontsize=11, weight='bold')
-
-    # React components layer
-    ax.plot([0.3, 9.7], [7.9, 7.9], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 7.6, 'React Components (presentation only)', ha='center', va='center', fontsize=9)
+    render_figure('fig04_external_ias', fmt, dpi, out_dir)
+
+FIGURES = [
+    ('fig01_current_architecture', create_figure_01_current_architecture),
+    ('fig02_null_case', create_figure_02_null_case),
+    ('fig03_embedded_cube', create_figure_03_embedded_cube),
+    ('fig04_external_ias', create_figure_04_external_ias),
+]
+
+def parse_formats(value):
+    formats = [fmt.strip() for fmt in value.split(',') if fmt.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unsupported format(s): {', '.join(sorted(unknown))}")
+    return formats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-j', '--jobs', type=int, default=default_jobs(),
+                        help='number of figures to render in parallel (default: CPU count)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='re-render every figure, ignoring the build manifest')
+    parser.add_argument('--format', type=parse_formats,
+                        help=f"comma-separated output formats from {', '.join(FORMATS)} "
+                             "(overrides --consumer)")
+    parser.add_argument('--consumer', choices=sorted(CONSUMERS), default='print',
+                        help='document path the figures are for (default: print)')
+    parser.add_argument('--dpi', type=int, default=DPI,
+                        help=f'PNG resolution (default: {DPI}); e.g. 100 for screen-sized PNGs')
+    parser.add_argument('-o', '--out-dir', default='figures',
+                        help='output directory (default: figures)')
+    args = parser.parse_args(argv)
+    formats = args.format or CONSUMERS[args.consumer]
 
-    # JS library layer
-    ax.plot([0.3, 9.7], [7.2, 7.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 6.9, 'JavaScript Thin Client Library', ha='center', va='center', fontsize=9)
-
-    # IAS container (separate service - emphasized)
-    add_box(ax, 6, 4, 3.5, 2, '', COLOR_IAS, style='square', linewidth=2.5)
-    ax.text(7.75, 5.8, 'Intent-Action\nService (IAS)', ha='center', va='center', fontsize=10, weight='bold')
-
-    # Intent Logic Orchestrator
-    add_box(ax, 6.3, 4.3, 2.9, 1.2, 'Intent Logic\nOrchestrator', COLOR_EMPHASIS, style='emphasis', linewidth=2)
-
-    # CUBE container
-    add_box(ax, 0.2, 0.5, 9.6, 3, '', COLOR_CUBE, style='square', linewidth=2.5)
-    ax.text(5, 3.2, 'CUBE', ha='center', va='center', fontsize=11, weight='bold')
-
-    ax.plot([0.3, 9.7], [2.8, 2.8], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 2.5, 'Collection+JSON API', ha='center', va='center', fontsize=9)
-
-    ax.plot([0.3, 9.7], [2.2, 2.2], color=COLOR_BORDER, linewidth=1.5)
-    ax.text(5, 1.5, 'CUBE Python/Django Internals', ha='center', va='center', fontsize=9)
-    ax.text(5, 0.9, '(declarative substrate preserved)', ha='center', va='center', fontsize=8, style='italic')
-
-    # Arrows - visualization path bypasses IAS
-    add_arrow(ax, 1.5, 8.8, 1.5, 8.5)
-    add_arrow(ax, 8.5, 8.8, 8.5, 8.5)
-
-    # Viz goes straight to CUBE
-    add_arrow(ax, 1.5, 6.5, 1.5, 3.5)
-
-    # Behavioral goes through IAS
-    add_arrow(ax, 8.5, 6.5, 7.75, 6.0)
-
-    # IAS to CUBE (multiple arrows showing orchestration)
-    add_arrow(ax, 7.5, 4, 5, 3.5, style='multi')
-
-    plt.title('Figure 4: External Intent-Action Service (Proposed)', fontsize=12, weight='bold', pad=20)
-    plt.tight_layout()
-    plt.savefig('figures/fig04_external_ias.png', dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Generated fig04_external_ias.png")
-
-if __name__ == '__main__':
     print("Generating publication-quality architectural diagrams...")
     print()
 
-    create_figure_01_current_architecture()
-    create_figure_02_null_case()
-    create_figure_03_embedded_cube()
-    create_figure_04_external_ias()
+    jobs = [(name, output_name(name, fmt, args.dpi),
+             functools.partial(func, fmt=fmt, dpi=args.dpi, out_dir=args.out_dir))
+            for name, func in FIGURES for fmt in formats]
+    extra = {'libraries': library_versions('matplotlib'),
+             'modules': module_digests(__file__, scene_graph, figure_api)}
+    scenes = {name: figure_scenes.SCENES[name].digest() for name, _ in FIGURES}
+    # With a warm server the jobs only wait on its socket, so threads will do
+    status = build(jobs, 'matplotlib', out_dir=args.out_dir, extra=extra, inputs=scenes,
+                   max_workers=args.jobs, force=args.force, threads=render_server.available())
+
+    if status == 0:
+        print()
+        print(f"✓ All diagrams up to date in {args.out_dir}/")
+        if 'png' in formats:
+            print(f"  Resolution: {args.dpi} DPI")
+        print(f"  Format: {', '.join(fmt.upper() for fmt in formats)} with white background")
+    return status
 
-    print()
-    print("✓ All diagrams generated successfully in figures/")
-    print("  Resolution: 300 DPI (publication quality)")
-    print("  Format: PNG with white background")
+if __name__ == '__main__':
+    sys.exit(main())
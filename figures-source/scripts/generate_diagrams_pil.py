@@ -1,10 +1,48 @@
 #!/usr/bin/env python3
 """
 Generate publication-quality architectural diagrams using PIL/Pillow.
+
+This is the PIL backend for the scene graph in figure_scenes.py. Text
+goes through the cached font and layout engine in pil_text.py.
+
+Each scene is rasterised once, SUPERSAMPLE times larger than the largest
+output it is needed at, and every output resolution (``--resolution
+print,screen,thumb``) is a reduction of that one raster (a box average
+at the exact supersampling factor, Lanczos otherwise), which also
+antialiases the lines and arrowheads. The DPI in each PNG is the
+one it was reduced to.
+
+Unchanged figures are skipped using the build manifest in figures/
+(see figure_cache.py).
 """
 
-from PIL import Image, ImageDraw, ImageFont
-import os
+import argparse
+import functools
+import io
+import math
+import sys
+
+from PIL import Image, ImageDraw
+
+import figure_api
+import figure_scenes
+import pil_text
+import render_server
+import scene_graph
+from figure_cache import build, library_versions, module_digests
+from pil_text import FontSpec
+from render_pool import Stopwatch, default_jobs
+from scene_graph import XLIM, YLIM, Arrow, Box, Line, Text
+
+# Output resolutions in pixels per inch of the scene's page size
+RESOLUTIONS = {
+    'print': 300,
+    'screen': 140,
+    'thumb': 48,
+}
+SUPERSAMPLE = 2
+# Other reductions go box-reduce then Lanczos once the factor exceeds this
+REDUCING_GAP = 2.0
 
 # Colors (professional, colorblind-friendly)
 COLOR_USER = (232, 244, 248)      # Light blue
@@ -16,276 +54,258 @@ COLOR_BORDER = (51, 51, 51)       # Dark grey
 COLOR_ARROW = (85, 85, 85)        # Medium grey
 COLOR_BG = (255, 255, 255)        # White
 
-# Try to load a nice font, fallback to default
-try:
-    font_large = ImageFont.truetype("/system/fonts/Roboto-Regular.ttf", 28)
-    font_med = ImageFont.truetype("/system/fonts/Roboto-Regular.ttf", 22)
-    font_small = ImageFont.truetype("/system/fonts/Roboto-Regular.ttf", 18)
-    font_tiny = ImageFont.truetype("/system/fonts/Roboto-Italic.ttf", 16)
-except:
-    font_large = ImageFont.load_default()
-    font_med = ImageFont.load_default()
-    font_small = ImageFont.load_default()
-    font_tiny = ImageFont.load_default()
+# Fonts by face and pixel size, resolved through pil_text's search path
+FONT_LARGE = FontSpec('regular', 28)
+FONT_MED = FontSpec('regular', 22)
+FONT_SMALL = FontSpec('regular', 18)
+FONT_TINY = FontSpec('italic', 16)
+
+PALETTE = {
+    'user': COLOR_USER,
+    'ui': COLOR_UI,
+    'ias': COLOR_IAS,
+    'cube': COLOR_CUBE,
+    'emphasis': COLOR_EMPHASIS,
+    'border': COLOR_BORDER,
+    'arrow': COLOR_ARROW,
+    'text': COLOR_BORDER,
+}
+
+# Page geometry: scenes are sized in inches and laid out in 0-10 data
+# units. Pixel sizes below are at PX_PER_INCH and multiplied by ``scale``.
+PX_PER_INCH = 140
+TITLE_BAND = 80
 
 def draw_rounded_rect(draw, xy, fill, outline, width=3, radius=15):
     """Draw a rounded rectangle."""
     x0, y0, x1, y1 = xy
     draw.rounded_rectangle(xy, radius=radius, fill=fill, outline=outline, width=width)
 
-def draw_box(draw, x, y, w, h, text, fill_color, border_color=COLOR_BORDER, border_width=3, font=font_small):
-    """Draw a box with centered text."""
-    draw_rounded_rect(draw, (x, y, x+w, y+h), fill=fill_color, outline=border_color, width=border_width)
-
-    # Draw text centered
-    lines = text.split('\n')
-    total_height = len(lines) * 25
-    start_y = y + (h - total_height) // 2
-
-    for i, line in enumerate(lines):
-        bbox = draw.textbbox((0, 0), line, font=font)
-        text_width = bbox[2] - bbox[0]
-        draw.text((x + (w - text_width) // 2, start_y + i * 25), line, fill=COLOR_BORDER, font=font)
+def draw_centered_text(draw, cx, cy, text, font, fill=COLOR_BORDER):
+    """Draw (possibly multi-line) text centred on a point."""
+    pil_text.draw_text(draw, cx, cy, text, font, fill)
 
-def draw_arrow(draw, x1, y1, x2, y2, color=COLOR_ARROW, width=4, multi=False):
+def draw_box(draw, x, y, w, h, text, fill_color, border_color=COLOR_BORDER, border_width=3, font=FONT_SMALL, rounded=True, scale=1):
+    """Draw a box with centered text."""
+    if rounded:
+        draw_rounded_rect(draw, (x, y, x+w, y+h), fill=fill_color, outline=border_color, width=border_width,
+                          radius=round(15 * scale))
+    else:
+        draw.rectangle((x, y, x+w, y+h), fill=fill_color, outline=border_color, width=border_width)
+
+    if text:
+        draw_centered_text(draw, x + w // 2, y + h // 2, text, scaled(font, scale))
+
+def draw_arrowhead(draw, x1, y1, x2, y2, length, half_width, color):
+    """Draw a filled arrowhead at (x2, y2) pointing along the segment."""
+    dx, dy = x2 - x1, y2 - y1
+    norm = math.hypot(dx, dy) or 1
+    ux, uy = dx / norm, dy / norm
+    bx, by = x2 - ux * length, y2 - uy * length
+    draw.polygon([(x2, y2),
+                  (bx - uy * half_width, by + ux * half_width),
+                  (bx + uy * half_width, by - ux * half_width)], fill=color)
+
+def draw_arrow(draw, x1, y1, x2, y2, color=COLOR_ARROW, width=4, multi=False, scale=1):
     """Draw an arrow or multiple parallel arrows."""
     if multi:
         # Draw 4 parallel arrows
         offsets = [-20, -7, 7, 20]
         for offset in offsets:
-            draw.line([(x1+offset, y1), (x2+offset, y2)], fill=color, width=2)
-            # Arrowhead
-            if y2 > y1:  # Downward
-                draw.polygon([(x2+offset, y2), (x2+offset-6, y2-12), (x2+offset+6, y2-12)], fill=color)
-            else:  # Upward
-                draw.polygon([(x2+offset, y2), (x2+offset-6, y2+12), (x2+offset+6, y2+12)], fill=color)
+            offset = round(offset * scale)
+            draw.line([(x1+offset, y1), (x2+offset, y2)], fill=color, width=round(2 * scale))
+            draw_arrowhead(draw, x1+offset, y1, x2+offset, y2, 12 * scale, 6 * scale, color)
     else:
-        # Single arrow
-        draw.line([(x1, y1), (x2, y2)], fill=color, width=width)
-        # Arrowhead
-        if y2 > y1:  # Downward
-            draw.polygon([(x2, y2), (x2-10, y2-20), (x2+10, y2-20)], fill=color)
-        else:  # Upward
-            draw.polygon([(x2, y2), (x2-10, y2+20), (x2+10, y2+20)], fill=color)
-
-def create_figure_01():
-    """Figure 1: Current Architecture"""
-    img = Image.new('RGB', (1400, 1200), COLOR_BG)
-    draw = ImageDraw.Draw(img)
-
-    # Title
-    draw.text((700, 30), "Figure 1: Current Architecture (Status Quo)", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # User intents
-    draw_box(draw, 100, 100, 280, 100, "User Visualization\nIntent\n(\"show feeds\")", COLOR_USER)
-    draw_box(draw, 1020, 100, 280, 100, "User Behavioral\nIntent\n(\"anonymize\")", COLOR_USER)
-
-    # ChRIS UI container
-    draw_rounded_rect(draw, (50, 280, 1350, 700), fill=COLOR_UI, outline=COLOR_BORDER, width=4)
-    draw.text((700, 310), "ChRIS UI", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # React layer
-    draw.line([(60, 360), (1340, 360)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 400), "React Components", fill=COLOR_BORDER, font=font_med, anchor="mm")
-    draw.text((280, 450), "handles \"show feeds\" intent", fill=COLOR_ARROW, font=font_tiny, anchor="mm")
-
-    # Intent Translator
-    draw_rounded_rect(draw, (900, 490, 1200, 640), fill=COLOR_EMPHASIS, outline=COLOR_BORDER, width=3)
-    draw.text((1050, 565), "Intent\nTranslator\n(embedded)", fill=COLOR_BORDER, font=font_small, anchor="mm")
-
-    # JS library
-    draw.line([(60, 660), (1340, 660)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 680), "JavaScript Thin Client Library", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # CUBE container
-    draw_rounded_rect(draw, (50, 760, 1350, 1120), fill=COLOR_CUBE, outline=COLOR_BORDER, width=4)
-    draw.text((700, 790), "CUBE", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    draw.line([(60, 850), (1340, 850)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 880), "Collection+JSON API", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    draw.line([(60, 950), (1340, 950)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 1000), "CUBE Python/Django Internals", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # Arrows
-    draw_arrow(draw, 240, 200, 240, 280)  # Viz intent down
-    draw_arrow(draw, 1160, 200, 1160, 280)  # Behavioral intent down
-    draw_arrow(draw, 240, 360, 240, 760)  # Viz to CUBE
-    draw_arrow(draw, 1050, 640, 700, 760, multi=True)  # Intent Translator to CUBE (multiple)
-
-    img.save('figures/fig01_current_architecture.png', dpi=(300, 300))
-    print("✓ Generated fig01_current_architecture.png")
-
-def create_figure_02():
-    """Figure 2: Null Case"""
-    img = Image.new('RGB', (1400, 1200), COLOR_BG)
+        draw.line([(x1, y1), (x2, y2)], fill=color, width=round(width * scale))
+        draw_arrowhead(draw, x1, y1, x2, y2, 20 * scale, 10 * scale, color)
+
+def font_for(fontsize, style='normal', weight='normal'):
+    """Pick the font for a text element's point size, style and weight."""
+    if style == 'italic':
+        return FONT_TINY
+    font = FONT_LARGE if fontsize >= 11 else FONT_MED
+    return font._replace(face='bold') if weight == 'bold' else font
+
+def scaled(font, scale):
+    return font._replace(size=round(font.size * scale))
+
+def raster_scale(dpi):
+    """Scale at which to draw a scene that will be reduced to ``dpi``."""
+    return dpi * SUPERSAMPLE / PX_PER_INCH
+
+def canvas_size(scene, scale=1):
+    width, height = scene.size
+    return round(width * PX_PER_INCH * scale), round((height * PX_PER_INCH + TITLE_BAND) * scale)
+
+def to_px(scene, x, y, scale=1):
+    """Map data units (origin bottom-left) to pixels (origin top-left)."""
+    width, height = canvas_size(scene, scale)
+    band = TITLE_BAND * scale
+    sx = width / (XLIM[1] - XLIM[0])
+    sy = (height - band) / (YLIM[1] - YLIM[0])
+    return round((x - XLIM[0]) * sx), round(band + (YLIM[1] - y) * sy)
+
+def line_width(points, scale=1):
+    """Convert a matplotlib line width in points to pixels."""
+    return max(1, round(points * PX_PER_INCH * scale / 72))
+
+def draw_layer(draw, scene, items, scale=1):
+    """Draw the elements of one scene layer."""
+    for _, element in items:
+        if isinstance(element, Box):
+            x0, y0 = to_px(scene, element.x, element.y + element.height, scale)
+            x1, y1 = to_px(scene, element.x + element.width, element.y, scale)
+            draw_box(draw, x0, y0, x1 - x0, y1 - y0, element.text, PALETTE[element.color],
+                     border_width=line_width(element.linewidth, scale),
+                     rounded=element.style != 'square', scale=scale)
+        elif isinstance(element, Arrow):
+            x1, y1 = to_px(scene, element.x1, element.y1, scale)
+            x2, y2 = to_px(scene, element.x2, element.y2, scale)
+            draw_arrow(draw, x1, y1, x2, y2, color=PALETTE[element.color],
+                       multi=element.style == 'multi', scale=scale)
+        elif isinstance(element, Line):
+            draw.line([to_px(scene, element.x1, element.y1, scale),
+                       to_px(scene, element.x2, element.y2, scale)],
+                      fill=PALETTE[element.color], width=line_width(element.linewidth, scale))
+        elif isinstance(element, Text):
+            x, y = to_px(scene, element.x, element.y, scale)
+            font = scaled(font_for(element.fontsize, element.style, element.weight), scale)
+            draw_centered_text(draw, x, y, element.text, font, fill=PALETTE[element.color])
+
+def rasterize(scene, scale=1):
+    """Return the finished image for a scene, drawn at ``scale``."""
+    img = Image.new('RGB', canvas_size(scene, scale), COLOR_BG)
     draw = ImageDraw.Draw(img)
+    for _, items in scene.layers:
+        draw_layer(draw, scene, items, scale)
+    draw.text((img.width // 2, round(30 * scale)), scene.title, fill=COLOR_BORDER,
+              font=pil_text.get_font(*scaled(FONT_LARGE, scale)), anchor="mm")
+    return img
+
+def reduce(scene, img, dpi):
+    """The supersampled raster ``img`` reduced to the scene's size at ``dpi``."""
+    size = canvas_size(scene, dpi / PX_PER_INCH)
+    if img.size == size:
+        return img
+    factor = round(img.width / size[0])
+    exact = (size[0] * factor, size[1] * factor)
+    if factor > 1 and 0 <= img.width - exact[0] <= 1 and 0 <= img.height - exact[1] <= 1:
+        # The supersampling factor itself (up to rounding of the canvas):
+        # average each factor x factor block
+        return img.reduce(factor, box=(0, 0, *exact))
+    return img.resize(size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def render_scene(scene, path, timings=None, fmt=None, dpi=RESOLUTIONS['print']):
+    """
+    Render a scene at ``dpi`` to ``path`` (a file name or, with ``fmt``, a
+    file object) with PIL; ``timings`` collects draw/resize/save seconds.
+    """
+    watch = Stopwatch(timings)
+    img = rasterize(scene, raster_scale(dpi))
+    watch.lap('draw')
+    img = reduce(scene, img, dpi)
+    watch.lap('resize')
+    img.save(path, format=fmt, dpi=(dpi, dpi))
+    watch.lap('save')
+
+def encode_scene(scene, outputs):
+    """
+    Rasterise a scene once, supersampled for the largest DPI in
+    ``outputs``, and reduce and encode it for each (format, dpi); returns
+    {(format, dpi): memoryview}.
+    """
+    unsupported = {fmt for fmt, _ in outputs} - {'png'}
+    if unsupported:
+        raise ValueError(f"PIL backend writes PNG only, not {', '.join(sorted(unsupported))}")
+    img = rasterize(scene, raster_scale(max(dpi for _, dpi in outputs)))
+    buffers = {}
+    for fmt, dpi in outputs:
+        buf = io.BytesIO()
+        reduce(scene, img, dpi).save(buf, format='png', dpi=(dpi, dpi))
+        buffers[fmt, dpi] = buf.getbuffer()
+    return buffers
+
+def output_name(name, resolution):
+    """File name for one resolution of a figure; print keeps the plain name."""
+    return f'{name}.png' if resolution == 'print' else f'{name}-{resolution}.png'
+
+def render_figure(name, resolutions=('print',)):
+    """
+    Render the named figure from figure_scenes into figures/ at each of
+    ``resolutions``, all from one raster (see figure_api.py).
+    """
+    dpis = [RESOLUTIONS[r] for r in resolutions]
+    buffers = figure_api.render([name], ['png'], dpis, backend='pil')
+    for resolution, dpi in zip(resolutions, dpis):
+        filename = output_name(name, resolution)
+        if figure_api.write(buffers[name, 'png', dpi], f'figures/{filename}'):
+            print(f"✓ Generated {filename}")
+        else:
+            print(f"· {filename} unchanged")
+
+def create_figure_01(resolutions=('print',)):
+    """Figure 1: Current Architecture"""
+    render_figure('fig01_current_architecture', resolutions)
 
-    # Title
-    draw.text((700, 30), "Figure 2: Null Case (Do Nothing)", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # User intents
-    draw_box(draw, 100, 100, 280, 100, "User Visualization\nIntent\n(\"show feeds\")", COLOR_USER)
-    draw_box(draw, 1020, 100, 280, 100, "User Behavioral\nIntent\n(\"anonymize\")", COLOR_USER)
-
-    # ChRIS UI container
-    draw_rounded_rect(draw, (50, 280, 1350, 700), fill=COLOR_UI, outline=COLOR_BORDER, width=4)
-    draw.text((700, 310), "ChRIS UI", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # React layer
-    draw.line([(60, 360), (1340, 360)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 400), "React Components", fill=COLOR_BORDER, font=font_med, anchor="mm")
-    draw.text((280, 450), "handles \"show feeds\" intent", fill=COLOR_ARROW, font=font_tiny, anchor="mm")
-
-    # Intent Translator (refactored)
-    draw_rounded_rect(draw, (900, 490, 1200, 640), fill=COLOR_EMPHASIS, outline=COLOR_BORDER, width=3)
-    draw.text((1050, 565), "Intent\nTranslator\n(refactored)", fill=COLOR_BORDER, font=font_small, anchor="mm")
-
-    # JS library
-    draw.line([(60, 660), (1340, 660)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 680), "JavaScript Thin Client Library", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # CUBE container
-    draw_rounded_rect(draw, (50, 760, 1350, 1120), fill=COLOR_CUBE, outline=COLOR_BORDER, width=4)
-    draw.text((700, 790), "CUBE", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    draw.line([(60, 850), (1340, 850)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 880), "Collection+JSON API", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    draw.line([(60, 950), (1340, 950)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 1000), "CUBE Python/Django Internals", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # Arrows
-    draw_arrow(draw, 240, 200, 240, 280)
-    draw_arrow(draw, 1160, 200, 1160, 280)
-    draw_arrow(draw, 240, 360, 240, 760)
-    draw_arrow(draw, 1050, 640, 700, 760, multi=True)
-
-    img.save('figures/fig02_null_case.png', dpi=(300, 300))
-    print("✓ Generated fig02_null_case.png")
+def create_figure_02(resolutions=('print',)):
+    """Figure 2: Null Case - Figure 1 with a refactored translator"""
+    render_figure('fig02_null_case', resolutions)
 
-def create_figure_03():
+def create_figure_03(resolutions=('print',)):
     """Figure 3: Embedded in CUBE"""
-    img = Image.new('RGB', (1400, 1200), COLOR_BG)
-    draw = ImageDraw.Draw(img)
-
-    # Title
-    draw.text((700, 30), "Figure 3: Embedding Intent Logic Inside CUBE", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # User intents
-    draw_box(draw, 100, 100, 280, 100, "User Visualization\nIntent", COLOR_USER)
-    draw_box(draw, 1020, 100, 280, 100, "User Behavioral\nIntent", COLOR_USER)
-
-    # ChRIS UI container (simpler)
-    draw_rounded_rect(draw, (50, 280, 1350, 550), fill=COLOR_UI, outline=COLOR_BORDER, width=4)
-    draw.text((700, 310), "ChRIS UI", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # React layer
-    draw.line([(60, 360), (1340, 360)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 400), "React Components", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # JS library
-    draw.line([(60, 490), (1340, 490)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 520), "JavaScript Thin Client Library", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # CUBE container (with intent logic)
-    draw_rounded_rect(draw, (50, 630, 1350, 1120), fill=COLOR_CUBE, outline=COLOR_BORDER, width=4)
-    draw.text((700, 660), "CUBE", fill=COLOR_BORDER, font=font_large, anchor="mm")
+    render_figure('fig03_embedded_cube', resolutions)
 
-    # Dual API
-    draw.line([(60, 720), (1340, 720)], fill=COLOR_BORDER, width=3)
-    draw.line([(700, 720), (700, 780)], fill=COLOR_BORDER, width=3)  # Vertical divider
-    draw.text((350, 750), "Collection+JSON API", fill=COLOR_BORDER, font=font_med, anchor="mm")
-    draw.text((1050, 750), "Intent API", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # Intent Logic Handler
-    draw_rounded_rect(draw, (850, 810, 1200, 950), fill=COLOR_EMPHASIS, outline=COLOR_BORDER, width=3)
-    draw.text((1025, 880), "Intent Logic\nHandler", fill=COLOR_BORDER, font=font_small, anchor="mm")
-
-    draw.line([(60, 970), (1340, 970)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 1020), "CUBE Python/Django Internals", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # Arrows
-    draw_arrow(draw, 240, 200, 240, 280)
-    draw_arrow(draw, 1160, 200, 1160, 280)
-    draw_arrow(draw, 240, 550, 240, 630)
-    draw_arrow(draw, 1160, 550, 1160, 630)
-    draw_arrow(draw, 240, 720, 240, 970)  # Viz through
-    draw_arrow(draw, 1160, 720, 1025, 810)  # Behavioral to handler
-    draw_arrow(draw, 1025, 950, 700, 970, multi=True)  # Handler to internals
-
-    img.save('figures/fig03_embedded_cube.png', dpi=(300, 300))
-    print("✓ Generated fig03_embedded_cube.png")
-
-def create_figure_04():
+def create_figure_04(resolutions=('print',)):
     """Figure 4: External IAS"""
-    img = Image.new('RGB', (1400, 1300), COLOR_BG)
-    draw = ImageDraw.Draw(img)
-
-    # Title
-    draw.text((700, 30), "Figure 4: External Intent-Action Service (Proposed)", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # User intents
-    draw_box(draw, 100, 100, 280, 100, "User Visualization\nIntent\n(\"show feeds\")", COLOR_USER)
-    draw_box(draw, 1020, 100, 280, 100, "User Behavioral\nIntent\n(\"anonymize\")", COLOR_USER)
+    render_figure('fig04_external_ias', resolutions)
+
+FIGURES = [
+    ('fig01_current_architecture', create_figure_01),
+    ('fig02_null_case', create_figure_02),
+    ('fig03_embedded_cube', create_figure_03),
+    ('fig04_external_ias', create_figure_04),
+]
+
+def parse_resolutions(value):
+    resolutions = [r.strip() for r in value.split(',') if r.strip()]
+    unknown = set(resolutions) - set(RESOLUTIONS)
+    if unknown or not resolutions:
+        raise argparse.ArgumentTypeError(f"unknown resolution(s): {', '.join(sorted(unknown))} "
+                                         f"(choose from {', '.join(RESOLUTIONS)})")
+    return tuple(dict.fromkeys(resolutions))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-j', '--jobs', type=int, default=default_jobs(),
+                        help='number of figures to render in parallel (default: CPU count)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='re-render every figure, ignoring the build manifest')
+    parser.add_argument('--resolution', type=parse_resolutions, default=('print',),
+                        help='comma-separated output resolutions from '
+                             f"{', '.join(f'{k} ({v} DPI)' for k, v in RESOLUTIONS.items())} "
+                             '(default: print)')
+    args = parser.parse_args(argv)
 
-    # ChRIS UI container (thin)
-    draw_rounded_rect(draw, (50, 280, 1350, 550), fill=COLOR_UI, outline=COLOR_BORDER, width=4)
-    draw.text((700, 310), "ChRIS UI", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    # React layer
-    draw.line([(60, 360), (1340, 360)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 400), "React Components (presentation only)", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # JS library
-    draw.line([(60, 490), (1340, 490)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 520), "JavaScript Thin Client Library", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # IAS container (separate service)
-    draw_rounded_rect(draw, (850, 640, 1300, 870), fill=COLOR_IAS, outline=COLOR_BORDER, width=4)
-    draw.text((1075, 670), "Intent-Action Service\n(IAS)", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    # Intent Orchestrator
-    draw_rounded_rect(draw, (900, 720, 1250, 840), fill=COLOR_EMPHASIS, outline=COLOR_BORDER, width=3)
-    draw.text((1075, 780), "Intent Logic\nOrchestrator", fill=COLOR_BORDER, font=font_small, anchor="mm")
-
-    # CUBE container
-    draw_rounded_rect(draw, (50, 950, 1350, 1240), fill=COLOR_CUBE, outline=COLOR_BORDER, width=4)
-    draw.text((700, 980), "CUBE", fill=COLOR_BORDER, font=font_large, anchor="mm")
-
-    draw.line([(60, 1040), (1340, 1040)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 1070), "Collection+JSON API", fill=COLOR_BORDER, font=font_med, anchor="mm")
-
-    draw.line([(60, 1130), (1340, 1130)], fill=COLOR_BORDER, width=3)
-    draw.text((700, 1170), "CUBE Python/Django Internals", fill=COLOR_BORDER, font=font_med, anchor="mm")
-    draw.text((700, 1210), "(declarative substrate preserved)", fill=COLOR_ARROW, font=font_tiny, anchor="mm")
-
-    # Arrows
-    draw_arrow(draw, 240, 200, 240, 280)
-    draw_arrow(draw, 1160, 200, 1160, 280)
-
-    # Viz bypasses IAS
-    draw_arrow(draw, 240, 550, 240, 950)
-
-    # Behavioral through IAS
-    draw_arrow(draw, 1160, 550, 1075, 640)
-    draw_arrow(draw, 1075, 870, 700, 950, multi=True)
-
-    img.save('figures/fig04_external_ias.png', dpi=(300, 300))
-    print("✓ Generated fig04_external_ias.png")
-
-if __name__ == '__main__':
     print("Generating publication-quality architectural diagrams with PIL...")
     print()
 
-    os.makedirs('figures', exist_ok=True)
-
-    create_figure_01()
-    create_figure_02()
-    create_figure_03()
-    create_figure_04()
+    extra = {'libraries': library_versions('Pillow'), 'fonts': pil_text.signature(),
+             'modules': module_digests(__file__, scene_graph, figure_api, pil_text)}
+    scenes = [figure_scenes.SCENES[name] for name, _ in FIGURES]
+    use_server = render_server.available()
+    jobs = [(name, tuple(output_name(name, r) for r in args.resolution),
+             functools.partial(func, resolutions=args.resolution))
+            for name, func in FIGURES]
+    status = build(jobs, 'pil', extra=extra, inputs={s.name: s.digest() for s in scenes},
+                   max_workers=args.jobs, force=args.force, threads=use_server)
+
+    if status == 0:
+        print()
+        print("✓ All diagrams up to date in figures/")
+        print(f"  Resolution: {', '.join(f'{r} {RESOLUTIONS[r]} DPI' for r in args.resolution)}"
+              f" ({SUPERSAMPLE}x supersampled)")
+        print("  Format: PNG with white background")
+    return status
 
-    print()
-    print("✓ All diagrams generated successfully in figures/")
-    print("  Resolution: 300 DPI (publication quality)")
-    print("  Format: PNG with white background")
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,67 +1,98 @@
 #!/usr/bin/env python3
 """
-Generate SeaGaP workflow diagram
+Generate the Graphviz diagrams (SeaGaP workflow and friends)
 Requires: graphviz Python package and graphviz system package
+
+Every ``*.dot`` file in figures-source/graphviz/ is laid out and rendered
+once, concurrently, and each output is then distributed to every paper's
+figures/ directory by hardlink or atomic copy. Layouts are cached (see
+graphviz_cache.py), so extra formats such as SVG or PDF come from the same
+layout pass. A PNG whose re-render only differs in bytes (image_diff.py)
+is left as it is.
 """
 
+import argparse
 import sys
+from functools import partial
 from pathlib import Path
 
 try:
-    from graphviz import Source
+    import graphviz_cache
 except ImportError:
     print("Error: graphviz Python package not installed")
     print("Install with: pip install graphviz")
     sys.exit(1)
 
-def generate_diagram():
-    """Generate SeaGaP pattern diagram from DOT file"""
-
-    # Paths
-    script_dir = Path(__file__).parent
-    dot_file = script_dir.parent / "graphviz" / "fig05_seagap_pattern.dot"
-    output_dirs = [
-        script_dir.parent.parent / "paper-research" / "figures",
-        script_dir.parent.parent / "paper-engineering" / "figures",
-        script_dir.parent.parent / "engineering-brief" / "figures",
-    ]
-
-    if not dot_file.exists():
-        print(f"Error: DOT file not found: {dot_file}")
-        sys.exit(1)
-
-    # Read DOT file
-    with open(dot_file, 'r') as f:
-        dot_source = f.read()
-
-    # Create graphviz source
-    graph = Source(dot_source)
-
-    # Generate PNG for each output directory
-    for output_dir in output_dirs:
-        if not output_dir.exists():
-            print(f"Creating directory: {output_dir}")
-            output_dir.mkdir(parents=True, exist_ok=True)
-
-        output_file = output_dir / "fig05_seagap_pattern"
-
-        try:
-            # Render to PNG (high DPI)
-            graph.render(
-                filename=str(output_file),
-                format='png',
-                cleanup=True,
-                engine='dot'
-            )
-            print(f"Generated: {output_file}.png")
-
-        except Exception as e:
-            print(f"Error generating diagram for {output_dir}: {e}")
-            print("Make sure graphviz system package is installed:")
-            print("  Ubuntu/Debian: sudo apt-get install graphviz")
-            print("  macOS: brew install graphviz")
-            print("  Fedora: sudo dnf install graphviz")
-            continue
+from fanout import fan_out, same_image
+from render_pool import default_jobs, report, run_jobs, span
+
+SCRIPT_DIR = Path(__file__).parent
+DOT_DIR = SCRIPT_DIR.parent / "graphviz"
+OUTPUT_DIRS = [
+    SCRIPT_DIR.parent.parent / "paper-research" / "figures",
+    SCRIPT_DIR.parent.parent / "paper-engineering" / "figures",
+    SCRIPT_DIR.parent.parent / "engineering-brief" / "figures",
+]
+
+
+def discover(dot_dir=DOT_DIR):
+    """All DOT sources in the graphviz directory, in name order."""
+    return sorted(dot_dir.glob("*.dot"))
+
+
+def render_dot(dot_file, output_dirs=OUTPUT_DIRS, formats=('png',), engine='dot'):
+    """Lay out one DOT file once, encode each format once, and fan them out."""
+    with span('graphviz', figure=dot_file.stem) as record:
+        outputs = graphviz_cache.render_formats(dot_file.read_text(), formats, engine)
+
+        actions = []
+        for fmt, data in outputs.items():
+            targets = [str(output_dir / f"{dot_file.stem}.{fmt}") for output_dir in output_dirs]
+            same = same_image if fmt == 'png' else None
+            for target, action in fan_out(data, targets, same).items():
+                print(f"Generated: {target} ({action})")
+                actions.append(action)
+        record['bytes_out'] = sum(len(data) for data in outputs.values())
+        record['cache'] = 'hit' if all(a.endswith('unchanged') for a in actions) else 'miss'
+
+
+def generate_diagram(dot_files=None, jobs=None, formats=('png',)):
+    """Render the given DOT files (default: all of them) and report the result."""
+    dot_files = discover() if dot_files is None else dot_files
+    if not dot_files:
+        print(f"Error: no DOT files found in {DOT_DIR}")
+        return 1
+
+    missing = [f for f in dot_files if not f.exists()]
+    if missing:
+        for f in missing:
+            print(f"Error: DOT file not found: {f}")
+        return 1
+
+    # Rendering happens in the graphviz subprocess, so threads are enough
+    results = run_jobs([(f.stem, partial(render_dot, f, formats=formats)) for f in dot_files],
+                       max_workers=jobs, threads=True)
+    status = report(results, noun='diagrams')
+    if status:
+        print("Make sure graphviz system package is installed:")
+        print("  Ubuntu/Debian: sudo apt-get install graphviz")
+        print("  macOS: brew install graphviz")
+        print("  Fedora: sudo dnf install graphviz")
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the Graphviz diagrams for all papers.")
+    parser.add_argument('dot_files', nargs='*', type=Path,
+                        help=f"DOT files to render (default: every *.dot in {DOT_DIR})")
+    parser.add_argument('-j', '--jobs', type=int, default=default_jobs(),
+                        help='number of diagrams to render in parallel (default: CPU count)')
+    parser.add_argument('--format', default='png',
+                        help='comma-separated output formats, e.g. png,svg,pdf (default: png)')
+    args = parser.parse_args(argv)
+    formats = [fmt.strip() for fmt in args.format.split(',') if fmt.strip()]
+    return generate_diagram(args.dot_files or None, jobs=args.jobs, formats=formats)
+
 
 if __name__ == "__main__":
-    generate_diagram()
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Graphviz layout cache and multi-format export from a single layout pass.
+
+Layout is the expensive part of a Graphviz render. The positioned graph
+(``-Txdot``) is cached under a hash of the DOT source, the layout engine
+and the Graphviz version. Every output format is then produced from that
+cached layout with ``neato -n2``, which uses the stored node positions and
+edge splines as-is instead of laying the graph out again. Encoded outputs
+are cached next to the layout, so a repeat render is a file read. On a
+local miss, layouts and outputs come from the artifact store shared by
+all checkouts when another one has rendered them, and are put there
+otherwise.
+"""
+
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+import graphviz
+
+from fanout import atomic_write
+from figure_cache import shared_store
+
+CACHE_DIR = Path(__file__).parent.parent / ".cache" / "graphviz"
+
+
+@lru_cache(maxsize=None)
+def graphviz_version():
+    """Installed Graphviz version as a string, or None if ``dot`` is missing."""
+    try:
+        return '.'.join(map(str, graphviz.version()))
+    except (graphviz.ExecutableNotFound, graphviz.CalledProcessError):
+        return None
+
+
+def layout_key(source, engine='dot'):
+    """Cache key for the layout of ``source`` under ``engine``."""
+    h = hashlib.sha256()
+    for part in (source, engine, graphviz_version() or ''):
+        h.update(part.encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def layout(source, engine='dot', cache_dir=CACHE_DIR):
+    """Return (key, xdot) for ``source``, running the layout engine only on a miss."""
+    key = layout_key(source, engine)
+    path = cache_dir / f"{key}.xdot"
+    if path.exists():
+        return key, path.read_text()
+
+    data = _shared(f"graphviz:{key}.xdot",
+                   lambda: graphviz.Source(source).pipe(format='xdot', engine=engine))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, data)
+    return key, data.decode()
+
+
+def _shared(name, produce):
+    """``produce()``, or its earlier result from the artifact store."""
+    store = shared_store()
+    stored = store.get(name) if store else None
+    if stored:
+        return stored['data']
+    data = produce()
+    if store:
+        store.put(name, {'data': data}, stage='graphviz')
+    return data
+
+
+def render(source, fmt='png', engine='dot', cache_dir=CACHE_DIR):
+    """Return the ``fmt`` encoding of ``source``, reusing cached layouts and outputs."""
+    return render_formats(source, [fmt], engine, cache_dir)[fmt]
+
+
+def render_formats(source, formats, engine='dot', cache_dir=CACHE_DIR):
+    """Return {fmt: bytes} for every requested format from one layout pass."""
+    key, xdot = layout(source, engine, cache_dir)
+    positioned = graphviz.Source(xdot)
+    outputs = {}
+    for fmt in formats:
+        path = cache_dir / f"{key}.{fmt}"
+        if path.exists():
+            outputs[fmt] = path.read_bytes()
+            continue
+        # -n2: positions are in points and already final; do not relayout
+        data = _shared(f"graphviz:{key}.{fmt}",
+                       lambda: positioned.pipe(format=fmt, engine='neato', neato_no_op=2))
+        atomic_write(path, data)
+        outputs[fmt] = data
+    return outputs
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Perceptual diff for regenerated figures.
+
+Re-rendering a figure often gives a PNG whose bytes differ (metadata,
+compression, antialiasing) but whose pixels do not, visibly. ``compare``
+decides whether two images really differ:
+
+- both are decoded, composited on white and converted to CIELAB;
+- a pixel differs if its colour distance (CIE76 ΔE) to every pixel in
+  the 3x3 neighbourhood of the same place in the other image exceeds
+  ``tolerance``, in either direction, so a one-pixel antialiasing shift
+  is not a change;
+- differing pixels are grouped into regions on a TILE-pixel grid, and
+  regions with fewer than ``min_pixels`` pixels are dropped as noise.
+
+The images differ if any region remains. The score is the mean ΔE of the
+differing pixels, spread over the whole image. Everything is vectorised
+in NumPy, so a 3000x2500 figure takes well under a second.
+
+The distribution step, the Graphviz fan-out and the figure generators use
+``same_image`` to leave a target alone when the new render only differs
+in bytes, so its mtime (and every build downstream) stays put.
+
+Usage: image_diff.py OLD NEW [--heatmap OUT.png] [--json]
+       image_diff.py --rev HEAD [PATH ...] [--heatmap-dir DIR] [--restore-noise]
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+TOLERANCE = 5.0   # ΔE76; about 2.3 is a just-noticeable difference
+MIN_PIXELS = 8
+TILE = 16
+
+Region = namedtuple('Region', ['x0', 'y0', 'x1', 'y1', 'pixels'])
+
+
+class Diff:
+    """The result of ``compare``; ``delta`` is the per-pixel ΔE map (None if sizes differ)."""
+
+    def __init__(self, changed, size, score=0.0, max_delta=0.0, changed_pixels=0,
+                 regions=(), delta=None, size_changed=False):
+        self.changed = changed
+        self.size = size
+        self.score = score
+        self.max_delta = max_delta
+        self.changed_pixels = changed_pixels
+        self.regions = list(regions)
+        self.delta = delta
+        self.size_changed = size_changed
+
+    @property
+    def changed_fraction(self):
+        return self.changed_pixels / (self.size[0] * self.size[1]) if self.size[0] else 0.0
+
+    def to_dict(self):
+        return {
+            'changed': self.changed,
+            'size': list(self.size),
+            'size_changed': self.size_changed,
+            'score': round(self.score, 4),
+            'max_delta': round(self.max_delta, 2),
+            'changed_pixels': self.changed_pixels,
+            'changed_fraction': round(self.changed_fraction, 6),
+            'regions': [r._asdict() for r in self.regions],
+        }
+
+
+def _open(image):
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(image))
+    return Image.open(image)
+
+
+def _bytes(image):
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    with open(image, 'rb') as f:
+        return f.read()
+
+
+def load(image):
+    """An image (path or encoded bytes) as an (H, W, 3) uint8 sRGB array, composited on white."""
+    with _open(image) as img:
+        img = img.convert('RGBA')
+        white = Image.new('RGBA', img.size, (255, 255, 255, 255))
+        return np.asarray(Image.alpha_composite(white, img).convert('RGB'))
+
+
+# sRGB code value -> linear light, and linear RGB -> XYZ relative to the D65 white
+_LINEAR = np.array([c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+                    for c in np.arange(256) / 255], dtype=np.float32)
+_RGB_TO_XYZ = (np.array([[0.4124, 0.2126, 0.0193],
+                         [0.3576, 0.7152, 0.1192],
+                         [0.1805, 0.0722, 0.9505]])
+               / np.array([0.95047, 1.0, 1.08883])).astype(np.float32)
+
+
+def to_lab(rgb):
+    """Convert an (H, W, 3) uint8 sRGB array to float32 CIELAB (D65)."""
+    xyz = _LINEAR[rgb] @ _RGB_TO_XYZ
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + np.float32(16 / 116))
+    return np.stack([116 * f[..., 1] - 16,
+                     500 * (f[..., 0] - f[..., 1]),
+                     200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def _neighbourhood_delta(a, b, ys, xs):
+    """For the pixels (ys, xs) of ``a``, the smallest ΔE to the 3x3 neighbourhood in ``b``."""
+    padded = np.pad(b, ((1, 1), (1, 1), (0, 0)), mode='edge')
+    pixels = a[ys, xs]
+    best = np.full(len(ys), np.inf, dtype=np.float32)
+    for dy in range(3):
+        for dx in range(3):
+            diff = pixels - padded[ys + dy, xs + dx]
+            np.minimum(best, np.einsum('ij,ij->i', diff, diff), out=best)
+    return np.sqrt(best)
+
+
+def _regions(mask, min_pixels):
+    """Bounding boxes of the 8-connected groups of TILE-pixel tiles holding changed pixels."""
+    h, w = mask.shape
+    th, tw = -(-h // TILE), -(-w // TILE)
+    padded = np.zeros((th * TILE, tw * TILE), dtype=bool)
+    padded[:h, :w] = mask
+    counts = padded.reshape(th, TILE, tw, TILE).sum(axis=(1, 3))
+
+    seen = np.zeros_like(counts, dtype=bool)
+    regions = []
+    for ty, tx in zip(*np.nonzero(counts)):
+        if seen[ty, tx]:
+            continue
+        seen[ty, tx] = True
+        stack, tiles = [(ty, tx)], []
+        while stack:
+            y, x = stack.pop()
+            tiles.append((y, x))
+            for ny in range(max(0, y - 1), min(th, y + 2)):
+                for nx in range(max(0, x - 1), min(tw, x + 2)):
+                    if counts[ny, nx] and not seen[ny, nx]:
+                        seen[ny, nx] = True
+                        stack.append((ny, nx))
+        pixels = int(sum(counts[y, x] for y, x in tiles))
+        if pixels < min_pixels:
+            continue
+        ys, xs = zip(*tiles)
+        y0, y1 = min(ys) * TILE, (max(ys) + 1) * TILE
+        x0, x1 = min(xs) * TILE, (max(xs) + 1) * TILE
+        rows, cols = np.nonzero(mask[y0:y1, x0:x1])
+        regions.append(Region(int(x0 + cols.min()), int(y0 + rows.min()),
+                              int(x0 + cols.max()) + 1, int(y0 + rows.max()) + 1, pixels))
+    return sorted(regions, key=lambda r: (r.y0, r.x0))
+
+
+def compare(old, new, tolerance=TOLERANCE, min_pixels=MIN_PIXELS):
+    """Compare two images (paths or encoded bytes); returns a Diff."""
+    a, b = load(old), load(new)
+    if a.shape != b.shape:
+        h, w = b.shape[:2]
+        return Diff(True, (w, h), score=float('inf'), changed_pixels=w * h, size_changed=True,
+                    regions=[Region(0, 0, w, h, w * h)])
+    h, w = a.shape[:2]
+    delta = np.zeros((h, w), dtype=np.float32)
+    rows, cols = np.nonzero((a != b).any(axis=-1))
+    if len(rows):
+        # Only the window around the pixels that differ at all needs the Lab work
+        y0, y1 = max(rows.min() - 1, 0), min(rows.max() + 2, h)
+        x0, x1 = max(cols.min() - 1, 0), min(cols.max() + 2, w)
+        la, lb = to_lab(a[y0:y1, x0:x1]), to_lab(b[y0:y1, x0:x1])
+        window = np.sqrt(np.einsum('ijk,ijk->ij', la - lb, la - lb))
+        # A pixel within tolerance of its counterpart cannot do worse against
+        # the neighbourhood, so only the others need the shifted comparison
+        ys, xs = np.nonzero(window > tolerance)
+        window[ys, xs] = np.maximum(_neighbourhood_delta(la, lb, ys, xs),
+                                    _neighbourhood_delta(lb, la, ys, xs))
+        delta[y0:y1, x0:x1] = window
+    mask = delta > tolerance
+    regions = _regions(mask, min_pixels)
+    kept = sum(r.pixels for r in regions)
+    return Diff(bool(regions), (w, h),
+                score=float(delta[mask].sum() / delta.size) if kept else 0.0,
+                max_delta=float(delta.max()), changed_pixels=kept,
+                regions=regions, delta=delta)
+
+
+def same_image(old, new, tolerance=TOLERANCE, min_pixels=MIN_PIXELS):
+    """
+    True if ``old`` and ``new`` are identical or differ only below the
+    tolerances; False if either cannot be decoded (or ``old`` is missing).
+    """
+    try:
+        if _bytes(old) == _bytes(new):
+            return True
+        return not compare(old, new, tolerance, min_pixels).changed
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+
+
+def write_heatmap(diff, new, path):
+    """
+    Save a review image: ``new`` faded to grey, ΔE above the tolerance in
+    red (stronger for larger differences) and each region boxed.
+    """
+    with _open(new) as img:
+        base = img.convert('L').convert('RGB')
+    rgb = np.asarray(base, dtype=np.float32)
+    rgb = 255 - (255 - rgb) * 0.35
+    if diff.delta is not None:
+        strength = np.clip(diff.delta / (4 * TOLERANCE), 0, 1)[..., None]
+        rgb = rgb * (1 - strength) + np.array([220, 30, 30], dtype=np.float32) * strength
+    out = Image.fromarray(rgb.astype(np.uint8))
+    draw = ImageDraw.Draw(out)
+    for r in diff.regions:
+        draw.rectangle((r.x0 - 3, r.y0 - 3, r.x1 + 2, r.y1 + 2), outline=(220, 30, 30), width=3)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    out.save(path)
+
+
+def _git(*args):
+    return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, check=True).stdout
+
+
+def changed_since(rev, paths=()):
+    """PNG files (repository-relative) that differ from ``rev`` in the working tree."""
+    out = _git('diff', '--name-only', '--diff-filter=M', rev, '--', *(paths or ['*.png']))
+    return [p for p in out.decode().splitlines() if p.lower().endswith('.png')]
+
+
+def review(rev, paths, heatmap_dir=None, restore_noise=False, tolerance=TOLERANCE):
+    """Diff each changed PNG against ``rev``; returns {path: Diff}."""
+    results = {}
+    for rel in changed_since(rev, paths):
+        old = _git('show', f'{rev}:{rel}')
+        diff = compare(old, REPO_ROOT / rel, tolerance)
+        results[rel] = diff
+        if diff.changed and heatmap_dir:
+            write_heatmap(diff, REPO_ROOT / rel, os.path.join(heatmap_dir, rel.replace('/', '__')))
+        if not diff.changed and restore_noise:
+            _git('checkout', rev, '--', rel)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perceptual diff of figure images.")
+    parser.add_argument('images', nargs='*', help='OLD NEW, or with --rev the paths to check')
+    parser.add_argument('--rev', help='compare working-tree PNGs with this git revision')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f'per-pixel ΔE that counts as a change (default: {TOLERANCE})')
+    parser.add_argument('--heatmap', help='write a diff heatmap PNG (OLD NEW mode)')
+    parser.add_argument('--heatmap-dir', help='write heatmaps of changed files here (--rev mode)')
+    parser.add_argument('--restore-noise', action='store_true',
+                        help='check out the --rev version of files that did not visibly change')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    args = parser.parse_args(argv)
+
+    if args.rev:
+        results = review(args.rev, args.images, args.heatmap_dir, args.restore_noise, args.tolerance)
+        if args.json:
+            print(json.dumps({p: d.to_dict() for p, d in results.items()}, indent=2))
+        else:
+            for path, diff in results.items():
+                if diff.changed:
+                    print(f"✗ {path}: {len(diff.regions)} region(s), "
+                          f"{diff.changed_fraction:.2%} of pixels, score {diff.score:.3f}")
+                else:
+                    restored = ' (restored)' if args.restore_noise else ''
+                    print(f"· {path}: bytes differ, image does not{restored}")
+            visual = sum(d.changed for d in results.values())
+            print(f"{visual} of {len(results)} changed PNG(s) differ visibly")
+        return 1 if any(d.changed for d in results.values()) else 0
+
+    if len(args.images) != 2:
+        parser.error('give OLD and NEW images, or --rev')
+    old, new = args.images
+    diff = compare(old, new, args.tolerance)
+    if args.heatmap:
+        write_heatmap(diff, new, args.heatmap)
+    if args.json:
+        print(json.dumps(diff.to_dict(), indent=2))
+    elif diff.changed:
+        print(f"✗ differ: {len(diff.regions)} region(s), {diff.changed_fraction:.2%} of pixels, "
+              f"score {diff.score:.3f}, max ΔE {diff.max_delta:.1f}")
+        for r in diff.regions:
+            print(f"    ({r.x0}, {r.y0})-({r.x1}, {r.y1}): {r.pixels} px")
+    else:
+        print(f"· same image (max ΔE {diff.max_delta:.1f})")
+    return 1 if diff.changed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Text engine for the PIL diagram backend.
+
+Fonts are named by face ('regular', 'italic', 'bold') and resolved to a
+file through a search path: ``$FIGURE_FONT_PATH`` (os.pathsep-separated),
+figures-source/fonts/, the usual system font directories, and finally the
+DejaVu fonts bundled with matplotlib, so every Linux runner with the
+plotting stack installed finds the same files. Each face has a list of
+candidate file names tried in order.
+
+Everything is cached for the life of the process: the font file index, one
+FreeTypeFont per (face, size), the width of each measured line and the
+layout of each label. A forked render worker inherits whatever the parent
+has already measured.
+
+Lines are stacked by the font's own metrics (ascent + descent, times
+LINE_SPACING) instead of a fixed pixel stride, so multi-line labels keep
+their proportions at any size.
+"""
+
+import functools
+import importlib.util
+import os
+from collections import namedtuple
+from pathlib import Path
+
+from PIL import ImageFont
+
+FONT_PATH_ENV = 'FIGURE_FONT_PATH'
+REPO_FONTS = Path(__file__).resolve().parent.parent / "fonts"
+SYSTEM_FONT_DIRS = (
+    '~/.local/share/fonts',
+    '~/.fonts',
+    '/usr/local/share/fonts',
+    '/usr/share/fonts',
+    '/Library/Fonts',
+    '/System/Library/Fonts',
+    'C:/Windows/Fonts',
+    '/system/fonts',
+)
+FACES = {
+    'regular': ('Roboto-Regular.ttf', 'DejaVuSans.ttf', 'LiberationSans-Regular.ttf', 'Arial.ttf'),
+    'italic': ('Roboto-Italic.ttf', 'DejaVuSans-Oblique.ttf', 'LiberationSans-Italic.ttf',
+               'Arial Italic.ttf'),
+    'bold': ('Roboto-Bold.ttf', 'DejaVuSans-Bold.ttf', 'LiberationSans-Bold.ttf', 'Arial Bold.ttf'),
+}
+FONT_SUFFIXES = {'.ttf', '.otf', '.ttc'}
+LINE_SPACING = 1.2  # as matplotlib's default text.linespacing
+
+FontSpec = namedtuple('FontSpec', ['face', 'size'])
+LineMetrics = namedtuple('LineMetrics', ['ascent', 'descent', 'height'])
+
+
+def search_path():
+    """Directories searched for font files, in priority order."""
+    dirs = [d for d in os.environ.get(FONT_PATH_ENV, '').split(os.pathsep) if d]
+    dirs.append(str(REPO_FONTS))
+    dirs.extend(os.path.expanduser(d) for d in SYSTEM_FONT_DIRS)
+    spec = importlib.util.find_spec('matplotlib')
+    if spec and spec.submodule_search_locations:
+        dirs.append(os.path.join(spec.submodule_search_locations[0], 'mpl-data', 'fonts', 'ttf'))
+    return dirs
+
+
+@functools.lru_cache(maxsize=None)
+def _font_index(dirs):
+    """{lower-case file name: path}, the first directory in ``dirs`` winning."""
+    index = {}
+    for directory in dirs:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in FONT_SUFFIXES:
+                    index.setdefault(name.lower(), os.path.join(root, name))
+    return index
+
+
+def resolve(face):
+    """Path of the font file for ``face``, or None if no candidate is installed."""
+    index = _font_index(tuple(search_path()))
+    for candidate in FACES[face]:
+        path = index.get(candidate.lower())
+        if path:
+            return path
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(face, size):
+    """The font for (face, size); Pillow's built-in scalable font if none is installed."""
+    path = resolve(face)
+    if path:
+        return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1 has only the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=None)
+def line_metrics(font):
+    """Ascent, descent and line-to-line distance for a FontSpec."""
+    ascent, descent = get_font(*font).getmetrics()
+    return LineMetrics(ascent, descent, round((ascent + descent) * LINE_SPACING))
+
+
+@functools.lru_cache(maxsize=4096)
+def measure(font, line):
+    """Advance width of one line of text in pixels."""
+    return get_font(*font).getlength(line)
+
+
+@functools.lru_cache(maxsize=1024)
+def layout(font, text):
+    """
+    Lines of ``text`` centred on the origin: a tuple of (dx, dy, line), with
+    (dx, dy) the top-left (ascender) corner of each line.
+    """
+    lines = text.split('\n')
+    metrics = line_metrics(font)
+    block = (len(lines) - 1) * metrics.height + metrics.ascent + metrics.descent
+    top = -(block // 2)
+    return tuple((-round(measure(font, line) / 2), top + i * metrics.height, line)
+                 for i, line in enumerate(lines))
+
+
+def draw_text(draw, cx, cy, text, font, fill):
+    """Draw (possibly multi-line) text centred on a point."""
+    pil_font = get_font(*font)
+    for dx, dy, line in layout(font, text):
+        draw.text((cx + dx, cy + dy), line, fill=fill, font=pil_font, anchor='la')
+
+
+def signature():
+    """The font file behind each face, so a font change invalidates the figure cache."""
+    result = {}
+    for face in FACES:
+        path = resolve(face)
+        if path is None:
+            result[face] = None
+            continue
+        st = os.stat(path)
+        result[face] = [os.path.basename(path), st.st_size]
+    return result
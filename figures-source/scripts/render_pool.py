@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Process-pool rendering engine for the figure generation scripts.
+
+Figures are independent of each other, so each one is rendered in its own
+worker process. A failure in one figure is captured and reported without
+aborting the others; the combined result is summarised once all jobs finish.
+"""
+
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+try:
+    from build_trace import span
+except ImportError:
+    # Tracing is optional; scripts/build_trace.py puts itself on PYTHONPATH
+    # for the commands it wraps
+    @contextmanager
+    def span(stage, document=None, **fields):
+        yield dict(fields)
+
+JobResult = namedtuple('JobResult', ['name', 'ok', 'seconds', 'error'])
+
+
+class Stopwatch:
+    """
+    Split wall time into named phases: ``lap(name)`` charges the time since
+    the previous lap to ``name`` in ``timings``. With ``timings=None`` it
+    does nothing, so renderers can take one unconditionally.
+    """
+
+    def __init__(self, timings=None):
+        self.timings = timings
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        if self.timings is None:
+            return
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + (now - self.last)
+        self.last = now
+
+
+def default_jobs():
+    """Number of worker processes to use when --jobs is not given."""
+    return os.cpu_count() or 1
+
+
+def _run_one(name, func):
+    """Run a single figure job, converting any exception into a failed result."""
+    start = time.perf_counter()
+    try:
+        func()
+    except Exception:
+        return JobResult(name, False, time.perf_counter() - start, traceback.format_exc())
+    return JobResult(name, True, time.perf_counter() - start, None)
+
+
+def run_jobs(jobs, max_workers=None, threads=False):
+    """
+    Run (name, func) jobs and return their JobResults in submission order.
+
+    ``func`` must be a module-level callable so it can be sent to a worker.
+    With ``max_workers == 1`` the jobs run inline in this process, which
+    keeps tracebacks and debuggers straightforward. ``threads=True`` uses a
+    thread pool instead, for jobs that mostly wait on subprocesses.
+    """
+    jobs = list(jobs)
+    if max_workers is None:
+        max_workers = default_jobs()
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+
+    if max_workers == 1:
+        return [_run_one(name, func) for name, func in jobs]
+
+    results = {}
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_run_one, name, func): name for name, func in jobs}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except BrokenProcessPool as e:
+                # A worker died outright (e.g. segfault in a native library)
+                results[name] = JobResult(name, False, 0.0, f"worker process died: {e}\n")
+    return [results[name] for name, _ in jobs]
+
+
+def report(results, stream=sys.stdout, noun='figures'):
+    """Print a combined summary of job results and return a process exit code."""
+    failed = [r for r in results if not r.ok]
+    total = sum(r.seconds for r in results)
+
+    for r in failed:
+        print(f"✗ {r.name} failed:", file=stream)
+        for line in r.error.rstrip().splitlines():
+            print(f"    {line}", file=stream)
+
+    print(file=stream)
+    for r in results:
+        mark = '✓' if r.ok else '✗'
+        print(f"  {mark} {r.name:<32} {r.seconds:6.2f}s", file=stream)
+    print(f"  {len(results) - len(failed)}/{len(results)} {noun} rendered "
+          f"({total:.2f}s of render time)", file=stream)
+
+    return 1 if failed else 0
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Warm render server for the matplotlib and PIL figure generators.
+
+A cold ``generate_diagrams.py`` run spends most of its time importing
+matplotlib, building the font cache lookups and applying rcParams before it
+draws four small figures; the PIL generator probes its fonts at import.
+The server pays that once: it imports both backends, loads the fonts,
+rasterises the shared PIL layers and does one throwaway render, then
+listens on a Unix socket. Each connection is handled in a forked child,
+so concurrent requests render in parallel on the warm state.
+
+figure_api.render() uses the server automatically when its socket
+answers (and renders in process when it does not), so ``make figures``
+and the watch mode only pay startup once.
+
+Protocol: the client sends one JSON line
+
+    {"backend": "matplotlib", "figures": ["fig01_current_architecture"],
+     "formats": ["svg", "png"], "dpi": [300]}
+
+and gets one JSON line back, ``{"ok": true, "parts": [[figure, format,
+dpi, size], ...], "seconds": t}`` followed by the encoded buffers back to
+back, or ``{"ok": false, "error": "..."}``. A request with a single
+``"figure"``, ``"format"`` and ``"dpi"`` plus ``"output": "/abs/path"``
+has the server write that file (atomically) instead.
+
+The server re-executes itself when any script in this directory changes,
+so it never renders with stale code.
+
+Usage: render_server.py serve [--detach] [--idle-timeout SECONDS]
+       render_server.py render FIGURE [--backend pil] [--format svg] [--dpi N] [-o PATH]
+       render_server.py ping | stop
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+SOCKET_ENV = 'FIGURE_RENDER_SOCKET'
+DEFAULT_SOCKET = SCRIPT_DIR.parent / ".cache" / "render-server.sock"
+BACKENDS = ('matplotlib', 'pil')
+POLL_SECONDS = 2.0
+
+
+class ServerUnavailable(Exception):
+    """No render server is listening on the socket."""
+
+
+class RenderError(Exception):
+    """The server could not render the requested figure."""
+
+
+def socket_path():
+    """The server socket, or None when ``$FIGURE_RENDER_SOCKET`` is set empty (server disabled)."""
+    path = os.environ.get(SOCKET_ENV, str(DEFAULT_SOCKET))
+    return Path(path) if path else None
+
+
+# -- client -------------------------------------------------------------------
+
+def _connect(path=None, timeout=None):
+    path = path or socket_path()
+    if path is None or not path.exists():
+        raise ServerUnavailable(f"no render server at {path}")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except OSError as e:
+        sock.close()
+        raise ServerUnavailable(f"no render server at {path}: {e}") from None
+    return sock
+
+
+def request(message, path=None, timeout=None):
+    """
+    Send one request; returns (header, payload), where the payload is a
+    bytearray holding every part listed in the header, back to back.
+    """
+    with _connect(path, timeout) as sock:
+        sock.sendall(json.dumps(message).encode() + b'\n')
+        stream = sock.makefile('rb')
+        line = stream.readline()
+        if not line:
+            # Connection closed unanswered, e.g. the server is restarting
+            raise ServerUnavailable("render server closed the connection")
+        header = json.loads(line)
+        if not header.get('ok'):
+            raise RenderError(header.get('error', 'render failed'))
+        payload = bytearray(sum(part[-1] for part in header.get('parts', ())))
+        if payload and stream.readinto(payload) != len(payload):
+            raise RenderError("render server sent a short reply")
+    return header, payload
+
+
+def render_batch(figures, formats, dpis, backend='matplotlib', path=None):
+    """
+    figure_api.render() on the server: {(figure, format, dpi): memoryview},
+    each a slice of the one receive buffer. Raises ServerUnavailable if no
+    server answers and RenderError if it fails.
+    """
+    message = {'backend': backend, 'figures': list(figures), 'formats': list(formats),
+               'dpi': list(dpis)}
+    header, payload = request(message, path)
+    view = memoryview(payload)
+    buffers, offset = {}, 0
+    for figure, fmt, dpi, size in header['parts']:
+        buffers[figure, fmt, dpi] = view[offset:offset + size]
+        offset += size
+    return buffers
+
+
+def render(figure, backend='matplotlib', fmt='png', dpi=300, output=None, path=None):
+    """
+    Render one figure on the server. Returns its buffer, or None when
+    ``output`` is given (the server writes the file).
+    """
+    if output is None:
+        return render_batch([figure], [fmt], [dpi], backend, path)[figure, fmt, dpi]
+    message = {'backend': backend, 'figure': figure, 'format': fmt, 'dpi': dpi,
+               'output': os.path.abspath(output)}
+    request(message, path)
+    return None
+
+
+def available(path=None):
+    """True if a server answers a ping."""
+    try:
+        request({'command': 'ping'}, path, timeout=2)
+    except (ServerUnavailable, RenderError, OSError, ValueError):
+        return False
+    return True
+
+
+# -- server -------------------------------------------------------------------
+
+def _script_stat():
+    return {p.name: p.stat().st_mtime_ns for p in SCRIPT_DIR.glob('*.py')}
+
+
+def warm_up():
+    """Import both backends and render once, so fonts and caches are loaded."""
+    sys.path.insert(0, str(SCRIPT_DIR))
+    import figure_scenes
+    import generate_diagrams
+    import generate_diagrams_pil
+
+    generate_diagrams.load_matplotlib()
+    first = figure_scenes.SCENES[generate_diagrams.FIGURES[0][0]]
+    generate_diagrams.encode_scene(first, [('png', 72)])
+    generate_diagrams_pil.encode_scene(first, [('png', 72)])
+
+
+class RenderHandler(socketserver.StreamRequestHandler):
+    """One request per connection, handled in a forked child."""
+
+    def handle(self):
+        import figure_api
+        start = time.perf_counter()
+        try:
+            message = json.loads(self.rfile.readline())
+            if message.get('command') == 'ping':
+                return self._reply({'ok': True, 'pid': os.getppid()})
+            output = message.get('output')
+            if 'figure' in message:
+                message.update(figures=[message['figure']], formats=[message.get('format', 'png')],
+                               dpi=[message.get('dpi', figure_api.DEFAULT_DPI)])
+            buffers = figure_api.render(message['figures'], message['formats'], message['dpi'],
+                                        message.get('backend', 'matplotlib'), use_server=False)
+            if output:
+                figure_api.write(next(iter(buffers.values())), output)
+                buffers = {}
+        except Exception as e:
+            return self._reply({'ok': False, 'error': f"{type(e).__name__}: {e}"})
+
+        parts = [[figure, fmt, dpi, len(buf)] for (figure, fmt, dpi), buf in buffers.items()]
+        self._reply({'ok': True, 'parts': parts, 'seconds': time.perf_counter() - start},
+                    buffers.values())
+
+    def _reply(self, header, payloads=()):
+        self.wfile.write(json.dumps(header).encode() + b'\n')
+        for payload in payloads:
+            self.wfile.write(payload)
+
+
+class RenderServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    timeout = POLL_SECONDS
+
+    def __init__(self, path):
+        self.path = path
+        self.stopping = False
+        self.last_request = time.monotonic()
+        self.scripts = _script_stat()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            if available(path):
+                raise SystemExit(f"render server already running at {path}")
+            path.unlink()
+        super().__init__(str(path), RenderHandler)
+
+    def stale(self):
+        return _script_stat() != self.scripts
+
+    def process_request(self, request, client_address):
+        self.last_request = time.monotonic()
+        if self.stale():
+            request.close()
+            self.restart()
+        super().process_request(request, client_address)
+
+    def restart(self):
+        """Re-execute with the current scripts (the socket is closed on exec)."""
+        print("render server: scripts changed, restarting", flush=True)
+        self.path.unlink(missing_ok=True)
+        os.execv(sys.executable, [sys.executable, __file__, *sys.argv[1:]])
+
+    def serve(self, idle_timeout=None):
+        while not self.stopping:
+            self.handle_request()
+            self.collect_children()
+            if self.stale():
+                self.restart()
+            if idle_timeout and time.monotonic() - self.last_request > idle_timeout:
+                print(f"render server: idle for {idle_timeout:.0f}s, exiting", flush=True)
+                break
+
+    def server_close(self):
+        super().server_close()
+        self.path.unlink(missing_ok=True)
+
+
+def serve(path, idle_timeout=None, detach=False):
+    if detach and os.fork():
+        # Parent returns once the child is accepting connections
+        for _ in range(600):
+            if available(path):
+                print(f"render server listening on {path}")
+                return 0
+            time.sleep(0.1)
+        print(f"render server did not start on {path}", file=sys.stderr)
+        return 1
+    if detach:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+
+    start = time.perf_counter()
+    warm_up()
+    server = RenderServer(path)
+
+    def stop(signum, frame):
+        server.stopping = True
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"render server ready on {path} (warm-up {time.perf_counter() - start:.2f}s)", flush=True)
+    try:
+        server.serve(idle_timeout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm render server for the figure generators.")
+    parser.add_argument('--socket', type=Path, default=socket_path(),
+                        help=f'socket path (default: ${SOCKET_ENV} or {DEFAULT_SOCKET})')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='start the server')
+    p.add_argument('--detach', action='store_true', help='run in the background')
+    p.add_argument('--idle-timeout', type=float, default=0,
+                   help='exit after this many idle seconds (default: never)')
+
+    p = sub.add_parser('render', help='render one figure through the server')
+    p.add_argument('figure')
+    p.add_argument('--backend', choices=BACKENDS, default='matplotlib')
+    p.add_argument('--format', default='png')
+    p.add_argument('--dpi', type=int, default=300)
+    p.add_argument('-o', '--output', help='output file (default: bytes to stdout)')
+
+    sub.add_parser('ping', help='exit 0 if a server is running')
+    sub.add_parser('stop', help='stop a running server')
+    args = parser.parse_args(argv)
+
+    if args.socket is None:
+        parser.error(f"render server disabled (${SOCKET_ENV} is empty)")
+    if args.command == 'serve':
+        return serve(args.socket, args.idle_timeout, args.detach)
+    if args.command == 'ping':
+        return 0 if available(args.socket) else 1
+    if args.command == 'stop':
+        try:
+            header, _ = request({'command': 'ping'}, args.socket, timeout=2)
+        except (ServerUnavailable, RenderError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        os.kill(header['pid'], signal.SIGTERM)
+        return 0
+
+    try:
+        data = render(args.figure, args.backend, args.format, args.dpi, args.output, args.socket)
+    except (ServerUnavailable, RenderError) as e:
+        print(f"✗ {e}", file=sys.stderr)
+        return 1
+    if data is not None:
+        sys.stdout.buffer.write(data)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
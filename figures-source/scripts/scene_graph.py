@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Declarative scene graph shared by the matplotlib and PIL diagram backends.
+
+A figure is a Scene: a title, a page size in inches and an ordered list of
+named layers, each holding named elements in data units (x and y both run
+0-10, origin bottom-left, as in the matplotlib axes). Colours are palette
+roles ('user', 'ui', 'cube', ...) that each backend maps to its own COLOR_*
+constants.
+
+Scenes are derived from each other with ``Scene.derive``: a derived scene
+keeps its base's layers and only overrides, removes or adds named elements.
+"""
+
+import hashlib
+import importlib
+import json
+from collections import namedtuple
+
+# Elements (all coordinates in data units)
+Box = namedtuple('Box', ['x', 'y', 'width', 'height', 'text', 'color', 'style', 'linewidth'],
+                 defaults=('', 'ui', 'round', 2))
+Text = namedtuple('Text', ['x', 'y', 'text', 'fontsize', 'weight', 'style', 'color'],
+                  defaults=(9, 'normal', 'normal', 'text'))
+Line = namedtuple('Line', ['x1', 'y1', 'x2', 'y2', 'linewidth', 'color'],
+                  defaults=(1.5, 'border'))
+Arrow = namedtuple('Arrow', ['x1', 'y1', 'x2', 'y2', 'style', 'color'],
+                   defaults=('single', 'arrow'))
+
+XLIM = (0, 10)
+YLIM = (0, 10)
+
+# Backend name -> module providing render_scene(scene, path)
+BACKENDS = {
+    'matplotlib': 'generate_diagrams',
+    'pil': 'generate_diagrams_pil',
+}
+
+
+def _encode(obj):
+    """JSON-friendly form of elements that keeps the element type in the hash."""
+    if isinstance(obj, (Box, Text, Line, Arrow)):
+        return [type(obj).__name__, *obj]
+    raise TypeError(f"cannot encode {obj!r}")
+
+
+def _digest(*parts):
+    blob = json.dumps(parts, default=_encode, separators=(',', ':')).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class Scene:
+    """An immutable figure description made of named layers of named elements."""
+
+    def __init__(self, name, title, layers, size=(10, 8), base=None):
+        self.name = name
+        self.title = title
+        self.size = tuple(size)
+        self.base = base
+        self.layers = tuple((layer, tuple(items.items() if isinstance(items, dict) else items))
+                            for layer, items in layers)
+        self._layer_digests = None
+
+    def __repr__(self):
+        return f"Scene({self.name!r}, {self.digest()[:12]})"
+
+    def elements(self):
+        """Yield (layer, element_id, element) in drawing order."""
+        for layer, items in self.layers:
+            for element_id, element in items:
+                yield layer, element_id, element
+
+    def __getitem__(self, element_id):
+        for _, eid, element in self.elements():
+            if eid == element_id:
+                return element
+        raise KeyError(element_id)
+
+    def derive(self, name, title=None, size=None, replace=None, remove=(), add=None):
+        """
+        Return a new scene based on this one.
+
+        ``replace`` maps element ids to a dict of changed fields (or to a
+        whole new element); ``remove`` lists element ids to drop; ``add``
+        maps layer names to {id: element} to append, creating new layers at
+        the top if needed.
+        """
+        replace = dict(replace or {})
+        remove = set(remove)
+        known = {eid for _, eid, _ in self.elements()}
+        missing = (set(replace) | remove) - known
+        if missing:
+            raise KeyError(f"{name}: unknown element(s) {sorted(missing)} in {self.name}")
+
+        layers = []
+        for layer, items in self.layers:
+            new_items = []
+            for eid, element in items:
+                if eid in remove:
+                    continue
+                change = replace.get(eid)
+                if isinstance(change, dict):
+                    element = element._replace(**change)
+                elif change is not None:
+                    element = change
+                new_items.append((eid, element))
+            layers.append([layer, new_items])
+
+        for layer, items in (add or {}).items():
+            target = next((entry for entry in layers if entry[0] == layer), None)
+            if target is None:
+                target = [layer, []]
+                layers.append(target)
+            target[1].extend(items.items())
+
+        return Scene(name, self.title if title is None else title, layers,
+                     size=self.size if size is None else size, base=self)
+
+    def layer_digests(self):
+        """Digest of each layer prefix: entry k covers the page size and layers 0..k."""
+        if self._layer_digests is None:
+            digests, prefix = [], _digest(self.size)
+            for layer in self.layers:
+                prefix = _digest(prefix, layer)
+                digests.append(prefix)
+            self._layer_digests = digests
+        return self._layer_digests
+
+    def digest(self):
+        """Digest of the complete scene, title included."""
+        last = self.layer_digests()[-1] if self.layers else _digest(self.size)
+        return _digest(last, self.title)
+
+
+def get_backend(name):
+    """Import and return the rendering module registered for ``name``."""
+    try:
+        module = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown backend {name!r} (choose from {', '.join(BACKENDS)})")
+    return importlib.import_module(module)
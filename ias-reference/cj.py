@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Collection+JSON documents, as CUBE serves them.
+
+CUBE wraps every response in a ``collection`` with ``items`` (each a
+``data`` list of name/value pairs plus ``links``), collection-level
+``links`` and ``queries``, and a ``template`` that says what a POST or
+PUT must send. List endpoints are paginated with ``limit``/``offset``
+and carry the ``total`` count and a ``next`` link. These helpers build
+such documents (for the mock) and flatten them (for the engine).
+"""
+
+from collections import namedtuple
+
+Item = namedtuple('Item', ['href', 'data', 'links'])
+
+
+def item(href, data, links=None):
+    """One Collection+JSON item from a dict of fields and a dict of rel → href."""
+    return {
+        'href': href,
+        'data': [{'name': k, 'value': v} for k, v in data.items()],
+        'links': [{'rel': rel, 'href': h} for rel, h in (links or {}).items()],
+    }
+
+
+def collection(href, items=(), links=None, queries=(), template=None, total=None, next_href=None):
+    """A Collection+JSON document; ``total`` and ``next`` as CUBE's paginated lists have them."""
+    doc = {'version': '1.0', 'href': href, 'items': list(items),
+           'links': [{'rel': rel, 'href': h} for rel, h in (links or {}).items()]}
+    if queries:
+        doc['queries'] = [{'rel': 'search', 'href': q, 'data': []} for q in queries]
+    if template:
+        doc['template'] = {'data': [{'name': name, 'value': ''} for name in template]}
+    if total is not None:
+        doc['total'] = total
+    if next_href is not None or total is not None:
+        doc['next'] = next_href
+    return {'collection': doc}
+
+
+def template(**fields):
+    """A write body: ``{"template": {"data": [...]}}``."""
+    return {'template': {'data': [{'name': k, 'value': v} for k, v in fields.items()]}}
+
+
+def template_data(body):
+    """The fields of a write body as a dict."""
+    return {d['name']: d['value'] for d in (body or {}).get('template', {}).get('data', [])}
+
+
+def items(doc):
+    """The items of a document as Item(href, data dict, links dict)."""
+    return [Item(i['href'], {d['name']: d['value'] for d in i.get('data', [])},
+                 {link['rel']: link['href'] for link in i.get('links', [])})
+            for i in doc['collection'].get('items', [])]
+
+
+def links(doc):
+    """The collection-level links of a document as a dict of rel → href."""
+    return {link['rel']: link['href'] for link in doc['collection'].get('links', [])}
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Minimal HTTP/1.1 over asyncio streams, for the reference IAS and its mock CUBE.
+
+Only the standard library is used, so the reference code runs wherever
+the build scripts run. The scope is what a JSON API needs and no more:
+
+- ``serve(handler, host, port)`` runs a keep-alive server. ``handler``
+  is a coroutine that takes a Request and returns (status, body, headers),
+  where body is bytes or a JSON-serialisable object;
+- ``ConnectionPool`` is a client with a bounded pool of persistent
+  connections to one origin. Requests wait for a free connection instead
+  of opening new ones. A reused connection that the server has closed
+  is replaced and an idempotent request retried once; a POST fails
+  instead, since the server may already have acted on it. The pool
+  counts requests, connections opened and bytes each way, which the
+  engine reports.
+
+Request and response bodies carry Content-Length; chunked responses are
+read too, since a real CUBE behind a proxy may send them.
+"""
+
+import asyncio
+import json
+from collections import deque, namedtuple
+from urllib.parse import parse_qsl, urlsplit
+
+Request = namedtuple('Request', ['method', 'path', 'query', 'headers', 'body'])
+Response = namedtuple('Response', ['status', 'headers', 'body'])
+
+REASONS = {200: 'OK', 201: 'Created', 202: 'Accepted', 204: 'No Content', 400: 'Bad Request',
+           404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict', 500: 'Internal Server Error'}
+MAX_HEADER_LINES = 100
+# Retried once on a fresh connection when a reused one turns out to be dead
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+
+class HTTPError(Exception):
+    """A response with an error status; ``status`` and ``body`` as received."""
+
+    def __init__(self, method, url, status, body):
+        super().__init__(f"{method} {url} → {status}")
+        self.status = status
+        self.body = body
+
+
+def json_body(response):
+    """The decoded JSON body of a Request or Response (None if empty)."""
+    return json.loads(response.body) if response.body else None
+
+
+async def _read_headers(reader):
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    raise ValueError('too many header lines')
+
+
+async def _read_body(reader, headers):
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await _read_headers(reader)  # trailers
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+    length = int(headers.get('content-length', 0))
+    return await reader.readexactly(length) if length else b''
+
+
+def _encode(start_line, headers, body):
+    lines = [start_line] + [f"{k}: {v}" for k, v in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+# -- server -------------------------------------------------------------------
+
+async def _serve_connection(handler, reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            method, target, version = line.decode('latin-1').split()
+            headers = await _read_headers(reader)
+            body = await _read_body(reader, headers)
+            url = urlsplit(target)
+            request = Request(method, url.path, dict(parse_qsl(url.query)), headers, body)
+            try:
+                status, payload, extra = await handler(request)
+            except Exception as e:  # a handler bug must not kill the connection silently
+                status, payload, extra = 500, {'error': f"{type(e).__name__}: {e}"}, {}
+            if not isinstance(payload, (bytes, bytearray)):
+                payload = json.dumps(payload).encode()
+            close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+            response_headers = {'Content-Type': 'application/json', 'Content-Length': len(payload),
+                                'Connection': 'close' if close else 'keep-alive', **extra}
+            writer.write(_encode(f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+                                 response_headers, bytes(payload)))
+            await writer.drain()
+            if close:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    except asyncio.CancelledError:  # server shutting down with the client still connected
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(handler, host='127.0.0.1', port=0):
+    """Start a keep-alive server for ``handler``; returns the asyncio Server."""
+    return await asyncio.start_server(lambda r, w: _serve_connection(handler, r, w), host, port)
+
+
+def server_url(server):
+    host, port = server.sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}"
+
+
+# -- client -------------------------------------------------------------------
+
+class ConnectionPool:
+    """
+    Persistent connections to one origin, at most ``size`` at a time.
+    With ``keep_alive=False`` every request opens and closes its own
+    connection, as a client without pooling does.
+    """
+
+    def __init__(self, base_url, size=8, keep_alive=True, timeout=30.0):
+        url = urlsplit(base_url)
+        if url.scheme != 'http':
+            raise ValueError(f"only http:// origins are supported: {base_url}")
+        self.base_url = base_url.rstrip('/')
+        self.host, self.port = url.hostname, url.port or 80
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(size)
+        self.requests = self.connections = self.bytes_sent = self.bytes_received = 0
+
+    def url(self, path_or_url):
+        return path_or_url if '://' in path_or_url else self.base_url + path_or_url
+
+    async def _connect(self):
+        self.connections += 1
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _exchange(self, conn, method, target, headers, body):
+        reader, writer = conn
+        data = _encode(f"{method} {target} HTTP/1.1", headers, body)
+        writer.write(data)
+        await writer.drain()
+        line = await reader.readline()
+        if not line:
+            raise ConnectionResetError('connection closed by server')
+        status = int(line.split()[1])
+        response_headers = await _read_headers(reader)
+        response_body = await _read_body(reader, response_headers)
+        self.bytes_sent += len(data)
+        self.bytes_received += len(line) + len(response_body) + \
+            sum(len(k) + len(v) + 4 for k, v in response_headers.items()) + 2
+        return Response(status, response_headers, response_body)
+
+    async def request(self, method, path_or_url, payload=None, headers=None):
+        """
+        Send one request and return the Response; raises HTTPError for a
+        status of 400 or above. ``payload`` is sent as JSON.
+        """
+        url = urlsplit(self.url(path_or_url))
+        target = url.path + (f"?{url.query}" if url.query else '')
+        body = json.dumps(payload).encode() if payload is not None else b''
+        request_headers = {'Host': f"{self.host}:{self.port}", 'Accept': 'application/json',
+                           'Content-Length': len(body),
+                           'Connection': 'keep-alive' if self.keep_alive else 'close'}
+        if payload is not None:
+            request_headers['Content-Type'] = 'application/json'
+        request_headers.update(headers or {})
+
+        async with self._slots:
+            self.requests += 1
+            reused = bool(self._idle)
+            conn = self._idle.popleft() if reused else await self._connect()
+            try:
+                response = await asyncio.wait_for(
+                    self._exchange(conn, method, target, request_headers, body), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn[1].close()
+                if not reused or method not in IDEMPOTENT_METHODS:
+                    raise
+                # The server dropped an idle connection; one retry on a fresh
+                # one, for requests that are safe to send twice
+                conn = await self._connect()
+                try:
+                    response = await asyncio.wait_for(
+                        self._exchange(conn, method, target, request_headers, body), self.timeout)
+                except BaseException:
+                    conn[1].close()
+                    raise
+            except BaseException:
+                conn[1].close()
+                raise
+            if self.keep_alive and response.headers.get('connection', '').lower() != 'close':
+                self._idle.append(conn)
+            else:
+                conn[1].close()
+        if response.status >= 400:
+            raise HTTPError(method, self.url(path_or_url), response.status, response.body)
+        return response
+
+    async def get_json(self, path_or_url):
+        return json_body(await self.request('GET', path_or_url))
+
+    async def close(self):
+        while self._idle:
+            self._idle.popleft()[1].close()
+
+    def stats(self):
+        return {'requests': self.requests, 'connections': self.connections,
+                'bytes_sent': self.bytes_sent, 'bytes_received': self.bytes_received}
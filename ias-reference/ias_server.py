@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Intent endpoint of the reference IAS: one call per intent instead of a chain of CUBE calls.
+
+Serves the action-first API of engineering-brief section 3 in front of
+SeaGaPEngine:
+
+    POST /intents/pipeline    {"search": {"PatientID": ...}, "gather": {"ProtocolName": ...},
+                               "pipeline": {"name": ..., "parameters": {...}}}
+    POST /intents/download    {"search": ..., "gather": ...}; packages the series with pl-zip
+                              → 202 {"jobId": "intent-1", "statusUrl": "/intent/jobs/intent-1"}
+    GET  /intent/jobs/<id>    → {"status": "running" | "completed" | "failed", ...}
+
+A POST checks the body and that the plugin is registered (404
+PipelineNotFound otherwise), starts the intent as a task and answers 202
+at once, as the brief specifies for long-running operations. A finished
+job reports its feed and plugin instance; a failed one reports the phase
+it stopped in and the phases completed before it. Finished jobs are
+kept for ``--job-ttl`` seconds and then dropped (404 JobNotFound), so a
+long-running IAS does not hold every intent it has served.
+
+The engine talks to CUBE over its own connection pool, so when the IAS
+is deployed next to CUBE its calls cost a LAN round trip, not the
+client's. ``--latency-ms`` delays every response of the IAS itself, to
+stand in for the network between the client and the IAS.
+
+Usage: ias_server.py [--port 8020] [--latency-ms 0] [--job-ttl 600] [--cube URL | --cube-latency-ms 1]
+"""
+
+import argparse
+import asyncio
+import itertools
+import re
+import sys
+import time
+
+from http11 import ConnectionPool, json_body, serve, server_url
+from seagap import Intent, IntentError, SeaGaPEngine
+
+PHASES = ('search', 'gather', 'process')
+DOWNLOAD_PLUGIN = 'pl-zip'
+JOB_TTL = 600.0  # seconds a finished job stays queryable
+
+
+class IntentService:
+    """Intent jobs run by ``engine``, and the request handler that serves them."""
+
+    def __init__(self, engine, latency=0.0, job_ttl=JOB_TTL):
+        self.engine = engine
+        self.latency = latency
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.requests = 0
+        self._ids = itertools.count(1)
+
+    def _intent(self, kind, body):
+        """The Intent of a POST body; raises ValueError if it is incomplete."""
+        body = body or {}
+        patient = body.get('search', {}).get('PatientID')
+        protocol = body.get('gather', {}).get('ProtocolName')
+        if not patient or not protocol:
+            raise ValueError('search.PatientID and gather.ProtocolName are required')
+        if kind == 'download':
+            return Intent(str(patient), protocol, DOWNLOAD_PLUGIN, {})
+        pipeline = body.get('pipeline', {})
+        if not pipeline.get('name'):
+            raise ValueError('pipeline.name is required')
+        return Intent(str(patient), protocol, pipeline['name'], dict(pipeline.get('parameters', {})))
+
+    def expire(self):
+        """Drop the jobs that finished more than ``job_ttl`` seconds ago."""
+        cutoff = time.monotonic() - self.job_ttl
+        for job_id in [j for j, job in self.jobs.items() if job.get('finished', cutoff) < cutoff]:
+            task = self.jobs.pop(job_id)['task']
+            if not task.cancelled():
+                task.exception()  # retrieved, so asyncio does not log it as unhandled
+
+    def submit(self, intent):
+        """Start ``intent`` in the background; returns its job id."""
+        self.expire()
+        job_id = f"intent-{next(self._ids)}"
+        job = {'intent': intent, 'created': time.monotonic(), 'reached': []}
+        job['task'] = asyncio.ensure_future(self.engine.run(intent, job['reached']))
+        job['task'].add_done_callback(lambda _: job.update(finished=time.monotonic()))
+        self.jobs[job_id] = job
+        return job_id
+
+    def status(self, job_id):
+        """The job document the status URL returns."""
+        job = self.jobs[job_id]
+        task, intent = job['task'], job['intent']
+        doc = {'jobId': job_id, 'statusUrl': f"/intent/jobs/{job_id}"}
+        if not task.done():
+            return {**doc, 'status': 'running', 'elapsed': round(time.monotonic() - job['created'], 3)}
+        error = task.exception()
+        if error is None:
+            result = task.result()
+            doc.update(status='completed', feedId=result.feed_id, pluginInstanceId=result.instance_id,
+                       files=result.files, seconds=round(result.seconds, 3))
+            if intent.plugin == DOWNLOAD_PLUGIN:
+                doc['downloadUrl'] = (f"{self.engine.pool.base_url}/api/v1/plugins/instances/"
+                                      f"{result.instance_id}/files/")
+            return doc
+        phase = error.phase if isinstance(error, IntentError) else (job['reached'] or ['search'])[-1]
+        return {**doc, 'status': 'failed', 'failedPhase': phase,
+                'completedPhases': list(PHASES[:PHASES.index(phase)]),
+                'error': {'type': type(error).__name__, 'message': str(error)}}
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path, method = request.path, request.method
+
+        match = re.fullmatch(r'/intents/(pipeline|download)', path)
+        if match and method == 'POST':
+            try:
+                intent = self._intent(match.group(1), json_body(request))
+            except ValueError as e:
+                return 400, {'error': 'InvalidIntent', 'message': str(e)}, {}
+            try:
+                await self.engine.plugin(intent.plugin)
+            except IntentError as e:
+                return 404, {'error': 'PipelineNotFound', 'message': str(e), 'phase': 'pipeline'}, {}
+            job_id = self.submit(intent)
+            return 202, {'jobId': job_id, 'statusUrl': f"/intent/jobs/{job_id}"}, \
+                {'Location': f"/intent/jobs/{job_id}"}
+
+        match = re.fullmatch(r'/intent/jobs/([\w-]+)', path)
+        if match and method == 'GET':
+            self.expire()
+            if match.group(1) not in self.jobs:
+                return 404, {'error': 'JobNotFound', 'message': f"no job {match.group(1)}"}, {}
+            return 200, self.status(match.group(1)), {}
+
+        return 404, {'error': 'NotFound', 'message': f"{method} {path}"}, {}
+
+
+async def start(service, host='127.0.0.1', port=0):
+    """Serve ``service``; returns (server, base URL)."""
+    server = await serve(service.handle, host, port)
+    return server, server_url(server)
+
+
+async def _main(args):
+    cube_server = None
+    url = args.cube
+    if url is None:
+        from mock_cube import MockCube, start as start_cube
+        cube = MockCube(latency=args.cube_latency_ms / 1000, job_seconds=args.job_seconds)
+        cube_server, url, _ = await start_cube(cube)
+    pool = ConnectionPool(url, size=args.pool)
+    service = IntentService(SeaGaPEngine(pool), args.latency_ms / 1000, args.job_ttl)
+    server, ias_url = await start(service, args.host, args.port)
+    print(f"IAS at {ias_url}/intents/ in front of CUBE at {url}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await pool.close()
+        if cube_server:
+            cube_server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the reference IAS intent endpoints.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8020)
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='delay added to every IAS response')
+    parser.add_argument('--job-ttl', type=float, default=JOB_TTL,
+                        help=f'seconds a finished job stays queryable (default: {JOB_TTL:g})')
+    parser.add_argument('--cube', help='CUBE base URL (default: start a mock CUBE in process)')
+    parser.add_argument('--cube-latency-ms', type=float, default=1.0,
+                        help="mock CUBE's per-request latency (default: 1)")
+    parser.add_argument('--job-seconds', type=float, default=0.5,
+                        help="mock CUBE's plugin run time (default: 0.5)")
+    parser.add_argument('--pool', type=int, default=16, help='connections to CUBE (default: 16)')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
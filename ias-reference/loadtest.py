@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Load test of the two client patterns that the architecture figures contrast.
+
+Figure 1 draws the Intent Translator in the client making many calls to
+CUBE (the 'multi' arrows). Figure 4 replaces them with one intent call
+to an external IAS, which makes the CUBE calls itself. This harness runs
+both patterns, and one in between, against mock CUBEs with a set
+per-request latency and payload size:
+
+client    The client runs the whole call chain across the WAN. This is
+          SeaGaPEngine in sequential mode, which works the way the
+          current clients do: one call at a time, every file of the
+          patient filtered on the client, discovery and plugin lookups
+          on every intent.
+pipeline  The client runs the pipelined engine, the one the IAS runs,
+          across the WAN.
+intent    The client makes one POST /intents/pipeline across the WAN and
+          polls the job. The IAS (ias_server.py) runs the pipelined
+          engine against a CUBE one LAN hop away.
+
+client and intent differ in two ways at once: the call structure of the
+engine and where it runs. The pipeline pattern separates them. client
+against pipeline is the engine alone, over the same WAN; pipeline
+against intent is the placement alone, with the same engine. A pipeline
+client keeps its discovery and plugin lookups across its own intents,
+as the IAS does across everyone's. All three use the same adaptive
+PollPolicy for completion polling. At each concurrency level, that many
+clients run in a closed loop. Each client
+has its own connection pool and makes ``--intents`` intents back to
+back. The report gives, for each pattern and level:
+
+- throughput;
+- p50 and p99 intent → result latency;
+- calls and kB per intent between the client and its server;
+- calls and kB per intent that reach CUBE.
+
+Written to ``--out``:
+
+- results.json: the settings and every row;
+- results.adoc: an AsciiDoc table of the same numbers;
+- loadtest.png/.svg: latency, throughput and WAN traffic plotted
+  against concurrency;
+- fig01_current_architecture_measured and fig04_external_ias_measured
+  (.png/.svg): the architecture figures, with the numbers of the lowest
+  level written next to their arrows.
+
+The figures need matplotlib and figures-source/scripts. Without them,
+only the tables are written.
+
+Usage: loadtest.py [--levels 1,2,4,8,16,32] [--intents 4] [--wan-ms 40] [--lan-ms 1]
+                   [--payload-bytes 512] [--job-seconds 0.2] [--out build/loadtest]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import ias_server
+import mock_cube
+from http11 import ConnectionPool, HTTPError, json_body
+from seagap import Intent, IntentError, PollPolicy, SeaGaPEngine, percentile
+
+FIGURE_SCRIPTS = Path(__file__).resolve().parent.parent / 'figures-source' / 'scripts'
+PATTERNS = ('client', 'pipeline', 'intent')
+CLIENT_CONNECTIONS = 6  # a browser's connections per origin
+ERRORS = (IntentError, HTTPError, OSError, asyncio.TimeoutError)
+COLORS = {'client': '#D55E00', 'pipeline': '#009E73', 'intent': '#0072B2'}
+COLUMNS = [  # (row key, heading, format)
+    ('pattern', 'Pattern', '{}'),
+    ('concurrency', 'Clients', '{}'),
+    ('throughput', 'Intents/s', '{:.2f}'),
+    ('p50_ms', 'p50 (ms)', '{:.0f}'),
+    ('p99_ms', 'p99 (ms)', '{:.0f}'),
+    ('client_calls', 'Client calls', '{:.1f}'),
+    ('client_kb', 'Client kB', '{:.1f}'),
+    ('cube_calls', 'CUBE calls', '{:.1f}'),
+    ('cube_kb', 'CUBE kB', '{:.1f}'),
+]
+
+
+async def request_intent(pool, intent, poll):
+    """POST ``intent`` to the IAS behind ``pool`` and poll its job; returns the completed job."""
+    response = await pool.request('POST', '/intents/pipeline', {
+        'search': {'PatientID': intent.patient_id},
+        'gather': {'ProtocolName': intent.protocol},
+        'pipeline': {'name': intent.plugin, 'parameters': intent.parameters}})
+    status_url = json_body(response)['statusUrl']
+    start = time.perf_counter()
+    for delay in poll.delays('intent'):
+        await asyncio.sleep(delay)
+        job = await pool.get_json(status_url)
+        if job['status'] == 'completed':
+            poll.observe('intent', time.perf_counter() - start)
+            return job
+        if job['status'] == 'failed':
+            raise IntentError(job['failedPhase'], job['error']['message'])
+
+
+class Bench:
+    """The servers of one load test: a CUBE across the WAN, an IAS and a CUBE next to it."""
+
+    def __init__(self, args):
+        self.args = args
+        cube = dict(patients=args.patients, job_seconds=args.job_seconds,
+                    payload_bytes=args.payload_bytes)
+        self.wan_cube = mock_cube.MockCube(latency=args.wan_ms / 1000, **cube)
+        self.lan_cube = mock_cube.MockCube(latency=args.lan_ms / 1000, **cube)
+        self.poll = PollPolicy()  # shared, so every client starts from a learned estimate
+        self.servers = []
+
+    async def __aenter__(self):
+        server, self.cube_url, _ = await mock_cube.start(self.wan_cube)
+        lan_server, lan_url, _ = await mock_cube.start(self.lan_cube)
+        self.ias_pool = ConnectionPool(lan_url, size=self.args.ias_pool)
+        self.ias = ias_server.IntentService(SeaGaPEngine(self.ias_pool), self.args.wan_ms / 1000)
+        ias, self.ias_url = await ias_server.start(self.ias)
+        self.servers = [server, lan_server, ias]
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ias_pool.close()
+        for server in self.servers:
+            server.close()
+
+    def intent(self, n):
+        patient = str(mock_cube.FIRST_PATIENT + n % self.args.patients)
+        return Intent(patient, 'MPRAGE', 'pl-anonymize', {'profile': 'hipaa-safe-harbor'})
+
+    async def _client(self, pattern, intents):
+        """One client running ``intents`` back to back; returns (latencies, failures, pool)."""
+        latencies, failures = [], 0
+        url = self.ias_url if pattern == 'intent' else self.cube_url
+        pool = ConnectionPool(url, size=CLIENT_CONNECTIONS)
+        engine = None if pattern == 'intent' else \
+            SeaGaPEngine(pool, poll=self.poll, sequential=pattern == 'client')
+        try:
+            for intent in intents:
+                t = time.perf_counter()
+                try:
+                    if engine:
+                        await engine.run(intent)
+                    else:
+                        await request_intent(pool, intent, self.poll)
+                except ERRORS:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - t)
+        finally:
+            await pool.close()
+        return latencies, failures, pool
+
+    async def level(self, pattern, concurrency):
+        """Run one concurrency level of ``pattern``; returns its row."""
+        per_client = self.args.intents
+        intents = [self.intent(n) for n in range(concurrency * per_client)]
+        cube = self.lan_cube if pattern == 'intent' else self.wan_cube
+        cube_before = cube.requests
+        ias_before = self.ias_pool.bytes_sent + self.ias_pool.bytes_received
+
+        t0 = time.perf_counter()
+        outcomes = await asyncio.gather(*(self._client(pattern, intents[c::concurrency])
+                                          for c in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+        latencies = [s for done, _, _ in outcomes for s in done]
+        pools = [pool for _, _, pool in outcomes]
+        ok = max(1, len(latencies))
+        client_bytes = sum(p.bytes_sent + p.bytes_received for p in pools)
+        cube_bytes = client_bytes if pattern != 'intent' else \
+            self.ias_pool.bytes_sent + self.ias_pool.bytes_received - ias_before
+        return {
+            'pattern': pattern,
+            'concurrency': concurrency,
+            'intents': len(intents),
+            'failed': sum(failed for _, failed, _ in outcomes),
+            'throughput': len(latencies) / wall,
+            'p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+            'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+            'client_calls': sum(p.requests for p in pools) / ok,
+            'client_kb': client_bytes / ok / 1000,
+            'cube_calls': (cube.requests - cube_before) / ok,
+            'cube_kb': cube_bytes / ok / 1000,
+        }
+
+
+def _cell(value, fmt):
+    return '-' if value is None else fmt.format(value)
+
+
+def text_table(rows):
+    lines = ['  '.join(f"{heading:>12}" for _, heading, _ in COLUMNS)]
+    for row in rows:
+        lines.append('  '.join(f"{_cell(row[key], fmt):>12}" for key, _, fmt in COLUMNS))
+    return '\n'.join(lines)
+
+
+def adoc_table(rows, settings):
+    cols = ','.join(['2'] + ['1'] * (len(COLUMNS) - 1))
+    lines = [f".Client call chain, pipelined client and intent call ({settings['wan_ms']:g} ms WAN, "
+             f"{settings['lan_ms']:g} ms LAN, {settings['payload_bytes']} B per item)",
+             f'[cols="{cols}",options="header"]', '|===',
+             ' '.join(f"|{heading}" for _, heading, _ in COLUMNS), '']
+    for row in rows:
+        lines.append(' '.join(f"|{_cell(row[key], fmt)}" for key, _, fmt in COLUMNS))
+    lines.append('|===')
+    return '\n'.join(lines) + '\n'
+
+
+def _figure_modules():
+    """(generate_diagrams, figure_scenes), or None without matplotlib or the figure scripts."""
+    if str(FIGURE_SCRIPTS) not in sys.path:
+        sys.path.append(str(FIGURE_SCRIPTS))
+    try:
+        import figure_scenes
+        import generate_diagrams
+        generate_diagrams.load_matplotlib()
+    except ImportError:
+        return None
+    return generate_diagrams, figure_scenes
+
+
+def plot(rows, out_dir, diagrams):
+    """loadtest.png/.svg: latency, throughput and client traffic against concurrency."""
+    plt = diagrams.plt
+    fig, (latency, throughput, traffic) = plt.subplots(1, 3, figsize=(13, 4))
+    levels = sorted({r['concurrency'] for r in rows})
+    for pattern in PATTERNS:
+        mine = [r for r in rows if r['pattern'] == pattern and r['p50_ms'] is not None]
+        x = [r['concurrency'] for r in mine]
+        color = COLORS[pattern]
+        latency.plot(x, [r['p50_ms'] for r in mine], 'o-', color=color, label=f"{pattern} p50")
+        latency.plot(x, [r['p99_ms'] for r in mine], 's--', color=color, label=f"{pattern} p99")
+        throughput.plot(x, [r['throughput'] for r in mine], 'o-', color=color, label=pattern)
+        traffic.plot(x, [r['client_kb'] for r in mine], 'o-', color=color, label=f"{pattern}: client ↔ server")
+        traffic.plot(x, [r['cube_kb'] for r in mine], 's:', color=color, label=f"{pattern}: at CUBE")
+    for ax, ylabel in ((latency, 'intent → result (ms)'), (throughput, 'intents per second'),
+                       (traffic, 'kB per intent')):
+        ax.set_xscale('log', base=2)
+        ax.set_xticks(levels, [str(n) for n in levels])
+        ax.set_ylim(bottom=0)
+        ax.set_xlabel('concurrent clients')
+        ax.set_ylabel(ylabel)
+        ax.grid(True, alpha=0.3)
+        ax.legend(fontsize=8)
+    fig.tight_layout()
+    for fmt in ('png', 'svg'):
+        diagrams.save_figure(fig, out_dir / f"loadtest.{fmt}", fmt)
+    plt.close(fig)
+
+
+def annotate(rows, out_dir, diagrams, scenes):
+    """Figures 1 and 4 with the measured calls, latency and bytes of the lowest level."""
+    lowest = min(r['concurrency'] for r in rows)
+    client, intent = (next(r for r in rows if r['pattern'] == p and r['concurrency'] == lowest)
+                      for p in ('client', 'intent'))
+    if client['p50_ms'] is None or intent['p50_ms'] is None:
+        return []
+    labels = {
+        'fig01_current_architecture': {
+            'translator_to_cube': f"{client['client_calls']:.1f} calls per intent over the WAN\n"
+                                  f"p50 {client['p50_ms']:.0f} ms, {client['client_kb']:.0f} kB"},
+        'fig04_external_ias': {
+            'behav_to_ias': f"{intent['client_calls']:.1f} calls per intent over the WAN\n"
+                            f"p50 {intent['p50_ms']:.0f} ms, {intent['client_kb']:.1f} kB",
+            'ias_to_cube': f"{intent['cube_calls']:.1f} CUBE calls on the LAN\n"
+                           f"{intent['cube_kb']:.0f} kB"},
+    }
+    written = []
+    for name, arrows in labels.items():
+        scene = scenes.measured(name, arrows)
+        for fmt in ('png', 'svg'):
+            path = out_dir / f"{scene.name}.{fmt}"
+            diagrams.render_scene(scene, str(path))
+            written.append(path)
+    return written
+
+
+async def run(args):
+    rows = []
+    async with Bench(args) as bench:
+        # One untimed intent per pattern: discovery, plugin ids and the poll estimates
+        for pattern in PATTERNS:
+            await bench._client(pattern, [bench.intent(0)])
+        for concurrency in args.levels:
+            for pattern in PATTERNS:
+                row = await bench.level(pattern, concurrency)
+                rows.append(row)
+                print(f"  {pattern:>8} × {concurrency:<3} {row['throughput']:6.2f} intents/s"
+                      f"  p50 {_cell(row['p50_ms'], '{:.0f}')} ms", file=sys.stderr)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the client call chain against the intent call.")
+    parser.add_argument('--levels', default='1,2,4,8,16,32',
+                        type=lambda v: [int(n) for n in v.split(',') if n.strip()],
+                        help='comma-separated concurrent clients per level (default: 1,2,4,8,16,32)')
+    parser.add_argument('--intents', type=int, default=4, help='intents per client per level (default: 4)')
+    parser.add_argument('--wan-ms', type=float, default=40.0,
+                        help='latency of each call between the client and its server (default: 40)')
+    parser.add_argument('--lan-ms', type=float, default=1.0,
+                        help='latency of each call from the IAS to CUBE (default: 1)')
+    parser.add_argument('--payload-bytes', type=int, default=512,
+                        help='padding per item of every CUBE response (default: 512)')
+    parser.add_argument('--job-seconds', type=float, default=0.2,
+                        help="mock CUBE's plugin run time (default: 0.2)")
+    parser.add_argument('--patients', type=int, default=20)
+    parser.add_argument('--ias-pool', type=int, default=32, help='connections from the IAS to CUBE (default: 32)')
+    parser.add_argument('--out', type=Path, default=Path('build/loadtest'), help='output directory')
+    parser.add_argument('--no-figures', action='store_true', help='write the tables only')
+    args = parser.parse_args(argv)
+
+    settings = {k: getattr(args, k) for k in ('levels', 'intents', 'wan_ms', 'lan_ms', 'payload_bytes',
+                                              'job_seconds', 'patients', 'ias_pool')}
+    rows = asyncio.run(run(args))
+    args.out.mkdir(parents=True, exist_ok=True)
+    (args.out / 'results.json').write_text(json.dumps({'settings': settings, 'rows': rows}, indent=2) + '\n')
+    (args.out / 'results.adoc').write_text(adoc_table(rows, settings))
+    print(text_table(rows))
+
+    modules = None if args.no_figures else _figure_modules()
+    if modules:
+        plot(rows, args.out, modules[0])
+        annotate(rows, args.out, *modules)
+        print(f"✓ Tables and figures in {args.out}/")
+    else:
+        print(f"✓ Tables in {args.out}/" + ('' if args.no_figures else ' (no figures: matplotlib not available)'))
+    return 1 if any(r['failed'] for r in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for CUBE (the ChRIS backend) and its PACS, for offline runs.
+
+Serves the parts of the CUBE Collection+JSON API that the SeaGaP
+workflow touches, with CUBE's URL layout and document shapes:
+
+    GET  /api/v1/                               feeds, newest first; links to the collections below
+    GET  /api/v1/pacs/series/search/?...        PACS series (the PACS query)
+    GET  /api/v1/pacsfiles/search/?...          files pulled into CUBE, paginated
+    GET  /api/v1/plugins/search/?name=...       plugin lookup
+    POST /api/v1/plugins/<id>/instances/        run a plugin (pl-dircopy creates a feed)
+    GET  /api/v1/plugins/instances/<id>/        instance status
+    GET  /api/v1/<feed id>/, PUT to rename      feeds
+
+Every search filters on exact matches of its query parameters. Patients
+are generated deterministically: ``--patients`` of them from PatientID
+12340 up, each with one study (AccessionNumber ACC<PatientID>) of five
+series (MPRAGE, T1, T2_FLAIR, DWI, localizer) with ``--files`` DICOM
+files each.
+
+Plugin instances move from 'scheduled' to 'started' to
+'finishedSuccessfully' on the clock. A child starts only after its
+parent has finished, as on a real compute environment. ``--job-seconds``
+sets how long the processing plugin runs; pl-dircopy takes a fifth of
+that. ``--latency-ms`` delays every response, to stand in for the
+network between a client and CUBE. ``--payload-bytes`` adds a padding
+field of that size to every item, standing in for the DICOM tags and
+links a real CUBE item carries.
+
+Usage: mock_cube.py [--port 8010] [--latency-ms 0] [--payload-bytes 0] [--job-seconds 0.5]
+                    [--patients 20] [--files 8]
+"""
+
+import argparse
+import asyncio
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import cj
+from http11 import json_body, serve, server_url
+
+PROTOCOLS = ('MPRAGE', 'T1', 'T2_FLAIR', 'DWI', 'localizer')
+FIRST_PATIENT = 12340
+PLUGINS = {1: ('pl-dircopy', 'fs'), 2: ('pl-anonymize', 'ds'), 3: ('pl-freesurfer', 'ds'),
+           4: ('pl-zip', 'ds')}
+PAGE_SIZE = 50
+QUEUE_FRACTION = 0.1  # of a job's run time spent 'scheduled'
+PAGING = {'limit', 'offset'}
+
+
+def _iso(t):
+    """ISO 8601 date of a time.monotonic() value."""
+    return datetime.fromtimestamp(time.time() - time.monotonic() + t, timezone.utc).isoformat()
+
+
+class MockCube:
+    """In-memory CUBE state and the request handler that serves it."""
+
+    def __init__(self, patients=20, files=8, latency=0.0, job_seconds=0.5, page_size=PAGE_SIZE,
+                 payload_bytes=0):
+        self.latency = latency
+        self.padding = 'x' * payload_bytes
+        self.job_seconds = job_seconds
+        self.page_size = page_size
+        self.series, self.files = [], []
+        self.instances, self.feeds = {}, {}
+        self.requests = 0
+        for p in range(patients):
+            patient_id = str(FIRST_PATIENT + p)
+            study_uid = f"1.2.840.113619.{patient_id}"
+            for n, protocol in enumerate(PROTOCOLS, start=1):
+                series = {
+                    'PatientID': patient_id,
+                    'PatientName': f"anon^{patient_id}",
+                    'AccessionNumber': f"ACC{patient_id}",
+                    'StudyInstanceUID': study_uid,
+                    'SeriesInstanceUID': f"{study_uid}.{n}",
+                    'SeriesDescription': protocol,
+                    'ProtocolName': protocol,
+                    'Modality': 'MR',
+                    'NumberOfSeriesRelatedInstances': files,
+                }
+                self.series.append(series)
+                folder = f"SERVICES/PACS/orthanc/{patient_id}-anon/{n:02d}-{protocol}"
+                for i in range(1, files + 1):
+                    self.files.append({
+                        'id': len(self.files) + 1,
+                        'fname': f"{folder}/file-{i:04d}.dcm",
+                        'fsize': 525_312,
+                        **{k: series[k] for k in ('PatientID', 'AccessionNumber', 'StudyInstanceUID',
+                                                  'SeriesInstanceUID', 'ProtocolName')},
+                    })
+
+    # -- documents --------------------------------------------------------------
+
+    def _search(self, base, rows, query, render, links=None):
+        """A paginated, filtered list in CUBE's shape."""
+        filters = {k: v for k, v in query.items() if k not in PAGING}
+        matches = [r for r in rows if all(str(r.get(k)) == v for k, v in filters.items())]
+        limit = int(query.get('limit', self.page_size))
+        offset = int(query.get('offset', 0))
+        page = matches[offset:offset + limit]
+        next_href = None
+        if offset + limit < len(matches):
+            next_href = f"{base}?{urlencode({**filters, 'limit': limit, 'offset': offset + limit})}"
+        return cj.collection(base, [render(r) for r in page], links, total=len(matches),
+                             next_href=next_href)
+
+    def _instance_status(self, inst, now):
+        if now < inst['start_at']:
+            return 'scheduled'
+        if now < inst['end_at']:
+            return 'started'
+        return 'finishedSuccessfully'
+
+    def _instance_item(self, origin, inst, now):
+        status = self._instance_status(inst, now)
+        data = {
+            'id': inst['id'],
+            'plugin_id': inst['plugin_id'],
+            'plugin_name': PLUGINS[inst['plugin_id']][0],
+            'previous_id': inst['previous_id'],
+            'feed_id': inst['feed_id'],
+            'status': status,
+            'start_date': _iso(inst['created']),
+            'end_date': _iso(inst['end_at']) if status == 'finishedSuccessfully' else None,
+            **inst['parameters'],
+        }
+        links = {'feed': f"{origin}/api/v1/{inst['feed_id']}/",
+                 'plugin': f"{origin}/api/v1/plugins/{inst['plugin_id']}/"}
+        if inst['previous_id']:
+            links['previous'] = f"{origin}/api/v1/plugins/instances/{inst['previous_id']}/"
+        return cj.item(f"{origin}/api/v1/plugins/instances/{inst['id']}/", data, links)
+
+    def _feed_item(self, origin, feed):
+        return cj.item(f"{origin}/api/v1/{feed['id']}/",
+                       {'id': feed['id'], 'name': feed['name'], 'creation_date': _iso(feed['created'])},
+                       {'plugin_instances': f"{origin}/api/v1/{feed['id']}/plugininstances/"})
+
+    # -- writes -----------------------------------------------------------------
+
+    def run_plugin(self, plugin_id, fields, now):
+        """Create a plugin instance; pl-dircopy also creates its feed."""
+        name, kind = PLUGINS[plugin_id]
+        previous_id = fields.pop('previous_id', None)
+        if kind == 'fs':
+            if not fields.get('dir'):
+                return 400, {'dir': ['This field is required.']}
+            feed = {'id': len(self.feeds) + 1, 'name': '', 'created': now}
+            self.feeds[feed['id']] = feed
+            feed_id, ready, seconds = feed['id'], now, self.job_seconds / 5
+        else:
+            parent = self.instances.get(int(previous_id or 0))
+            if parent is None:
+                return 400, {'previous_id': ['Invalid plugin instance id.']}
+            feed_id, ready, seconds = parent['feed_id'], max(now, parent['end_at']), self.job_seconds
+        inst = {
+            'id': len(self.instances) + 1,
+            'plugin_id': plugin_id,
+            'previous_id': int(previous_id) if previous_id else None,
+            'feed_id': feed_id,
+            'parameters': fields,
+            'created': now,
+            'start_at': ready + seconds * QUEUE_FRACTION,
+            'end_at': ready + seconds * (1 + QUEUE_FRACTION),
+        }
+        self.instances[inst['id']] = inst
+        return 201, inst
+
+    # -- routing ----------------------------------------------------------------
+
+    def _pad(self, doc):
+        for i in doc.get('collection', {}).get('items', []):
+            i['data'].append({'name': 'padding', 'value': self.padding})
+        return doc
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        status, doc, headers = self._route(request)
+        return status, self._pad(doc) if self.padding else doc, headers
+
+    def _route(self, request):
+        origin = f"http://{request.headers.get('host', 'localhost')}"
+        now = time.monotonic()
+        path, method = request.path, request.method
+
+        if path == '/api/v1/' and method == 'GET':
+            # Newest feeds first, one page of them, as CUBE lists them
+            return 200, self._search(f"{origin}/api/v1/", list(reversed(self.feeds.values())),
+                                     request.query, lambda f: self._feed_item(origin, f), links={
+                'plugins': f"{origin}/api/v1/plugins/",
+                'pacsseries': f"{origin}/api/v1/pacs/series/",
+                'pacsfiles': f"{origin}/api/v1/pacsfiles/",
+            }), {}
+        if path in ('/api/v1/plugins/', '/api/v1/pacs/series/', '/api/v1/pacsfiles/') and method == 'GET':
+            return 200, cj.collection(f"{origin}{path}", queries=[f"{origin}{path}search/"]), {}
+        if path == '/api/v1/pacs/series/search/' and method == 'GET':
+            return 200, self._search(f"{origin}{path}", self.series, request.query,
+                                     lambda s: cj.item(f"{origin}/api/v1/pacs/series/{s['SeriesInstanceUID']}/", s)), {}
+        if path == '/api/v1/pacsfiles/search/' and method == 'GET':
+            return 200, self._search(f"{origin}{path}", self.files, request.query,
+                                     lambda f: cj.item(f"{origin}/api/v1/pacsfiles/{f['id']}/", f)), {}
+        if path == '/api/v1/plugins/search/' and method == 'GET':
+            rows = [{'id': i, 'name': n, 'type': t} for i, (n, t) in PLUGINS.items()]
+            return 200, self._search(f"{origin}{path}", rows, request.query, lambda p: cj.item(
+                f"{origin}/api/v1/plugins/{p['id']}/", p,
+                {'instances': f"{origin}/api/v1/plugins/{p['id']}/instances/"})), {}
+
+        match = re.fullmatch(r'/api/v1/plugins/(\d+)/instances/', path)
+        if match and method == 'POST':
+            plugin_id = int(match.group(1))
+            if plugin_id not in PLUGINS:
+                return 404, {'detail': 'Not found.'}, {}
+            status, result = self.run_plugin(plugin_id, cj.template_data(json_body(request)), now)
+            if status != 201:
+                return status, result, {}
+            return 201, cj.collection(f"{origin}{path}", [self._instance_item(origin, result, now)]), {}
+
+        match = re.fullmatch(r'/api/v1/plugins/instances/(\d+)/', path)
+        if match and method == 'GET':
+            inst = self.instances.get(int(match.group(1)))
+            if inst is None:
+                return 404, {'detail': 'Not found.'}, {}
+            return 200, cj.collection(f"{origin}{path}", [self._instance_item(origin, inst, now)]), {}
+
+        match = re.fullmatch(r'/api/v1/(\d+)/', path)
+        if match and method in ('GET', 'PUT'):
+            feed = self.feeds.get(int(match.group(1)))
+            if feed is None:
+                return 404, {'detail': 'Not found.'}, {}
+            if method == 'PUT':
+                feed['name'] = cj.template_data(json_body(request)).get('name', feed['name'])
+            return 200, cj.collection(f"{origin}{path}", [self._feed_item(origin, feed)]), {}
+
+        return 404, {'detail': 'Not found.'}, {}
+
+
+async def start(cube=None, host='127.0.0.1', port=0):
+    """Serve ``cube`` (a default MockCube if None); returns (server, base URL, cube)."""
+    cube = cube or MockCube()
+    server = await serve(cube.handle, host, port)
+    return server, server_url(server), cube
+
+
+async def _main(args):
+    cube = MockCube(args.patients, args.files, args.latency_ms / 1000, args.job_seconds,
+                    payload_bytes=args.payload_bytes)
+    server, url, _ = await start(cube, args.host, args.port)
+    print(f"Mock CUBE at {url}/api/v1/ ({len(cube.series)} series, {len(cube.files)} files)")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a mock Collection+JSON CUBE for offline runs.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='delay added to every response')
+    parser.add_argument('--payload-bytes', type=int, default=0,
+                        help='padding added to every item of a response (default: 0)')
+    parser.add_argument('--job-seconds', type=float, default=0.5,
+                        help='run time of a processing plugin instance (default: 0.5)')
+    parser.add_argument('--patients', type=int, default=20)
+    parser.add_argument('--files', type=int, default=8, help='DICOM files per series (default: 8)')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
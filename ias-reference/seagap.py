@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Reference Intent-Action Service engine: the SeaGaP workflow as an asyncio pipeline.
+
+figures-source/graphviz/fig05_seagap_pattern.dot draws Search → Gather
+→ Process, and its legend puts the client path at 8-15 REST calls made
+one after the other. This engine runs the same workflow against CUBE's
+Collection+JSON API for one intent, such as "anonymize the MPRAGE of
+patient 12344":
+
+SEARCH   The PACS query, the CUBE file search and the lookups of the two
+         plugins are independent, so they run concurrently. The file
+         search sends the protocol filter to CUBE, and after the first
+         page the remaining pages are fetched concurrently.
+GATHER   Keep the series with the requested ProtocolName. Check that
+         CUBE holds every instance the PACS reports for them, then run
+         pl-dircopy on their directories to create the feed.
+PROCESS  Run the plugin on the feed and name the feed, concurrently. Poll
+         the plugin instance until it finishes.
+
+All requests share one ConnectionPool of persistent connections. URL
+discovery (the API root and each collection's search query) happens
+once per engine, and plugin ids are cached. Completion polling adapts:
+the first poll waits for about as long as this plugin took before, then
+backs off exponentially from POLL_INITIAL up to POLL_MAX.
+
+``sequential=True`` reproduces the current client path for comparison:
+one step at a time, client-side filtering of every file of the patient,
+discovery and plugin lookups on every run, and a fixed polling interval.
+Pair it with ``ConnectionPool(keep_alive=False)`` for a client that
+does not pool connections either.
+
+Each run returns a WorkflowResult with the intent → result time, the
+time per phase, and the number of calls and bytes. The CLI runs intents
+against a mock CUBE started in process (mock_cube.py), or against
+``--cube URL``, and prints percentiles.
+
+Usage: seagap.py [--runs 20] [--concurrency 4] [--sequential] [--latency-ms 20] [--cube URL]
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+
+import cj
+from http11 import ConnectionPool, HTTPError, json_body
+
+POLL_INITIAL = 0.05
+POLL_FACTOR = 1.6
+POLL_MAX = 2.0
+POLL_FIXED = 1.0      # the sequential client's polling interval, as the UI polls
+ESTIMATE_WEIGHT = 0.3  # of the latest run in a plugin's run-time estimate
+ESTIMATE_LEAD = 0.9    # first poll at this fraction of the estimate
+FAILED = {'finishedWithError', 'cancelled'}
+
+# Requests made for the intent being run; concurrent intents share the pool
+_calls = contextvars.ContextVar('calls')
+
+Intent = namedtuple('Intent', ['patient_id', 'protocol', 'plugin', 'parameters'])
+WorkflowResult = namedtuple('WorkflowResult', ['intent', 'feed_id', 'instance_id', 'status', 'files',
+                                               'seconds', 'phases', 'calls', 'polls'])
+
+
+class IntentError(Exception):
+    """An intent that cannot be completed; ``phase`` is where it stopped."""
+
+    def __init__(self, phase, message):
+        super().__init__(f"{phase}: {message}")
+        self.phase = phase
+
+
+class PollPolicy:
+    """Adaptive completion polling, learning each plugin's run time."""
+
+    def __init__(self, initial=POLL_INITIAL, factor=POLL_FACTOR, maximum=POLL_MAX):
+        self.initial, self.factor, self.maximum = initial, factor, maximum
+        self.estimates = {}
+
+    def delays(self, plugin):
+        """Waits before each poll of a ``plugin`` instance."""
+        estimate = self.estimates.get(plugin)
+        if estimate:
+            yield max(self.initial, estimate * ESTIMATE_LEAD)
+        delay = self.initial
+        while True:
+            yield delay
+            delay = min(self.maximum, delay * self.factor)
+
+    def observe(self, plugin, seconds):
+        previous = self.estimates.get(plugin)
+        self.estimates[plugin] = seconds if previous is None else \
+            ESTIMATE_WEIGHT * seconds + (1 - ESTIMATE_WEIGHT) * previous
+
+
+class FixedPoll(PollPolicy):
+    """Polling at a fixed interval, as the current clients do."""
+
+    def __init__(self, interval=POLL_FIXED):
+        super().__init__(interval, 1.0, interval)
+
+    def delays(self, plugin):
+        while True:
+            yield self.initial
+
+
+def _first(doc):
+    return cj.items(doc)[0]
+
+
+class SeaGaPEngine:
+    """Runs SeaGaP intents against one CUBE through ``pool``."""
+
+    def __init__(self, pool, poll=None, sequential=False):
+        self.pool = pool
+        self.sequential = sequential
+        self.poll = poll or (FixedPoll() if sequential else PollPolicy())
+        self._searches = None
+        self._plugins = {}
+        self._lock = asyncio.Lock()
+
+    async def _get(self, url):
+        _calls.get([0])[0] += 1
+        return await self.pool.get_json(url)
+
+    async def _send(self, method, url, payload):
+        _calls.get([0])[0] += 1
+        return json_body(await self.pool.request(method, url, payload))
+
+    async def _all(self, *coros):
+        """Await ``coros`` concurrently, or one by one in sequential mode."""
+        if self.sequential:
+            return [await c for c in coros]
+        return await asyncio.gather(*coros)
+
+    async def discover(self, refresh=False):
+        """{collection: search URL}, from the API root and each collection's query."""
+        if self._searches and not refresh:
+            return self._searches
+        async with self._lock:
+            if self._searches and not refresh:
+                return self._searches
+            root = cj.links(await self._get('/api/v1/'))
+            names = ('plugins', 'pacsseries', 'pacsfiles')
+            docs = await self._all(*(self._get(root[n]) for n in names))
+            self._searches = {n: doc['collection']['queries'][0]['href'] for n, doc in zip(names, docs)}
+        return self._searches
+
+    async def search(self, collection, **filters):
+        """Every item of a filtered search, across all pages."""
+        base = (await self.discover())[collection]
+        query = urlencode(filters)
+        first = await self._get(f"{base}?{query}")
+        found = cj.items(first)
+        if self.sequential:
+            next_href = first['collection'].get('next')
+            while next_href:
+                page = await self._get(next_href)
+                found += cj.items(page)
+                next_href = page['collection'].get('next')
+            return found
+        total, limit = first['collection'].get('total', len(found)), len(found)
+        if limit and total > limit:
+            pages = await asyncio.gather(*(
+                self._get(f"{base}?{urlencode({**filters, 'limit': limit, 'offset': offset})}")
+                for offset in range(limit, total, limit)))
+            for page in pages:
+                found += cj.items(page)
+        return found
+
+    async def plugin(self, name):
+        """The plugin item called ``name``; cached unless sequential."""
+        if name in self._plugins and not self.sequential:
+            return self._plugins[name]
+        found = await self.search('plugins', name=name)
+        if not found:
+            raise IntentError('search', f"plugin {name} is not registered in CUBE")
+        self._plugins[name] = found[0]
+        return found[0]
+
+    async def monitor(self, href, plugin):
+        """Poll a plugin instance until it finishes; returns (item, number of polls)."""
+        start = time.perf_counter()
+        for polls, delay in enumerate(self.poll.delays(plugin), start=1):
+            await asyncio.sleep(delay)
+            inst = _first(await self._get(href))
+            status = inst.data['status']
+            if status == 'finishedSuccessfully':
+                self.poll.observe(plugin, time.perf_counter() - start)
+                return inst, polls
+            if status in FAILED:
+                raise IntentError('process', f"{plugin} instance {inst.data['id']} {status}")
+
+    async def run(self, intent, reached=None):
+        """
+        Execute one intent; returns a WorkflowResult or raises IntentError.
+        Each phase's name is appended to ``reached``, if given, as it starts,
+        so a caller can tell where any other exception stopped the run.
+        """
+        t0 = time.perf_counter()
+        calls = [0]
+        _calls.set(calls)
+        phases = {}
+        reached = [] if reached is None else reached
+
+        # SEARCH
+        reached.append('search')
+        await self.discover(refresh=self.sequential)
+        file_filters = {'PatientID': intent.patient_id}
+        if not self.sequential:
+            file_filters['ProtocolName'] = intent.protocol
+        series, files, dircopy, plugin = await self._all(
+            self.search('pacsseries', PatientID=intent.patient_id),
+            self.search('pacsfiles', **file_filters),
+            self.plugin('pl-dircopy'),
+            self.plugin(intent.plugin))
+        phases['search'] = time.perf_counter() - t0
+
+        # GATHER
+        reached.append('gather')
+        t = time.perf_counter()
+        wanted = {s.data['SeriesInstanceUID']: s.data['NumberOfSeriesRelatedInstances']
+                  for s in series if s.data['ProtocolName'] == intent.protocol}
+        if not wanted:
+            raise IntentError('gather', f"no {intent.protocol} series for patient {intent.patient_id}")
+        files = [f for f in files if f.data['SeriesInstanceUID'] in wanted]
+        for uid, expected in wanted.items():
+            have = sum(1 for f in files if f.data['SeriesInstanceUID'] == uid)
+            if have < expected:
+                raise IntentError('gather', f"series {uid} has {have} of {expected} files in CUBE")
+        dirs = sorted({os.path.dirname(f.data['fname']) for f in files})
+        copy = _first(await self._send('POST', dircopy.links['instances'],
+                                       cj.template(dir=','.join(dirs))))
+        phases['gather'] = time.perf_counter() - t
+
+        # PROCESS
+        reached.append('process')
+        t = time.perf_counter()
+        feed_name = f"{intent.plugin} {intent.protocol} {intent.patient_id}"
+        run, _ = await self._all(
+            self._send('POST', plugin.links['instances'],
+                       cj.template(previous_id=copy.data['id'], **intent.parameters)),
+            self._send('PUT', copy.links['feed'], cj.template(name=feed_name)))
+        inst = _first(run)
+        final, polls = await self.monitor(inst.href, intent.plugin)
+        phases['process'] = time.perf_counter() - t
+
+        return WorkflowResult(intent, copy.data['feed_id'], final.data['id'], final.data['status'],
+                              len(files), time.perf_counter() - t0, phases,
+                              calls[0], polls)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of ``values`` (0 < p <= 100)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def run_intents(engine, intents, concurrency=1):
+    """Run ``intents`` with at most ``concurrency`` in flight; returns results and errors in order."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(intent):
+        async with slots:
+            try:
+                return await engine.run(intent)
+            except (IntentError, HTTPError, OSError, asyncio.TimeoutError) as e:
+                return e
+
+    return await asyncio.gather(*(one(i) for i in intents))
+
+
+def summarize(results, wall, pool):
+    """Latency percentiles, phase means and traffic of a batch of runs."""
+    ok = [r for r in results if isinstance(r, WorkflowResult)]
+    seconds = [r.seconds for r in ok]
+    return {
+        'runs': len(results),
+        'failed': len(results) - len(ok),
+        'throughput': len(ok) / wall if wall else 0.0,
+        'p50': percentile(seconds, 50) if ok else None,
+        'p99': percentile(seconds, 99) if ok else None,
+        'mean': statistics.fmean(seconds) if ok else None,
+        'phases': {p: statistics.fmean(r.phases[p] for r in ok) for p in ('search', 'gather', 'process')}
+                  if ok else {},
+        'calls_per_intent': statistics.fmean(r.calls for r in ok) if ok else None,
+        'polls_per_intent': statistics.fmean(r.polls for r in ok) if ok else None,
+        **pool.stats(),
+    }
+
+
+async def _main(args):
+    server = None
+    url = args.cube
+    if url is None:
+        from mock_cube import MockCube, start
+        cube = MockCube(latency=args.latency_ms / 1000, job_seconds=args.job_seconds)
+        server, url, _ = await start(cube)
+    pool = ConnectionPool(url, size=args.pool, keep_alive=not args.no_keep_alive)
+    engine = SeaGaPEngine(pool, sequential=args.sequential)
+    parameters = dict(p.split('=', 1) for p in args.param)
+    intents = [Intent(args.patient, args.protocol, args.plugin, parameters)] * args.runs
+    t0 = time.perf_counter()
+    try:
+        results = await run_intents(engine, intents, args.concurrency)
+    finally:
+        await pool.close()
+        if server:
+            server.close()
+    summary = summarize(results, time.perf_counter() - t0, pool)
+    for error in {str(r) for r in results if not isinstance(r, WorkflowResult)}:
+        print(f"✗ {error}", file=sys.stderr)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return summary
+    mode = 'sequential client' if args.sequential else 'pipeline'
+    print(f"{summary['runs']} intents ({mode}, concurrency {args.concurrency}) against {url}")
+    if summary['p50'] is not None:
+        print(f"  intent → result  p50 {summary['p50'] * 1000:7.1f} ms   p99 {summary['p99'] * 1000:7.1f} ms")
+        print("  phases (mean)    " + "   ".join(f"{p} {s * 1000:.1f} ms"
+                                               for p, s in summary['phases'].items()))
+        print(f"  per intent       {summary['calls_per_intent']:.1f} calls, "
+              f"{summary['polls_per_intent']:.1f} polls")
+    print(f"  traffic          {summary['requests']} requests on {summary['connections']} connections, "
+          f"{summary['bytes_sent'] + summary['bytes_received']:,} bytes")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run SeaGaP intents through the reference IAS engine.")
+    parser.add_argument('--cube', help='CUBE base URL (default: start a mock CUBE in process)')
+    parser.add_argument('--patient', default='12344')
+    parser.add_argument('--protocol', default='MPRAGE')
+    parser.add_argument('--plugin', default='pl-anonymize')
+    parser.add_argument('--param', action='append', default=['profile=hipaa-safe-harbor'],
+                        metavar='NAME=VALUE', help='plugin parameter; repeatable')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1, help='intents in flight at once')
+    parser.add_argument('--pool', type=int, default=8, help='connections in the pool (default: 8)')
+    parser.add_argument('--sequential', action='store_true',
+                        help='run the steps one by one, as the current clients do')
+    parser.add_argument('--no-keep-alive', action='store_true', help='a new connection per request')
+    parser.add_argument('--latency-ms', type=float, default=20.0,
+                        help="mock CUBE's per-request latency (default: 20)")
+    parser.add_argument('--job-seconds', type=float, default=0.5,
+                        help="mock CUBE's plugin run time (default: 0.5)")
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args(argv)
+    summary = asyncio.run(_main(args))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
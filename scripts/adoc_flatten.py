@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Flatten an AsciiDoc document's include tree into one cached source file.
+
+The HTML and DocBook builds both run asciidoctor on the same master file,
+and each run resolved every ``include::`` again. This script resolves the
+includes once: the result is a single self-contained ``.adoc`` that both
+backends read, with ``leveloffset`` carried over as attribute entries and
+attribute references in include targets (``include::{partsdir}/x.adoc[]``)
+expanded from the attribute entries seen so far.
+
+The flattened file is only rewritten when its content changes. When a
+source file is newer than the old output, it is stamped with the newest
+source mtime, so ``{docdate}`` still reflects the last edit. Any other
+write (no old output, a new FLATTEN_VERSION) is stamped with the current
+time, so make and the orchestrator rebuild whatever was made from the
+old output either way. A small ``.deps.json`` next to it records
+the size, mtime and SHA-256 of every file in the tree, and the include
+targets that did not exist; when none of the files changed and none of
+the missing targets appeared, the run is a handful of ``stat`` calls and
+reads nothing.
+
+Run asciidoctor on the output with ``-B <source dir>`` so ``imagesdir`` and
+any remaining relative paths still resolve against the original document.
+
+Usage: scripts/adoc_flatten.py -o build/.flat/paper_research.adoc paper-research/main.adoc
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from atomic_file import atomic_write, temp_path
+
+FLATTEN_VERSION = 2
+MAX_DEPTH = 64
+
+INCLUDE_RE = re.compile(r'^(\\)?include::([^\[\s]+)\[(.*)\]$')
+ATTRIBUTE_ENTRY_RE = re.compile(r'^:(!)?(\w[\w-]*)(!)?:(?:\s+(.*))?$')
+ATTRIBUTE_REF_RE = re.compile(r'\{(\w[\w-]*)\}')
+LEVELOFFSET_RE = re.compile(r'^:leveloffset(!)?:(?:\s+(\S*))?\s*$')
+
+# Include attributes that select part of a file; such includes are left for
+# asciidoctor to resolve rather than reimplemented here.
+PARTIAL_INCLUDE_ATTRS = {'lines', 'tag', 'tags', 'indent', 'encoding'}
+
+
+def parse_include_attrs(text):
+    """Parse ``leveloffset=+1,opts=optional`` style include attributes into a dict."""
+    attrs = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        name, _, value = part.partition('=')
+        attrs[name.strip()] = value.strip().strip('"')
+    return attrs
+
+
+def substitute(text, attributes):
+    """Expand ``{name}`` references that have a value in ``attributes``."""
+    return ATTRIBUTE_REF_RE.sub(lambda m: attributes.get(m.group(1), m.group(0)), text)
+
+
+def track_attribute(line, attributes):
+    """Update ``attributes`` if ``line`` is an attribute entry."""
+    m = ATTRIBUTE_ENTRY_RE.match(line)
+    if m:
+        unset, name, unset_after, value = m.groups()
+        if unset or unset_after:
+            attributes.pop(name, None)
+        else:
+            attributes[name] = substitute(value or '', attributes)
+
+
+def iter_includes(path, attributes=None):
+    """
+    Yield (including file, included path, include attributes) for every
+    include directive in ``path``'s tree, depth first in document order.
+
+    Missing targets and partial includes (``lines=``, ``tag=``) are yielded
+    too but not descended into.
+    """
+    for kind, *payload in _walk(Path(path), dict(attributes or {}), set(), 0):
+        if kind == 'include':
+            yield tuple(payload)
+
+
+def _walk(path, attributes, stack, depth):
+    """
+    Events for one file's tree: ('line', text) for ordinary lines, and
+    ('include', parent, target, attrs) ... ('end', directive, target, attrs)
+    around each include directive.
+    """
+    path = path.resolve()
+    if path in stack or depth > MAX_DEPTH:
+        raise ValueError(f"include cycle or depth limit at {path}")
+    stack.add(path)
+    with open(path, encoding='utf-8') as f:
+        for raw in f:
+            line = raw.rstrip('\n').rstrip('\r')
+            m = INCLUDE_RE.match(line)
+            if m is None:
+                track_attribute(line, attributes)
+                yield ('line', line)
+                continue
+            escaped, target, attr_text = m.groups()
+            if escaped:
+                # \include:: is literal text; asciidoctor drops the backslash
+                yield ('line', line[1:])
+                continue
+            target_path = path.parent / substitute(target, attributes)
+            include_attrs = parse_include_attrs(attr_text)
+            yield ('include', path, target_path, include_attrs)
+            if resolvable(target_path, include_attrs):
+                yield from _walk(target_path, attributes, stack, depth + 1)
+            yield ('end', line, target_path, include_attrs)
+    stack.discard(path)
+
+
+def resolvable(target, include_attrs):
+    """True if the include is flattened rather than left for asciidoctor."""
+    return target.is_file() and PARTIAL_INCLUDE_ATTRS.isdisjoint(include_attrs)
+
+
+def _apply_offset(level, value):
+    """The level offset after an entry or include attribute of ``value`` at ``level``."""
+    value = (value or '').strip()
+    if value[:1] in ('+', '-'):
+        return level + int(value)
+    return int(value or 0)
+
+
+def flatten(source, attributes=None):
+    """
+    Resolve ``source``'s includes.
+
+    Returns (text, files, missing, warnings): the flattened document, every
+    file it was built from (``source`` first), the include targets that do
+    not exist, and messages about includes that were left in place.
+
+    An include with ``leveloffset`` becomes an attribute entry before its
+    content and one after it that restores the enclosing offset, as
+    asciidoctor restores it at the end of the include.
+    """
+    source = Path(source).resolve()
+    files = [source]
+    missing = []
+    warnings = []
+    out = []
+    level, enclosing = 0, []
+    for event in _walk(source, dict(attributes or {}), set(), 0):
+        kind = event[0]
+        if kind == 'line':
+            m = LEVELOFFSET_RE.match(event[1])
+            if m:
+                level = 0 if m.group(1) else _apply_offset(level, m.group(2))
+            out.append(event[1])
+            continue
+        _, line_or_parent, target, include_attrs = event
+        if kind == 'include':
+            if resolvable(target, include_attrs):
+                files.append(target.resolve())
+                offset = include_attrs.get('leveloffset')
+                if offset:
+                    enclosing.append(level)
+                    level = _apply_offset(level, offset)
+                    # Blank line first so the entry cannot join a preceding paragraph
+                    out.extend(['', f":leveloffset: {offset}"])
+            elif not target.exists():
+                missing.append(target.resolve())
+            continue
+        # 'end' of an include directive
+        if not resolvable(target, include_attrs):
+            # Leave the directive for asciidoctor to resolve or report
+            if target.is_file():
+                warnings.append(f"partial include left as-is: {line_or_parent}")
+            elif 'optional' not in include_attrs.get('opts', ''):
+                warnings.append(f"include target not found: {target}")
+            out.append(line_or_parent)
+            continue
+        if include_attrs.get('leveloffset'):
+            level = enclosing.pop()
+            # Blank line first so the entry cannot join a trailing paragraph
+            out.extend(['', f":leveloffset: {level}"])
+    return '\n'.join(out) + '\n', files, missing, warnings
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _stat_entry(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def tree_key(digests):
+    """Cache key over the flattener version and every (path, sha256) in the tree."""
+    h = hashlib.sha256(f"flatten-v{FLATTEN_VERSION}\0".encode())
+    for path, digest in digests:
+        h.update(f"{path}\0{digest}\0".encode())
+    return h.hexdigest()
+
+
+def _load_deps(path):
+    try:
+        with open(path) as f:
+            deps = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return deps if deps.get('version') == FLATTEN_VERSION else None
+
+
+def _unchanged(deps, output):
+    """
+    True if ``output`` exists, every recorded file still has its size and
+    mtime, and no include target that was missing has been created.
+    """
+    if deps is None or not output.exists():
+        return False
+    if any(os.path.exists(p) for p in deps.get('missing', [])):
+        return False
+    try:
+        return all(_stat_entry(p) == entry['stat'] for p, entry in deps['files'].items())
+    except OSError:
+        return False
+
+
+def update(source, output, deps_path=None, attributes=None):
+    """
+    Bring ``output`` up to date with ``source``'s include tree.
+
+    Returns 'fresh' (nothing read), 'unchanged' (re-read, same content) or
+    'written'.
+    """
+    output = Path(output)
+    deps_path = Path(deps_path) if deps_path else output.with_suffix('.deps.json')
+    deps = _load_deps(deps_path)
+    if _unchanged(deps, output):
+        return 'fresh'
+
+    text, files, missing, warnings = flatten(source, attributes)
+    for warning in warnings:
+        print(f"⚠ {warning}", file=sys.stderr)
+    seen = dict.fromkeys(files)
+    digests = [(str(p), _file_digest(p)) for p in seen]
+    key = tree_key(digests)
+
+    status = 'unchanged'
+    if deps is None or deps.get('key') != key or not output.exists():
+        output.parent.mkdir(parents=True, exist_ok=True)
+        # The newest source mtime when a source is newer than the old output;
+        # otherwise (no old output, a FLATTEN_VERSION bump, a file dropped
+        # from the tree, an older file checked out) now, so whatever was
+        # built from the old output is still seen as stale
+        newest = max(os.stat(p).st_mtime_ns for p in seen)
+        try:
+            previous = output.stat().st_mtime_ns
+        except FileNotFoundError:
+            previous = None
+        stamp = newest if previous is not None and newest > previous else time.time_ns()
+        tmp = temp_path(output)
+        try:
+            Path(tmp).write_text(text, encoding='utf-8')
+            os.utime(tmp, ns=(stamp, stamp))
+            os.replace(tmp, output)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        status = 'written'
+
+    record = {
+        'version': FLATTEN_VERSION,
+        'source': str(Path(source).resolve()),
+        'key': key,
+        'files': {path: {'sha256': digest, 'stat': _stat_entry(path)} for path, digest in digests},
+        'missing': sorted({str(p) for p in missing}),
+    }
+    atomic_write(deps_path, (json.dumps(record, indent=2) + '\n').encode())
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve an AsciiDoc document's includes into one file.")
+    parser.add_argument('source', type=Path, help='master .adoc file')
+    parser.add_argument('-o', '--output', type=Path, required=True, help='flattened .adoc to write')
+    parser.add_argument('--deps', type=Path,
+                        help='dependency record (default: OUTPUT with a .deps.json suffix)')
+    parser.add_argument('-a', '--attribute', action='append', default=[], metavar='NAME=VALUE',
+                        help='attribute available to include targets; repeatable')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only report problems')
+    args = parser.parse_args(argv)
+
+    attributes = dict(a.partition('=')[::2] for a in args.attribute)
+    try:
+        status = update(args.source, args.output, args.deps, attributes)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not args.quiet or status == 'written':
+        print(f"{'✓' if status == 'written' else '·'} {args.output} ({status})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Content-addressed artifact store shared by every checkout on a machine.
+
+Each clone and branch builds into its own build/, but most stage inputs
+are the same across them. This store is a local stand-in for a remote
+build cache. A stage is keyed by a hash of its command, the content of
+its inputs and the versions of the tools it runs. After a stage runs,
+its outputs are stored under that key. When another checkout runs the
+same stage with the same key, it copies the outputs from the store
+instead of running the stage.
+
+Layout under the store root (``$ARTIFACT_STORE``, default
+``~/.cache/ias-papers/artifacts``; set it to an empty string to turn the
+store off):
+
+    objects/ab/<sha256>      file contents, stored once however many entries use them
+    entries/cd/<key>.json    {output name: object digest} for one stage run
+    toolchain.json           tool versions, keyed by executable path, size and mtime
+
+Reading an entry updates its mtime, which makes eviction LRU. After every
+write, the least recently used entries are dropped until the objects fit
+in ``$ARTIFACT_STORE_MAX`` (default 4G). Objects no entry refers to are
+then deleted. All writes are atomic renames, so parallel make jobs and
+branches can share one store. A reader that loses an object to a
+concurrent eviction treats the entry as a miss.
+
+Used three ways:
+
+- ``artifact_store.py run -s STAGE [-i IN ...] -o OUT ... [-t TOOL ...] -- CMD``
+  wraps a command (the Makefile stages do this). Paths in the command
+  under the current directory are made relative before hashing, so
+  checkouts in different places share keys. A directory input stands
+  for every file in it;
+- ``open_store()`` from Python; the figure scripts and
+  scripts/latex_cache.py store their outputs through it;
+- ``artifact_store.py stats`` and ``artifact_store.py gc [--max SIZE]``.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from importlib import metadata
+from pathlib import Path
+
+from atomic_file import atomic_write, temp_path
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: evictions may overlap, which is harmless
+    fcntl = None
+
+STORE_ENV = 'ARTIFACT_STORE'
+MAX_ENV = 'ARTIFACT_STORE_MAX'
+DEFAULT_MAX = '4G'
+STORE_VERSION = 1
+# An unreferenced object younger than this may belong to a put in flight
+ORPHAN_GRACE = 300
+# Executables asked for their version with these arguments; any other tool
+# named in a key (matplotlib, Pillow, graphviz, ...) is looked up as a Python
+# distribution, without importing it
+VERSION_ARGS = {
+    'asciidoctor': ['--version'],
+    'pandoc': ['--version'],
+    'tectonic': ['--version'],
+    'pdflatex': ['--version'],
+    'dot': ['-V'],
+}
+_SIZE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$', re.I)
+
+
+def parse_size(text):
+    """Bytes in a size such as '512M' or '4G'."""
+    match = _SIZE.match(str(text))
+    if not match:
+        raise ValueError(f"not a size: {text!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit.upper() or ' '))
+
+
+def default_root():
+    """The store directory, or None if ``$ARTIFACT_STORE`` turns the store off."""
+    value = os.environ.get(STORE_ENV)
+    if value is not None:
+        return Path(value).expanduser() if value else None
+    base = os.environ.get('XDG_CACHE_HOME') or '~/.cache'
+    return Path(base).expanduser() / 'ias-papers' / 'artifacts'
+
+
+def open_store(root=None):
+    """The shared store, or None when it is turned off."""
+    root = root or default_root()
+    return ArtifactStore(root) if root else None
+
+
+def _digest_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, data)
+
+
+def _relative(text, base=None):
+    """``text`` with the ``base`` (current) directory prefix removed, so keys do not depend on it."""
+    return text.replace(str(base or os.getcwd()) + os.sep, '')
+
+
+class ArtifactStore:
+    """Directory-backed content-addressed store with LRU eviction."""
+
+    def __init__(self, root, max_bytes=None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            parse_size(os.environ.get(MAX_ENV) or DEFAULT_MAX)
+        self._versions = None
+
+    # -- keys -----------------------------------------------------------------
+
+    def tool_versions(self, tools):
+        """{tool: version} for executables in VERSION_ARGS and Python distributions."""
+        return {tool: self._tool_version(tool) for tool in sorted(set(tools))}
+
+    def _tool_version(self, tool):
+        if tool in VERSION_ARGS:
+            exe = shutil.which(tool)
+            if exe is None:
+                return None
+            st = os.stat(exe)
+            ident = f"{os.path.realpath(exe)}:{st.st_size}:{st.st_mtime_ns}"
+            versions = self._load_versions()
+            if ident not in versions:
+                try:
+                    proc = subprocess.run([exe, *VERSION_ARGS[tool]], capture_output=True,
+                                          text=True, timeout=60)
+                    lines = (proc.stdout + proc.stderr).strip().splitlines()
+                except (OSError, subprocess.TimeoutExpired):
+                    lines = []
+                versions[ident] = lines[0] if lines else ''
+                _write(self.root / 'toolchain.json',
+                       json.dumps(versions, indent=2, sort_keys=True).encode())
+            return versions[ident]
+        try:
+            return metadata.version(tool)
+        except metadata.PackageNotFoundError:
+            return None
+
+    def _load_versions(self):
+        if self._versions is None:
+            try:
+                self._versions = json.loads((self.root / 'toolchain.json').read_text())
+            except (FileNotFoundError, ValueError):
+                self._versions = {}
+        return self._versions
+
+    def key(self, stage, command=(), inputs=(), tools=(), extra=None, base=None):
+        """
+        Hash of a stage: its name, command, the content of every input
+        (a directory stands for its non-hidden files) and the tool versions.
+        Paths are taken relative to ``base`` (default: the current directory).
+        """
+        digests = {}
+        for path in map(Path, inputs):
+            name = _relative(str(path), base)
+            if path.is_dir():
+                for file in sorted(p for p in path.rglob('*') if p.is_file()):
+                    if not any(part.startswith('.') for part in file.relative_to(path).parts):
+                        digests[f"{name}/{file.relative_to(path).as_posix()}"] = _digest_file(file)
+            else:
+                digests[name] = _digest_file(path) if path.is_file() else None
+        payload = {
+            'version': STORE_VERSION,
+            'stage': stage,
+            'command': [_relative(str(arg), base) for arg in command],
+            'inputs': digests,
+            'tools': self.tool_versions(tools),
+            'extra': extra,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    # -- entries and objects ----------------------------------------------------
+
+    def _entry_path(self, key):
+        return self.root / 'entries' / key[:2] / f"{key}.json"
+
+    def _object_path(self, digest):
+        return self.root / 'objects' / digest[:2] / digest
+
+    def _entry(self, key):
+        """The outputs of ``key`` ({name: {'sha256', 'size'}}), marking it used; None on a miss."""
+        path = self._entry_path(key)
+        try:
+            entry = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get('version') != STORE_VERSION:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry['outputs']
+
+    def _put_object(self, data=None, source=None):
+        """Store bytes (or the file ``source``) as an object; returns (digest, size)."""
+        if data is None:
+            data = Path(source).read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if path.exists():
+            os.utime(path)
+        else:
+            _write(path, data)
+        return digest, len(data)
+
+    def get(self, key):
+        """{name: bytes} stored under ``key``, or None on a miss."""
+        outputs = self._entry(key)
+        if outputs is None:
+            return None
+        try:
+            return {name: self._object_path(o['sha256']).read_bytes() for name, o in outputs.items()}
+        except FileNotFoundError:  # evicted under us
+            return None
+
+    def put(self, key, outputs, stage=None):
+        """Store ``outputs`` ({name: bytes or path}) under ``key``."""
+        record = {}
+        for name, value in outputs.items():
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                digest, size = self._put_object(data=bytes(value))
+            else:
+                digest, size = self._put_object(source=value)
+            record[name] = {'sha256': digest, 'size': size}
+        entry = {'version': STORE_VERSION, 'stage': stage, 'created': time.time(), 'outputs': record}
+        _write(self._entry_path(key), json.dumps(entry, sort_keys=True).encode())
+        self.evict()
+
+    def fetch(self, key, outputs, touch=True):
+        """
+        Restore the files of ``key`` to ``outputs`` ({name: path}); False
+        on a miss. A file that already holds the stored content is left in
+        place, and with ``touch`` its mtime is moved to now for make.
+        """
+        stored = self._entry(key)
+        if stored is None or set(stored) != set(outputs):
+            return False
+        sources = {name: self._object_path(o['sha256']) for name, o in stored.items()}
+        if not all(p.exists() for p in sources.values()):
+            return False
+        for name, dest in outputs.items():
+            dest = Path(dest)
+            if dest.is_file() and dest.stat().st_size == stored[name]['size'] \
+                    and _digest_file(dest) == stored[name]['sha256']:
+                if touch:
+                    os.utime(dest)
+                continue
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = temp_path(dest)
+            try:
+                shutil.copyfile(sources[name], tmp)
+            except FileNotFoundError:
+                return False
+            os.replace(tmp, dest)
+        return True
+
+    def store(self, key, outputs, stage=None):
+        """Store the files ``outputs`` ({name: path}) under ``key``."""
+        self.put(key, {name: Path(path) for name, path in outputs.items()}, stage)
+
+    # -- eviction ---------------------------------------------------------------
+
+    def _scan(self):
+        entries = []
+        for path in (self.root / 'entries').glob('*/*.json'):
+            try:
+                st = path.stat()
+                outputs = json.loads(path.read_text()).get('outputs', {})
+            except (OSError, ValueError):
+                continue
+            entries.append((st.st_mtime, path, {o['sha256'] for o in outputs.values()}))
+        objects = {}
+        for path in (self.root / 'objects').glob('*/*'):
+            if path.name.startswith('.'):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            objects[path.name] = (st.st_size, st.st_mtime)
+        return sorted(entries, key=lambda e: e[0]), objects
+
+    def evict(self, max_bytes=None):
+        """
+        Drop least recently used entries until the objects fit in
+        ``max_bytes``, then delete unreferenced objects. Returns (entries
+        removed, bytes freed); (0, 0) if another process is evicting.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.lock', 'w') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0, 0
+            entries, objects = self._scan()
+            total = sum(size for size, _ in objects.values())
+            if total <= max_bytes:
+                return 0, 0
+
+            refs = {}
+            for _, _, digests in entries:
+                for digest in digests:
+                    refs[digest] = refs.get(digest, 0) + 1
+            removed = freed = 0
+            now = time.time()
+            for digest, (size, mtime) in objects.items():
+                if digest not in refs and now - mtime > ORPHAN_GRACE:
+                    self._object_path(digest).unlink(missing_ok=True)
+                    total -= size
+                    freed += size
+            for _, path, digests in entries:
+                if total <= max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                removed += 1
+                for digest in digests:
+                    refs[digest] -= 1
+                    if refs[digest] == 0 and digest in objects:
+                        self._object_path(digest).unlink(missing_ok=True)
+                        total -= objects[digest][0]
+                        freed += objects[digest][0]
+            return removed, freed
+
+    def stats(self):
+        entries, objects = self._scan()
+        return {
+            'root': str(self.root),
+            'entries': len(entries),
+            'objects': len(objects),
+            'bytes': sum(size for size, _ in objects.values()),
+            'max_bytes': self.max_bytes,
+        }
+
+
+def run(store, stage, command, inputs=(), outputs=(), tools=()):
+    """Restore ``outputs`` from the store, or run ``command`` and store them; returns its exit status."""
+    if store is None:
+        return subprocess.run(command).returncode
+    tools = list(tools) or [command[0]]
+    key = store.key(stage, command, inputs, tools)
+    targets = {_relative(os.path.abspath(o)): o for o in outputs}
+    if outputs and store.fetch(key, targets):
+        print(f"· {', '.join(outputs)} (artifact store)")
+        return 0
+    try:
+        status = subprocess.run(command).returncode
+    except OSError as e:
+        print(f"{command[0]}: {e}", file=sys.stderr)
+        return 127
+    if status == 0 and outputs and all(os.path.isfile(o) for o in outputs):
+        store.store(key, targets, stage)
+    return status
+
+
+def _human(size):
+    for unit in ('B', 'K', 'M', 'G'):
+        if size < 1024 or unit == 'G':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared content-addressed store for build outputs.")
+    parser.add_argument('--root', type=Path, help=f'store directory (default: ${STORE_ENV} or '
+                                                  f'~/.cache/ias-papers/artifacts)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='restore a stage from the store, or run it and store it')
+    p.add_argument('-s', '--stage', required=True)
+    p.add_argument('-i', '--input', action='append', default=[], help='input file or directory; repeatable')
+    p.add_argument('-o', '--output', action='append', default=[], help='output file; repeatable')
+    p.add_argument('-t', '--tool', action='append', default=[],
+                   help='tool whose version goes into the key (default: the command); repeatable')
+    p.add_argument('cmd', nargs=argparse.REMAINDER, help='-- command and arguments')
+
+    sub.add_parser('stats', help='entries, objects and size of the store')
+    p = sub.add_parser('gc', help='evict least recently used entries')
+    p.add_argument('--max', help=f'size to shrink to (default: ${MAX_ENV} or {DEFAULT_MAX})')
+    args = parser.parse_args(argv)
+
+    store = open_store(args.root)
+    if args.command == 'run':
+        cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        if not cmd:
+            parser.error('run: no command given')
+        return run(store, args.stage, cmd, args.input, args.output, args.tool)
+    if store is None:
+        print(f"Artifact store is off (${STORE_ENV} is empty)")
+        return 0
+    if args.command == 'gc':
+        removed, freed = store.evict(parse_size(args.max) if args.max else None)
+        print(f"Evicted {removed} entries, freed {_human(freed)}")
+    stats = store.stats()
+    print(f"{stats['root']}: {stats['entries']} entries, {stats['objects']} objects, "
+          f"{_human(stats['bytes'])} of {_human(stats['max_bytes'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
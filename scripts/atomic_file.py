@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Atomic file replacement shared by the build scripts and figure generators.
+
+Every cache and output writer in the tree writes a temporary file next to
+the destination and renames it into place, so readers never see a partial
+file. The temporary name is unique per call (``tempfile.mkstemp``), so
+concurrent writers of the same path (parallel make jobs, render workers)
+cannot clobber each other's temporary file; the last rename wins.
+
+mkstemp creates its file 0600; the written file is given the mode a plain
+``open()`` would, so outputs stay readable when they are hardlinked into
+other directories.
+"""
+
+import os
+import tempfile
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def temp_path(dest):
+    """
+    A fresh, unused path next to ``dest``, for building its replacement.
+    The file is not left behind: callers create it themselves (e.g. with
+    os.link) and rename it over ``dest``.
+    """
+    dest = os.fspath(dest)
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(dest)}.", dir=os.path.dirname(dest) or '.')
+    os.close(fd)
+    os.remove(tmp)
+    return tmp
+
+
+def atomic_write(dest, data):
+    """Write ``data`` to ``dest`` via a temporary file in the same directory and a rename."""
+    dest = os.fspath(dest)
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(dest)}.", dir=os.path.dirname(dest) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0o666 & ~_UMASK)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
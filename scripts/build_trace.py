@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Structured build tracing: JSONL spans for every pipeline stage.
+
+Tracing is on when ``$BUILD_TRACE`` names a trace file. Each finished
+stage appends one JSON line:
+
+    {"id": "...", "parent": "...", "stage": "html", "document": "paper_research",
+     "start": 1700000000.12, "end": 1700000001.53, "pid": 1234,
+     "status": "ok", "cache": "miss", "bytes_in": 81234, "bytes_out": 402113}
+
+Lines are written with a single O_APPEND write, so parallel make jobs and
+worker processes can share one file.
+
+Used three ways:
+
+- ``build_trace.py run -s STAGE [-d DOC] [-i IN ...] [-o OUT ...] -- CMD``
+  wraps a command (the Makefile does this for each stage when TRACE=1).
+  Bytes in/out are the sizes of the listed files; the span is a cache
+  hit if every output existed and none changed. The command sees
+  ``$BUILD_TRACE_PARENT`` and this directory on PYTHONPATH, so Python
+  tools it runs record nested spans (the figure generators record one
+  per figure, with their manifest hit/miss);
+- ``span()`` from Python, as a context manager;
+- ``build_trace.py report TRACE`` prints a Gantt chart and per-stage
+  totals; ``build_trace.py chrome TRACE -o trace.json`` converts to the
+  Chrome trace-event format for chrome://tracing or Perfetto.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+TRACE_ENV = 'BUILD_TRACE'
+PARENT_ENV = 'BUILD_TRACE_PARENT'
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+def file_bytes(paths):
+    """Total size of the existing files among ``paths``."""
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def emit(record, trace=None):
+    """Append one span record to the trace file (``$BUILD_TRACE`` by default)."""
+    trace = trace or os.environ.get(TRACE_ENV)
+    if not trace:
+        return
+    line = (json.dumps(record, sort_keys=True) + '\n').encode()
+    fd = os.open(trace, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def span(stage, document=None, **fields):
+    """
+    Time the body as one span; yields the record so the caller can add
+    fields such as ``cache``, ``bytes_in`` or ``bytes_out``. Nothing is
+    written when tracing is off.
+    """
+    record = {
+        'id': uuid.uuid4().hex[:16],
+        'parent': os.environ.get(PARENT_ENV),
+        'stage': stage,
+        'document': document,
+        'pid': os.getpid(),
+        'start': time.time(),
+        **fields,
+    }
+    try:
+        yield record
+    except BaseException:
+        record['status'] = 'error'
+        raise
+    else:
+        record.setdefault('status', 'ok')
+    finally:
+        record['end'] = time.time()
+        emit(record)
+
+
+def _mtimes(paths):
+    result = {}
+    for path in paths:
+        try:
+            result[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            result[path] = None
+    return result
+
+
+def run(stage, command, document=None, inputs=(), outputs=(), trace=None):
+    """Run ``command`` inside a span; returns its exit status."""
+    if trace:
+        os.environ[TRACE_ENV] = os.path.abspath(trace)
+    before = _mtimes(outputs)
+    with span(stage, document, bytes_in=file_bytes(inputs)) as record:
+        env = dict(os.environ)
+        env[PARENT_ENV] = record['id']
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(SCRIPT_DIR), env.get('PYTHONPATH')]))
+        try:
+            status = subprocess.run(command, env=env).returncode
+        except OSError as e:
+            print(f"{command[0]}: {e}", file=sys.stderr)
+            status = 127
+        after = _mtimes(outputs)
+        record['bytes_out'] = file_bytes(outputs)
+        if outputs:
+            unchanged = all(before[p] is not None and before[p] == after[p] for p in outputs)
+            record['cache'] = 'hit' if unchanged else 'miss'
+        record['status'] = 'ok' if status == 0 else f'exit {status}'
+    return status
+
+
+def load(trace):
+    """All span records in ``trace``, in start order."""
+    with open(trace) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda r: r['start'])
+
+
+def _label(record):
+    subject = record.get('document') or record.get('figure')
+    return f"{subject}:{record['stage']}" if subject else record['stage']
+
+
+def _depth(record, by_id):
+    depth = 0
+    while record.get('parent') in by_id:
+        record = by_id[record['parent']]
+        depth += 1
+    return depth
+
+
+def print_report(records, width=60, stream=sys.stdout):
+    """Gantt chart of the spans, then time and cache hits per stage."""
+    if not records:
+        print("empty trace", file=stream)
+        return
+    t0 = min(r['start'] for r in records)
+    total = max(r['end'] for r in records) - t0 or 1e-9
+    by_id = {r['id']: r for r in records}
+
+    print(f"{'span':<40} {'start':>7} {'time':>7}  timeline ({total:.2f}s)", file=stream)
+    for r in records:
+        begin = int((r['start'] - t0) / total * width)
+        length = max(1, int((r['end'] - r['start']) / total * width))
+        mark = '·' if r.get('cache') == 'hit' else ('✗' if r.get('status', 'ok') != 'ok' else '█')
+        label = '  ' * _depth(r, by_id) + _label(r)
+        print(f"{label[:40]:<40} {r['start'] - t0:6.2f}s {r['end'] - r['start']:6.2f}s  "
+              f"{' ' * begin}{mark * length}", file=stream)
+
+    stages = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'hits': 0, 'bytes_out': 0})
+    for r in records:
+        s = stages[r['stage']]
+        s['count'] += 1
+        s['seconds'] += r['end'] - r['start']
+        s['hits'] += r.get('cache') == 'hit'
+        s['bytes_out'] += r.get('bytes_out') or 0
+    print(file=stream)
+    print(f"{'stage':<24} {'spans':>5} {'time':>8} {'hits':>5} {'out':>10}", file=stream)
+    for name, s in sorted(stages.items(), key=lambda item: -item[1]['seconds']):
+        print(f"{name:<24} {s['count']:5d} {s['seconds']:7.2f}s {s['hits']:5d} "
+              f"{s['bytes_out'] / 1024:8.0f} KiB", file=stream)
+
+
+def to_chrome(records):
+    """Chrome trace-event JSON (complete events, one track per process)."""
+    events = []
+    for r in records:
+        args = {k: v for k, v in r.items() if k not in ('start', 'end', 'stage', 'pid')}
+        events.append({
+            'name': _label(r),
+            'cat': r['stage'],
+            'ph': 'X',
+            'ts': r['start'] * 1e6,
+            'dur': (r['end'] - r['start']) * 1e6,
+            'pid': 1,
+            'tid': r['pid'],
+            'args': args,
+        })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and inspect build trace spans.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='run a command as a traced stage')
+    p.add_argument('-t', '--trace', help=f'trace file (default: ${TRACE_ENV})')
+    p.add_argument('-s', '--stage', required=True)
+    p.add_argument('-d', '--document')
+    p.add_argument('-i', '--input', action='append', default=[], help='input file; repeatable')
+    p.add_argument('-o', '--output', action='append', default=[], help='output file; repeatable')
+    p.add_argument('cmd', nargs=argparse.REMAINDER, help='-- command and arguments')
+
+    p = sub.add_parser('report', help='print a Gantt chart and per-stage totals')
+    p.add_argument('trace', type=Path)
+    p.add_argument('--width', type=int, default=60)
+
+    p = sub.add_parser('chrome', help='convert to Chrome trace-event JSON')
+    p.add_argument('trace', type=Path)
+    p.add_argument('-o', '--output', type=Path, required=True)
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        if not cmd:
+            parser.error('run: no command given')
+        return run(args.stage, cmd, args.document, args.input, args.output, args.trace)
+    if args.command == 'report':
+        print_report(load(args.trace), args.width)
+    else:
+        args.output.write_text(json.dumps(to_chrome(load(args.trace))))
+        print(f"Wrote {args.output} (open in chrome://tracing or ui.perfetto.dev)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Persistent dependency index over the documents, their includes and figures.
+
+Parses every master document in the orchestrator's DOCUMENTS, its
+``include::`` tree and the ``image::`` references in each file, plus the
+figure generators' outputs (Graphviz renders and the master PNGs listed in
+figures-source/distribution.json), into one graph of "X is read by Y"
+edges. The graph answers:
+
+- ``affected X``: every file and document that must rebuild when X
+  changes, by a walk over the reverse edges from X (so the cost is the
+  size of the answer, not of the tree);
+- ``orphans``: figures in a document's figures/ directory that no
+  document references.
+
+The index is kept in .cache/dep-index.json together with each file's size
+and mtime; a refresh only re-parses files that changed, and a warm load
+is a ``stat`` per file.
+
+Usage: scripts/dep_index.py [--json] affected PATH [PATH ...]
+       scripts/dep_index.py [--json] orphans
+       scripts/dep_index.py [--json] show
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import defaultdict, deque
+from pathlib import Path
+
+from adoc_flatten import INCLUDE_RE, PARTIAL_INCLUDE_ATTRS, parse_include_attrs, substitute, track_attribute
+from atomic_file import atomic_write
+from documents import DOCUMENTS
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+INDEX_FILE = REPO_ROOT / ".cache" / "dep-index.json"
+DISTRIBUTION = REPO_ROOT / "figures-source" / "distribution.json"
+GRAPHVIZ_DIR = REPO_ROOT / "figures-source" / "graphviz"
+INDEX_VERSION = 1
+
+IMAGE_RE = re.compile(r'image::?([^\[\s:][^\[\s]*)\[')
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.pdf', '.webp'}
+
+
+def scan(path):
+    """
+    Parse one file: returns {'includes': [[target, attrs]], 'images':
+    [target], 'attributes': {name: value}} with targets as written.
+    """
+    includes, images, attributes = [], [], {}
+    with open(path, encoding='utf-8') as f:
+        for raw in f:
+            line = raw.rstrip()
+            if line.startswith('//'):
+                continue
+            m = INCLUDE_RE.match(line)
+            if m:
+                if not m.group(1):
+                    includes.append([m.group(2), parse_include_attrs(m.group(3))])
+                continue
+            track_attribute(line, attributes)
+            images.extend(IMAGE_RE.findall(line))
+    return {'includes': includes, 'images': images, 'attributes': attributes}
+
+
+class DependencyIndex:
+    """
+    The include/image/generator graph, persisted between runs.
+
+    Nodes are repository-relative paths. ``dependents[x]`` holds the
+    nodes that read x directly; ``documents[path]`` names the document
+    whose master file is ``path``.
+    """
+
+    def __init__(self, path=INDEX_FILE, root=REPO_ROOT):
+        self.path = path
+        self.root = root
+        self.files = {}
+        self.dependents = defaultdict(set)
+        self.documents = {}
+        self.figure_dirs = []
+        self.generator_stat = None
+        self._changed = False
+        self._load()
+
+    def _rel(self, path):
+        path = Path(os.path.normpath(self.root / path))
+        try:
+            return str(path.relative_to(self.root))
+        except ValueError:
+            return str(path)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+        self.files = data['files']
+        self.documents = data['documents']
+        self.figure_dirs = data['figure_dirs']
+        self.generator_stat = data['generator_stat']
+        for node, readers in data['dependents'].items():
+            self.dependents[node] = set(readers)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': INDEX_VERSION,
+            'files': self.files,
+            'documents': self.documents,
+            'figure_dirs': self.figure_dirs,
+            'generator_stat': self.generator_stat,
+            'dependents': {node: sorted(readers) for node, readers in sorted(self.dependents.items())},
+        }
+        atomic_write(self.path, (json.dumps(data, indent=1) + '\n').encode())
+
+    def _entry(self, rel):
+        """Parsed entry for ``rel``, re-parsed only if its size or mtime changed; None if missing."""
+        try:
+            st = os.stat(self.root / rel)
+        except OSError:
+            self.files.pop(rel, None)
+            return None
+        entry = self.files.get(rel)
+        if entry is None or entry['stat'] != [st.st_size, st.st_mtime_ns]:
+            entry = scan(self.root / rel)
+            entry['stat'] = [st.st_size, st.st_mtime_ns]
+            self.files[rel] = entry
+            self._changed = True
+        return entry
+
+    def stale(self):
+        """True if any indexed file changed size or mtime (or disappeared)."""
+        for rel, entry in self.files.items():
+            try:
+                st = os.stat(self.root / rel)
+            except OSError:
+                return True
+            if entry['stat'] != [st.st_size, st.st_mtime_ns]:
+                return True
+        return not self.documents or self.generator_stat != self._generator_stat()
+
+    @staticmethod
+    def _generator_stat():
+        """mtimes that change when the generator inputs are edited, added or removed."""
+        return [p.stat().st_mtime_ns if p.exists() else None for p in (DISTRIBUTION, GRAPHVIZ_DIR)]
+
+    def refresh(self):
+        """Re-walk every document, re-parsing only changed files; returns True if the graph changed."""
+        self._changed = False
+        dependents = defaultdict(set)
+        documents = {}
+        seen = set()
+
+        for name, config in DOCUMENTS.items():
+            master = self._rel(config['source'])
+            documents[master] = name
+            root_entry = self._entry(master)
+            if root_entry is None:
+                continue
+            imagesdir = root_entry['attributes'].get('imagesdir', '')
+            stack = [(master, {})]
+            visited = {master}
+            while stack:
+                rel, inherited = stack.pop()
+                entry = self._entry(rel)
+                seen.add(rel)
+                if entry is None:
+                    continue
+                attributes = {**inherited, **entry['attributes']}
+                base = Path(rel).parent
+                for target, include_attrs in entry['includes']:
+                    child = self._rel(base / substitute(target, attributes))
+                    dependents[child].add(rel)
+                    if child not in visited and PARTIAL_INCLUDE_ATTRS.isdisjoint(include_attrs):
+                        visited.add(child)
+                        stack.append((child, attributes))
+                for target in entry['images']:
+                    image = self._rel(Path(config['source']).parent / imagesdir / substitute(target, attributes))
+                    dependents[image].add(rel)
+
+        for source, output in self._generator_edges():
+            dependents[source].add(output)
+
+        self.files = {rel: entry for rel, entry in self.files.items() if rel in seen}
+        changed = (self._changed or documents != self.documents
+                   or dict(dependents) != dict(self.dependents))
+        self.dependents = dependents
+        self.documents = documents
+        self.figure_dirs = sorted(self._figure_dirs())
+        self.generator_stat = self._generator_stat()
+        return changed
+
+    def _figure_dirs(self):
+        dirs = {self._rel(Path(config['source']).parent / 'figures') for config in DOCUMENTS.values()}
+        return {d for d in dirs if (self.root / d).is_dir()}
+
+    def _generator_edges(self):
+        """(input, output) pairs for the figure generators that write into figures/ directories."""
+        edges = []
+        try:
+            with open(DISTRIBUTION) as f:
+                mapping = json.load(f)
+        except (OSError, ValueError):
+            mapping = {'documents': {}, 'figures': []}
+        out_dirs = mapping['documents']
+        for figure in mapping['figures']:
+            for document in figure['documents']:
+                target = f"{out_dirs[document]}/{figure['target']}"
+                edges.append((figure['source'], target))
+                edges.append((self._rel(DISTRIBUTION), target))
+        # generate_seagap_diagram.py renders every DOT file into each paper's figures/
+        for dot in sorted(GRAPHVIZ_DIR.glob('*.dot')):
+            for out_dir in out_dirs.values():
+                edges.append((self._rel(dot), f"{out_dir}/{dot.stem}.png"))
+        return edges
+
+    def ensure_fresh(self):
+        """Refresh and save if anything on disk changed since the index was written."""
+        if self.stale() and self.refresh():
+            self.save()
+        return self
+
+    def affected(self, paths):
+        """
+        Everything downstream of ``paths``: returns (documents, files), the
+        names of the documents to rebuild and every node reached.
+        """
+        queue = deque(self._rel(Path(p).resolve()) for p in paths)
+        reached = set(queue)
+        while queue:
+            node = queue.popleft()
+            for reader in self.dependents.get(node, ()):
+                if reader not in reached:
+                    reached.add(reader)
+                    queue.append(reader)
+        documents = {self.documents[n] for n in reached if n in self.documents}
+        return documents, reached
+
+    def orphans(self):
+        """Image files in the documents' figures/ directories that nothing references."""
+        orphans = []
+        for figure_dir in self.figure_dirs:
+            for path in sorted((self.root / figure_dir).iterdir()):
+                rel = f"{figure_dir}/{path.name}"
+                # Only document files read images, so any reader is a reference
+                if path.suffix.lower() in IMAGE_SUFFIXES and not self.dependents.get(rel):
+                    orphans.append(rel)
+        return orphans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the document dependency index.")
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    sub = parser.add_subparsers(dest='command', required=True)
+    affected = sub.add_parser('affected', help='what must rebuild if these files change')
+    affected.add_argument('paths', nargs='+', type=Path)
+    sub.add_parser('orphans', help='figures no document references')
+    sub.add_parser('show', help='documents and the number of files each reads')
+    args = parser.parse_args(argv)
+
+    index = DependencyIndex().ensure_fresh()
+
+    if args.command == 'affected':
+        documents, files = index.affected(args.paths)
+        result = {'documents': sorted(documents), 'files': sorted(files)}
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            for path in result['files']:
+                print(path)
+            print(f"Documents to rebuild: {', '.join(result['documents']) or 'none'}")
+    elif args.command == 'orphans':
+        orphans = index.orphans()
+        if args.json:
+            print(json.dumps(orphans, indent=2))
+        else:
+            for path in orphans:
+                print(f"⚠ orphaned figure: {path}")
+            print(f"{len(orphans)} orphaned figure(s)")
+        return 1 if orphans else 0
+    else:
+        summary = {name: len({n for n in index.files
+                              if name in index.affected([index.root / n])[0]})
+                   for name in DOCUMENTS}
+        if args.json:
+            print(json.dumps(summary, indent=2))
+        else:
+            for name, count in summary.items():
+                print(f"{name:<28} {count:4d} files")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+The documents this repository builds, shared by the build scripts.
+
+Mirrors the ``build_document`` instantiations in the Makefile. Kept
+separate from orchestrate.py so tools that only need the document list
+(word counts, the watcher, the dependency index) do not import the build
+machinery and the artifact store with it.
+"""
+
+COMMON_ADOC_ATTRS = ['-a', 'data-uri', '-a', 'allow-uri-read']
+COMMON_PANDOC_FLAGS = ['-V', 'lang=en', '-V', 'geometry:margin=1in', '-V', 'fontsize=11pt']
+
+DOCUMENTS = {
+    'paper_research': {
+        'source': 'paper-research/main.adoc',
+    },
+    'paper_engineering': {
+        'source': 'paper-engineering/main.adoc',
+    },
+    'engineering_brief': {
+        'source': 'engineering-brief/main.adoc',
+    },
+    'agentic-nondeterminism': {
+        'source': 'agentic-nondeterminism/LLM-to-IAS.adoc',
+        'adoc_attrs': COMMON_ADOC_ATTRS + ['-a', 'stem=latexmath'],
+        'pandoc_flags': COMMON_PANDOC_FLAGS + ['-V', 'documentclass=IEEEtran',
+                                               '-V', 'classoption=onecolumn'],
+    },
+}
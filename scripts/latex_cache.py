@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+LaTeX compile cache for the PDF builds.
+
+A PDF depends on the generated .tex, the files it pulls in
+(``\\includegraphics``, ``\\input``, ``\\include``, ``\\bibliography``)
+and the engine. ``compile`` hashes all of them. When the hash matches an
+earlier compile, the PDF comes from the artifact store shared by all
+checkouts (scripts/artifact_store.py, or .cache/latex/store/ when that
+is turned off) and the engine does not run. An unchanged PDF in the
+output directory is left alone, so its mtime and everything downstream
+stay put. The Makefile and orchestrate.py both compile through here.
+
+On a miss with pdflatex, the shared part of the preamble (everything
+before the first ``\\title``/``\\author``/``\\date`` or
+``\\begin{document}``) is dumped once into a format file,
+.cache/latex/formats/<hash>.fmt. The document is then compiled from the
+rest of the file with ``-fmt``, so the class and packages are not loaded
+again. The template yields two such preambles: IEEEtran in conference
+mode for the papers, and ``classoption=onecolumn`` for
+agentic-nondeterminism. If the format cannot be built or the compile
+with it fails, the plain command runs.
+
+Tectonic cannot load a user format. It builds and caches its own from
+its bundle, so ``warm`` compiles each template variant once to fetch
+the bundle files and formats they need. For tectonic, the compile
+cache is what makes repeat builds cheap.
+
+Usage: scripts/latex_cache.py compile TEX [--engine tectonic] [--outdir DIR] [--resource-path P]
+       scripts/latex_cache.py warm [--engine pdflatex]
+       scripts/latex_cache.py key TEX [--resource-path P]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from artifact_store import ArtifactStore, open_store
+from atomic_file import atomic_write
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = REPO_ROOT / ".cache" / "latex"
+LATEX_TEMPLATE = REPO_ROOT / "latex" / "academic-template.tex"
+
+CACHE_VERSION = 1
+FORMAT_ENGINES = ('pdflatex', 'latex')
+GRAPHIC_SUFFIXES = ('', '.pdf', '.png', '.jpg', '.jpeg', '.eps')
+# Pandoc variables of each template variant; mirrors the Makefile's PANDOC_FLAGS
+COMMON_PANDOC_FLAGS = ['-V', 'lang=en', '-V', 'geometry:margin=1in', '-V', 'fontsize=11pt']
+VARIANTS = {
+    'ieee-conference': COMMON_PANDOC_FLAGS,
+    'ieee-onecolumn': COMMON_PANDOC_FLAGS + ['-V', 'documentclass=IEEEtran', '-V', 'classoption=onecolumn'],
+}
+DOCUMENT_SPECIFIC = re.compile(r'^\s*\\(title|author|date|begin\{document\})\b', re.M)
+REFERENCE = re.compile(r'\\(includegraphics|input|include|bibliography)\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}')
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def engine_version(engine):
+    """First line of ``engine --version``, or '' if it cannot be run."""
+    try:
+        out = subprocess.run([engine, '--version'], capture_output=True, text=True, timeout=30).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return ''
+    return out.splitlines()[0] if out else ''
+
+
+def engine_command(engine, tex, outdir):
+    """The plain compile command, as the Makefile ran it before the cache."""
+    if engine == 'tectonic':
+        return [engine, '--keep-logs', '--keep-intermediates', f'--outdir={outdir}', str(tex)]
+    return [engine, '-interaction=nonstopmode', f'-output-directory={outdir}', str(tex)]
+
+
+# -- dependencies -------------------------------------------------------------
+
+def _strip_comments(tex):
+    return re.sub(r'(?<!\\)%.*', '', tex)
+
+
+def _search_dirs(tex_path, resource_path):
+    dirs = [tex_path.parent, Path.cwd()]
+    dirs.extend(Path(p) for p in (resource_path or '').split(os.pathsep) if p)
+    return dirs
+
+
+def _resolve(name, kind, dirs):
+    suffixes = {'includegraphics': GRAPHIC_SUFFIXES, 'bibliography': ('.bib',)}.get(kind, ('', '.tex'))
+    for directory in dirs:
+        for suffix in suffixes:
+            candidate = directory / f"{name}{suffix}"
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+def dependencies(tex_path, resource_path=None, _seen=None):
+    """
+    {reference: path or None} for every file ``tex_path`` pulls in,
+    recursively through ``\\input``; unresolved references map to None.
+    """
+    seen = _seen if _seen is not None else {}
+    dirs = _search_dirs(tex_path, resource_path)
+    for kind, names in REFERENCE.findall(_strip_comments(tex_path.read_text(errors='replace'))):
+        for name in names.split(',') if kind == 'bibliography' else [names]:
+            name = name.strip()
+            ref = f"{kind}:{name}"
+            if not name or ref in seen:
+                continue
+            path = _resolve(name, kind, dirs)
+            seen[ref] = path
+            if path is not None and kind in ('input', 'include') and path.suffix == '.tex':
+                dependencies(path, resource_path, seen)
+    return seen
+
+
+def compile_key(tex_path, engine, resource_path=None):
+    """Hash of the .tex, every file it references, the engine and its version."""
+    h = hashlib.sha256(f"v{CACHE_VERSION}\0{engine}\0{engine_version(engine)}\0".encode())
+    h.update(tex_path.read_bytes())
+    for ref, path in sorted(dependencies(tex_path, resource_path).items()):
+        content = _digest(path.read_bytes()) if path else 'missing'
+        h.update(f"\0{ref}\0{content}".encode())
+    return h.hexdigest()
+
+
+# -- preamble formats ---------------------------------------------------------
+
+def split_preamble(tex):
+    """(shared preamble, rest): the preamble up to the first document-specific line."""
+    match = DOCUMENT_SPECIFIC.search(tex)
+    if match is None:
+        return '', tex
+    return tex[:match.start()], tex[match.start():]
+
+
+def build_format(preamble, engine, cache_dir=CACHE_DIR):
+    """Dump ``preamble`` into a format file; returns its name, or None if that fails."""
+    name = _digest(f"{engine}\0{engine_version(engine)}\0{preamble}".encode())[:16]
+    formats = cache_dir / "formats"
+    if (formats / f"{name}.fmt").exists():
+        return name
+    formats.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=formats) as work:
+        (Path(work) / f"{name}.tex").write_text(preamble + "\\dump\n")
+        proc = subprocess.run([engine, '-ini', '-interaction=nonstopmode', f'-jobname={name}',
+                               f'&{engine}', f'{name}.tex'],
+                              cwd=work, capture_output=True, text=True)
+        built = Path(work) / f"{name}.fmt"
+        if proc.returncode != 0 or not built.exists():
+            return None
+        built.replace(formats / f"{name}.fmt")
+    return name
+
+
+def _compile_with_format(tex_path, engine, outdir, cache_dir):
+    """Compile ``tex_path`` against its precompiled preamble; False if that is not possible."""
+    preamble, rest = split_preamble(tex_path.read_text())
+    if not preamble:
+        return False
+    name = build_format(preamble, engine, cache_dir)
+    if name is None:
+        return False
+    body = Path(outdir) / f".{tex_path.stem}.body.tex"
+    body.write_text(rest)
+    env = dict(os.environ)
+    # A trailing separator keeps the engine's own format directories searched too
+    env['TEXFORMATS'] = f"{cache_dir / 'formats'}{os.pathsep}{env.get('TEXFORMATS', '')}"
+    try:
+        proc = subprocess.run([engine, '-interaction=nonstopmode', f'-fmt={name}',
+                               f'-jobname={tex_path.stem}', f'-output-directory={outdir}', str(body)],
+                              env=env)
+    finally:
+        body.unlink(missing_ok=True)
+    return proc.returncode == 0
+
+
+# -- compile ------------------------------------------------------------------
+
+def pdf_store(cache_dir=CACHE_DIR):
+    """The shared artifact store, or a private one in ``cache_dir`` when that is off."""
+    return open_store() or ArtifactStore(cache_dir / "store")
+
+
+def compile_pdf(tex_path, engine='tectonic', outdir=None, resource_path=None, force=False,
+                cache_dir=CACHE_DIR):
+    """
+    Produce ``outdir/<stem>.pdf`` from ``tex_path``; returns (status, key)
+    with status 'hit', 'unchanged' (hit, PDF already in place) or 'built'.
+    Raises subprocess.CalledProcessError if the engine fails.
+    """
+    tex_path = Path(tex_path)
+    outdir = Path(outdir or tex_path.parent)
+    pdf = outdir / f"{tex_path.stem}.pdf"
+    key = compile_key(tex_path, engine, resource_path)
+    store = pdf_store(cache_dir)
+
+    cached = None if force else store.get(key)
+    if cached:
+        data = cached['pdf']
+        if pdf.exists() and _digest(pdf.read_bytes()) == _digest(data):
+            return 'unchanged', key
+        outdir.mkdir(parents=True, exist_ok=True)
+        atomic_write(pdf, data)
+        return 'hit', key
+
+    outdir.mkdir(parents=True, exist_ok=True)
+    if not (engine in FORMAT_ENGINES and _compile_with_format(tex_path, engine, outdir, cache_dir)):
+        command = engine_command(engine, tex_path, outdir)
+        proc = subprocess.run(command)
+        # A failed run can still leave a PDF behind (pdflatex in nonstopmode,
+        # or one from an earlier build); it is not stored
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, command)
+    if pdf.exists():
+        store.put(key, {'pdf': pdf}, stage='pdf')
+    return 'built', key
+
+
+def render_template(variant, workdir, template=LATEX_TEMPLATE):
+    """A minimal document from the template with ``variant``'s pandoc variables."""
+    tex = Path(workdir) / f"{variant}.tex"
+    subprocess.run(['pandoc', '-f', 'markdown', '-t', 'latex', f'--template={template}',
+                    '-M', f'title={variant}', *VARIANTS[variant], '-o', str(tex)],
+                   input='cache\n', text=True, check=True)
+    return tex
+
+
+def warm(engine, variants=VARIANTS, cache_dir=CACHE_DIR):
+    """Precompile each template variant's preamble (pdflatex) or fetch its bundle files (tectonic)."""
+    results = {}
+    with tempfile.TemporaryDirectory() as work:
+        for variant in variants:
+            tex = render_template(variant, work)
+            if engine in FORMAT_ENGINES:
+                preamble, _ = split_preamble(tex.read_text())
+                results[variant] = build_format(preamble, engine, cache_dir) is not None
+            else:
+                proc = subprocess.run(engine_command(engine, tex, work), capture_output=True)
+                results[variant] = proc.returncode == 0
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cached LaTeX compiles and precompiled preambles.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('compile', help='compile a .tex to PDF unless an identical compile is cached')
+    p.add_argument('tex', type=Path)
+    p.add_argument('--engine', default=os.environ.get('PDF_ENGINE', 'tectonic'))
+    p.add_argument('--outdir', type=Path, help='output directory (default: next to the .tex)')
+    p.add_argument('--resource-path', help=f'{os.pathsep}-separated directories to find figures in')
+    p.add_argument('--force', action='store_true', help='compile even on a cache hit')
+
+    p = sub.add_parser('warm', help='precompile the template preambles / warm the tectonic bundle')
+    p.add_argument('--engine', default=os.environ.get('PDF_ENGINE', 'tectonic'))
+
+    p = sub.add_parser('key', help='print the compile key and the files it covers')
+    p.add_argument('tex', type=Path)
+    p.add_argument('--engine', default=os.environ.get('PDF_ENGINE', 'tectonic'))
+    p.add_argument('--resource-path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'key':
+        print(compile_key(args.tex, args.engine, args.resource_path))
+        for ref, path in sorted(dependencies(args.tex, args.resource_path).items()):
+            print(f"  {ref} → {path or 'missing'}")
+        return 0
+
+    if args.command == 'warm':
+        try:
+            results = warm(args.engine)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"✗ cannot warm the LaTeX cache: {e}", file=sys.stderr)
+            return 1
+        for variant, ok in results.items():
+            print(f"{'✓' if ok else '✗'} {variant} ({args.engine})")
+        return 0 if all(results.values()) else 1
+
+    try:
+        status, key = compile_pdf(args.tex, args.engine, args.outdir, args.resource_path, args.force)
+    except subprocess.CalledProcessError as e:
+        print(f"✗ {args.engine} failed on {args.tex} (exit {e.returncode})", file=sys.stderr)
+        return 1
+    print(f"{'✓' if status == 'built' else '·'} {args.tex.stem}.pdf "
+          f"({'compiled' if status == 'built' else 'cached'}, {key[:12]})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Display-resolution image variants for the data-uri HTML builds.
+
+The HTML builds inline every image as base64, so a 300 DPI print master
+ends up in the page at full size. This script mirrors a document's
+figures/ directory into a variant directory holding, under the same file
+names:
+
+- raster images scaled down to ``--width`` pixels (the ``width=100%``
+  content column, with headroom for high-density screens), never up;
+- re-encoded as optimised PNG, or as a palette PNG when 256 colours
+  reproduce the image (our diagrams are flat colour, so they almost always
+  do) and the result is smaller;
+- optionally a WebP next to each PNG (``--webp``) for serving the figures
+  outside the inlined HTML.
+
+The HTML backend is pointed at the variant directory with ``-a imagesdir=``;
+the DocBook/PDF path keeps reading the print masters. Every variant is
+cached under .cache/images/ by a hash of the source bytes and the encoding
+settings, and hardlinked into place, so an unchanged figure costs one hash.
+A ``.manifest.json`` in the variant directory is rewritten only when some
+variant changed, which gives make a target with a meaningful mtime.
+
+Without Pillow the variant directory just links the originals.
+
+Usage: scripts/optimize_images.py [--width PX] [--webp] -o build/html-images/paper_research paper-research/figures
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from atomic_file import atomic_write, temp_path
+
+try:
+    from PIL import Image, ImageChops, ImageStat, features
+except ImportError:
+    Image = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = REPO_ROOT / ".cache" / "images"
+
+OPTIMIZE_VERSION = 1
+DISPLAY_WIDTH = 1500          # asciidoctor's 62.5em (1000 px) content column at 1.5x
+RASTER_SUFFIXES = {'.png', '.jpg', '.jpeg'}
+# Mean per-channel error (0-255, composited on white) a palette PNG may
+# introduce and still be used; flat diagrams land well under it, antialiased
+# graph renders above it
+PALETTE_TOLERANCE = 2.5
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def variant_key(data, width, webp):
+    """Cache key for the variants of ``data`` under the given settings."""
+    settings = f"v{OPTIMIZE_VERSION}:w{width}:webp{int(webp)}:pil{Image.__version__ if Image else '-'}"
+    return _digest(settings.encode() + b'\0' + data)
+
+
+def _encode_png(img):
+    buf = io.BytesIO()
+    img.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+
+def _on_white(img):
+    """``img`` as it appears on the (white) page."""
+    if img.mode == 'P':
+        img = img.convert('RGBA')
+    if 'A' not in img.getbands():
+        return img.convert('RGB')
+    page = Image.new('RGBA', img.size, (255, 255, 255, 255))
+    return Image.alpha_composite(page, img.convert('RGBA')).convert('RGB')
+
+
+def _palette_png(img):
+    """Palette PNG of ``img`` if it looks the same on the page, else None."""
+    if 'A' in img.getbands() and img.getchannel('A').getextrema() == (255, 255):
+        img = img.convert('RGB')
+    if 'A' in img.getbands():
+        quantized = img.convert('RGBA').quantize(colors=256, method=Image.Quantize.FASTOCTREE,
+                                                 dither=Image.Dither.NONE)
+    else:
+        quantized = img.convert('RGB').quantize(colors=256, method=Image.Quantize.MEDIANCUT,
+                                                dither=Image.Dither.NONE)
+    data = _encode_png(quantized)
+    # Judge the decoded file: that is where the tRNS transparency lives
+    with Image.open(io.BytesIO(data)) as decoded:
+        error = ImageStat.Stat(ImageChops.difference(_on_white(img), _on_white(decoded))).mean
+    return data if max(error) <= PALETTE_TOLERANCE else None
+
+
+def optimize(data, width=DISPLAY_WIDTH, webp=False):
+    """
+    Return {suffix: bytes} for one raster image: always '.png' (or the
+    original suffix for JPEG sources), plus '.webp' when requested.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if img.format == 'JPEG':
+            # Photographs: resize only, keep JPEG
+            img = _resized(img, width)
+            buf = io.BytesIO()
+            img.save(buf, format='JPEG', quality=88, optimize=True, progressive=True)
+            outputs = {'.jpg': buf.getvalue()}
+        else:
+            img = _resized(img, width)
+            if img.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                img = img.convert('RGBA')
+            candidates = [_encode_png(img)]
+            if img.mode != 'P':
+                candidates.append(_palette_png(img))
+            outputs = {'.png': min(filter(None, candidates), key=len)}
+        if webp and features.check('webp'):
+            buf = io.BytesIO()
+            img.save(buf, format='WEBP', lossless=True, method=6)
+            outputs['.webp'] = buf.getvalue()
+    return outputs
+
+
+def _resized(img, width):
+    if img.width <= width:
+        return img
+    height = round(img.height * width / img.width)
+    return img.resize((width, height), Image.LANCZOS)
+
+
+def cached_variants(source, width=DISPLAY_WIDTH, webp=False, cache_dir=CACHE_DIR):
+    """Return {suffix: cache path} for ``source``, optimising only on a miss."""
+    data = source.read_bytes()
+    key = variant_key(data, width, webp)
+    index = cache_dir / f"{key}.json"
+    if index.exists():
+        suffixes = json.loads(index.read_text())
+        paths = {s: cache_dir / f"{key}{s}" for s in suffixes}
+        if all(p.exists() for p in paths.values()):
+            return paths
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    outputs = optimize(data, width, webp)
+    # A variant that is not smaller than the master is not worth having
+    main_suffix = next(iter(outputs))
+    if len(outputs[main_suffix]) >= len(data):
+        outputs[main_suffix] = data
+    paths = {}
+    for suffix, blob in outputs.items():
+        paths[suffix] = cache_dir / f"{key}{suffix}"
+        atomic_write(paths[suffix], blob)
+    atomic_write(index, json.dumps(list(outputs)).encode())
+    return paths
+
+
+def _link(src, dest):
+    """Hardlink ``src`` to ``dest`` (copy across devices); False if already identical."""
+    try:
+        if os.path.samefile(src, dest):
+            return False
+    except OSError:
+        pass
+    tmp = temp_path(dest)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+    return True
+
+
+def build_variants(figures_dir, out_dir, width=DISPLAY_WIDTH, webp=False, cache_dir=CACHE_DIR):
+    """
+    Mirror ``figures_dir`` into ``out_dir`` with display variants.
+
+    Returns the manifest: {name: {'source', 'bytes', 'variant',
+    'variant_bytes'}}, where 'variant' names the cached file linked in.
+    It holds no mtimes, so touching a figure without changing it leaves
+    the manifest (and the HTML build that depends on it) alone.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    keep = {'.manifest.json'}
+    sources = sorted(p for p in figures_dir.iterdir() if p.is_file()) if figures_dir.is_dir() else []
+    for source in sources:
+        if source.name.startswith('.'):
+            continue
+        if Image is not None and source.suffix.lower() in RASTER_SUFFIXES:
+            variants = cached_variants(source, width, webp, cache_dir)
+        else:
+            variants = {source.suffix: source}
+        main = variants.pop(next(iter(variants)))
+        _link(main, out_dir / source.name)
+        keep.add(source.name)
+        for suffix, path in variants.items():
+            _link(path, out_dir / f"{source.stem}{suffix}")
+            keep.add(f"{source.stem}{suffix}")
+        manifest[source.name] = {
+            'source': str(source),
+            'bytes': source.stat().st_size,
+            'variant': main.name,
+            'variant_bytes': main.stat().st_size,
+        }
+
+    # Drop variants whose source figure (or encoding) is gone
+    for stale in out_dir.iterdir():
+        if stale.is_file() and stale.name not in keep:
+            stale.unlink()
+    return manifest
+
+
+def write_manifest(out_dir, manifest):
+    """Write .manifest.json only if it changed; return True if written."""
+    path = out_dir / '.manifest.json'
+    text = json.dumps(manifest, indent=2, sort_keys=True) + '\n'
+    if path.exists() and path.read_text() == text:
+        return False
+    atomic_write(path, text.encode())
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build display-size figure variants for HTML builds.")
+    parser.add_argument('figures_dir', type=Path, help="a document's figures/ directory")
+    parser.add_argument('-o', '--out-dir', type=Path, required=True, help='variant directory')
+    parser.add_argument('--width', type=int, default=DISPLAY_WIDTH,
+                        help=f'maximum variant width in pixels (default: {DISPLAY_WIDTH})')
+    parser.add_argument('--webp', action='store_true', help='also write a lossless WebP per figure')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only report changes')
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        print("⚠ Pillow not installed; HTML figures will not be optimised", file=sys.stderr)
+    manifest = build_variants(args.figures_dir, args.out_dir, args.width, args.webp)
+    changed = write_manifest(args.out_dir, manifest)
+    if changed or not args.quiet:
+        before = sum(e['bytes'] for e in manifest.values())
+        after = sum(e['variant_bytes'] for e in manifest.values())
+        print(f"{'✓' if changed else '·'} {args.out_dir}: {len(manifest)} figures, "
+              f"{before / 1024:.0f} KiB → {after / 1024:.0f} KiB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Parallel, dependency-aware document build orchestrator.
+
+Models the same pipeline as the Makefile's build_document factory as an
+explicit DAG, for every document:
+
+    adoc ──► flat ──► html ◄── images
+                 └──► docbook ──► tex ──► pdf
+                             └──► docx
+
+The flat stage resolves the include tree once (scripts/adoc_flatten.py);
+both asciidoctor backends read its output. The images stage builds the
+display-size figure variants the inlined HTML uses
+(scripts/optimize_images.py); the PDF and DOCX keep the print masters.
+
+Each document builds in its own work directory (build/<document>/), so
+tectonic intermediates and pandoc resource lookups never collide, and the
+finished html/pdf/docx are published to build/ under the same names the
+Makefile uses. PDFs are compiled through scripts/latex_cache.py, which
+skips the engine when the .tex and its figures are unchanged. The other
+converter stages are shared across checkouts through the artifact store
+(scripts/artifact_store.py). Independent stages run on a worker pool; a
+failed stage skips only its dependents. The run ends with a per-stage
+timing table and the critical path through the DAG.
+
+Usage: scripts/orchestrate.py [-j N] [--force] [document ...]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from artifact_store import open_store
+from atomic_file import temp_path
+from documents import COMMON_ADOC_ATTRS, COMMON_PANDOC_FLAGS, DOCUMENTS
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUILD_DIR = REPO_ROOT / "build"
+FIGURES_DIR = BUILD_DIR / "figures"  # where `make figures` renders the generated diagrams
+LATEX_TEMPLATE = REPO_ROOT / "latex" / "academic-template.tex"
+PDF_ENGINE = os.environ.get('PDF_ENGINE', 'tectonic')
+# Stages shared across checkouts through the artifact store; flat and images
+# have caches of their own, pdf goes through latex_cache.py
+STORED_KINDS = {'docbook', 'html', 'tex', 'docx'}
+# Stages that always run, as the Makefile runs them with FORCE: the tool keeps
+# its own dependency record (adoc_flatten.py's .deps.json follows includes out
+# of the document directory, e.g. ../CONSOLIDATED_REFERENCES.adoc) and leaves
+# its output untouched when nothing changed
+SELF_CHECKING_KINDS = {'flat'}
+
+# name: stage id ("<document>:<kind>"); deps: stage ids; inputs/outputs: Paths;
+# command: argv list; tool: executable that must exist; required: fail (rather
+# than skip) when the tool is missing; publish: output copied to build/.
+Stage = namedtuple('Stage', ['name', 'document', 'kind', 'deps', 'inputs', 'outputs',
+                             'command', 'tool', 'required', 'publish'])
+StageResult = namedtuple('StageResult', ['stage', 'status', 'start', 'end', 'detail'])
+
+
+def document_inputs(source):
+    """Files an AsciiDoc document may read: its directory's .adoc files and figures."""
+    doc_dir = source.parent
+    inputs = [source] + sorted(p for p in doc_dir.rglob('*.adoc') if p != source)
+    figures = doc_dir / 'figures'
+    if figures.is_dir():
+        inputs += sorted(p for p in figures.iterdir() if p.is_file())
+    return inputs
+
+
+def document_stages(document, config, build_dir=BUILD_DIR):
+    """The flat/images/html/docbook/tex/pdf/docx stages of one document."""
+    source = REPO_ROOT / config['source']
+    work = build_dir / document
+    adoc_attrs = config.get('adoc_attrs', COMMON_ADOC_ATTRS)
+    pandoc_flags = config.get('pandoc_flags', COMMON_PANDOC_FLAGS)
+    # The Makefile's $(1)_RESOURCE_PATH, with the document's work directory
+    # standing in for build/
+    resource_path = os.pathsep.join(str(p) for p in (source.parent, FIGURES_DIR / 'latex', work, REPO_ROOT))
+    inputs = document_inputs(source)
+
+    flat = work / f"{document}.adoc"
+    html_images = work / 'html-images'
+    images_manifest = html_images / '.manifest.json'
+    html = work / f"{document}.html"
+    docbook = work / f"{document}.xml"
+    tex = work / f"{document}.tex"
+    pdf = work / f"{document}.pdf"
+    docx = work / f"{document}.docx"
+
+    pdf_command = [sys.executable, str(REPO_ROOT / 'scripts' / 'latex_cache.py'), 'compile',
+                   '--engine', PDF_ENGINE, '--outdir', str(work), '--resource-path', resource_path,
+                   str(tex)]
+
+    def stage(kind, deps, stage_inputs, output, command, tool, required=True, publish=False):
+        return Stage(f"{document}:{kind}", document, kind, [f"{document}:{d}" for d in deps],
+                     stage_inputs, [output], command, tool, required, publish)
+
+    figures = [p for p in inputs if p.suffix != '.adoc']
+    base_dir = ['-B', str(source.parent)]
+
+    return [
+        stage('flat', [], inputs, flat,
+              [sys.executable, str(REPO_ROOT / 'scripts' / 'adoc_flatten.py'), '-q',
+               '-o', str(flat), str(source)],
+              sys.executable),
+        stage('images', [], figures, images_manifest,
+              [sys.executable, str(REPO_ROOT / 'scripts' / 'optimize_images.py'), '-q',
+               '-o', str(html_images), str(source.parent / 'figures')],
+              sys.executable),
+        stage('html', ['flat', 'images'], [flat, images_manifest], html,
+              ['asciidoctor', *adoc_attrs, *base_dir, '-a', f'imagesdir={html_images}',
+               '-o', str(html), str(flat)],
+              'asciidoctor', publish=True),
+        stage('docbook', ['flat'], [flat], docbook,
+              ['asciidoctor', *adoc_attrs, *base_dir, '-b', 'docbook', '-o', str(docbook), str(flat)],
+              'asciidoctor'),
+        stage('tex', ['docbook'], [docbook, LATEX_TEMPLATE], tex,
+              ['pandoc', str(docbook), '-f', 'docbook', '-t', 'latex',
+               f'--template={LATEX_TEMPLATE}', f'--resource-path={resource_path}',
+               *pandoc_flags, '-o', str(tex)],
+              'pandoc'),
+        stage('pdf', ['tex'], [tex], pdf, pdf_command, PDF_ENGINE,
+              required=False, publish=True),
+        stage('docx', ['docbook'], [docbook, source.parent / 'figures'], docx,
+              ['pandoc', str(docbook), '-f', 'docbook', '-t', 'docx',
+               f'--resource-path={resource_path}', '-o', str(docx)],
+              'pandoc', required=False, publish=True),
+    ]
+
+
+def is_fresh(stage):
+    """True if every output exists and is newer than every input."""
+    try:
+        oldest_output = min(p.stat().st_mtime_ns for p in stage.outputs)
+    except FileNotFoundError:
+        return False
+    newest_input = max((p.stat().st_mtime_ns for p in stage.inputs if p.exists()), default=0)
+    return oldest_output >= newest_input
+
+
+def publish(stage, build_dir=BUILD_DIR):
+    """Copy a finished output from the work dir to build/, atomically."""
+    for output in stage.outputs:
+        dest = build_dir / output.name
+        tmp = temp_path(dest)
+        try:
+            shutil.copy2(output, tmp)
+            os.replace(tmp, dest)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+def run_stage(stage, force=False, t0=0.0):
+    """Execute one stage; returns a StageResult (never raises)."""
+    start = time.perf_counter() - t0
+    if not force and stage.kind not in SELF_CHECKING_KINDS and is_fresh(stage):
+        return StageResult(stage, 'fresh', start, start, '')
+    if shutil.which(stage.tool) is None:
+        status = 'failed' if stage.required else 'skipped'
+        return StageResult(stage, status, start, start, f"{stage.tool} not installed")
+
+    store = open_store() if stage.kind in STORED_KINDS else None
+    try:
+        if store:
+            # The images manifest records mtimes; the variants themselves are the input
+            inputs = [p.parent if p.name == '.manifest.json' else p for p in stage.inputs]
+            key = store.key(stage.kind, stage.command, inputs, [stage.tool], base=REPO_ROOT)
+            outputs = {p.name: p for p in stage.outputs}
+            if store.fetch(key, outputs):
+                if stage.publish:
+                    publish(stage)
+                return StageResult(stage, 'stored', start, time.perf_counter() - t0, '')
+        for output in stage.outputs:
+            output.parent.mkdir(parents=True, exist_ok=True)
+        proc = subprocess.run(stage.command, cwd=REPO_ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return StageResult(stage, 'failed', start, time.perf_counter() - t0,
+                               (proc.stderr or proc.stdout).strip() or f"exit {proc.returncode}")
+        if store:
+            store.store(key, outputs, stage.kind)
+        if stage.publish:
+            publish(stage)
+    except OSError as e:
+        return StageResult(stage, 'failed', start, time.perf_counter() - t0, str(e))
+    return StageResult(stage, 'built', start, time.perf_counter() - t0, '')
+
+
+def schedule(stages, jobs, force=False, on_result=None):
+    """
+    Run ``stages`` respecting their dependencies on ``jobs`` worker threads.
+
+    A stage whose dependency failed or was skipped is itself skipped.
+    Returns {stage name: StageResult}.
+    """
+    by_name = {s.name: s for s in stages}
+    waiting = {s.name: set(s.deps) for s in stages}
+    results = {}
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        running = {}
+        while waiting or running:
+            ready = [n for n, deps in waiting.items() if deps <= set(results)]
+            if not ready and not running:
+                raise ValueError(f"unsatisfiable dependencies: {sorted(waiting)}")
+            for name in ready:
+                deps = waiting.pop(name)
+                blocked = [d for d in deps if results[d].status in ('failed', 'skipped')]
+                if blocked:
+                    now = time.perf_counter() - t0
+                    results[name] = StageResult(by_name[name], 'skipped', now, now,
+                                                f"dependency {blocked[0]} did not build")
+                    if on_result:
+                        on_result(results[name])
+                    continue
+                running[pool.submit(run_stage, by_name[name], force, t0)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                if on_result:
+                    on_result(results[name])
+    return results
+
+
+def critical_path(results):
+    """Longest chain of dependent stages by wall time, as a list of results."""
+    memo = {}
+
+    def longest(name):
+        if name not in memo:
+            result = results[name]
+            best = max((longest(d) for d in result.stage.deps),
+                       key=lambda chain: sum(r.end - r.start for r in chain), default=[])
+            memo[name] = best + [result]
+        return memo[name]
+
+    chains = [longest(name) for name in results]
+    return max(chains, key=lambda chain: sum(r.end - r.start for r in chain), default=[])
+
+
+def print_report(results):
+    print()
+    print(f"{'stage':<36} {'status':<8} {'start':>8} {'time':>8}")
+    print("-" * 63)
+    for result in sorted(results.values(), key=lambda r: (r.start, r.stage.name)):
+        print(f"{result.stage.name:<36} {result.status:<8} "
+              f"{result.start:7.2f}s {result.end - result.start:7.2f}s")
+    path = critical_path(results)
+    total = sum(r.end - r.start for r in path)
+    print("-" * 63)
+    print(f"Critical path ({total:.2f}s): " + " → ".join(r.stage.name for r in path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build all documents in parallel.")
+    parser.add_argument('documents', nargs='*', metavar='document',
+                        help=f"documents to build (default: all of {', '.join(DOCUMENTS)})")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='number of stages to run in parallel (default: CPU count)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='rebuild stages even if their outputs are up to date')
+    args = parser.parse_args(argv)
+    unknown = set(args.documents) - set(DOCUMENTS)
+    if unknown:
+        parser.error(f"unknown document(s): {', '.join(sorted(unknown))}")
+
+    stages = [stage for document in (args.documents or DOCUMENTS)
+              for stage in document_stages(document, DOCUMENTS[document])]
+
+    def on_result(result):
+        mark = {'built': '✓', 'fresh': '·', 'stored': '·', 'skipped': '⚠', 'failed': '✗'}[result.status]
+        line = f"{mark} {result.stage.name} {result.status}"
+        if result.detail:
+            line += f": {result.detail.splitlines()[-1]}"
+        print(line, flush=True)
+
+    results = schedule(stages, max(1, args.jobs), force=args.force, on_result=on_result)
+    print_report(results)
+    return 1 if any(r.status == 'failed' for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
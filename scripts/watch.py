@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Watch the sources and rebuild only what a change affects, with live preview.
+
+Polls the document directories and figures-source/ for changes, waits for
+a burst of edits to settle (``--debounce``), then maps the changed files
+to the smallest set of build steps:
+
+- a document's .adoc files (its master or anything it includes) rebuild
+  that document only, e.g. paper-research/sections/02_methods.adoc →
+  paper_research;
+- a figures/ file rebuilds the documents whose include tree embeds it;
+- a graphviz .dot file re-renders that diagram, then rebuilds the
+  documents embedding its output;
+- a .drawio file re-renders its PNG master in figures-source/png/, which
+  the next poll sees as a master change;
+- a master PNG or distribution.json runs the figure distribution, then
+  rebuilds the documents embedding its targets;
+- a figure script or scene change regenerates the build/figures outputs.
+
+Which documents a file affects comes from the dependency index
+(dep_index.py), refreshed incrementally before each build.
+
+Document builds go through the Makefile (``make <document>-html``, or every
+format with ``--all-formats``). Files written by the build itself are not
+fed back in as new changes.
+
+Figure regeneration goes through the warm render server
+(figures-source/scripts/render_server.py), started in the background
+unless ``--no-render-server`` is given, so it pays the matplotlib startup
+once per session rather than per change.
+
+With ``--serve`` the build directory is served on localhost and every HTML
+page gets a small script that reloads it when its document is rebuilt
+(server-sent events on /__reload).
+
+Usage: scripts/watch.py [--serve [--port N]] [--all-formats] [--debounce SECONDS] [--no-render-server]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from dep_index import DependencyIndex
+from documents import DOCUMENTS
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUILD_DIR = REPO_ROOT / "build"
+FIGURE_SCRIPTS = REPO_ROOT / "figures-source" / "scripts"
+PYTHON = sys.executable
+
+IGNORED_DIRS = {'.git', '.cache', 'build', '__pycache__'}
+
+RELOAD_SCRIPT = (b"<script>new EventSource('/__reload').onmessage = "
+                 b"e => { if (location.pathname.endsWith('/' + e.data + '.html')) location.reload(); };"
+                 b"</script>")
+
+
+def watch_roots():
+    """Directories to poll: every document directory and figures-source/."""
+    roots = {(REPO_ROOT / config['source']).parent for config in DOCUMENTS.values()}
+    roots.add(REPO_ROOT / "figures-source")
+    return sorted(roots) + [REPO_ROOT / "CONSOLIDATED_REFERENCES.adoc"]
+
+
+def snapshot(roots):
+    """{path: (mtime_ns, size)} for every file under ``roots``."""
+    files = {}
+    stack = list(roots)
+    while stack:
+        path = stack.pop()
+        try:
+            if path.is_file():
+                st = path.stat()
+                files[path] = (st.st_mtime_ns, st.st_size)
+                continue
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name in IGNORED_DIRS:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file():
+                st = entry.stat()
+                files[Path(entry.path)] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def changed_paths(before, after):
+    """Paths added, removed or modified between two snapshots."""
+    return {p for p in before.keys() | after.keys() if before.get(p) != after.get(p)}
+
+
+def plan(paths, index):
+    """
+    Map changed ``paths`` to build steps.
+
+    Returns (steps, documents): ``steps`` is a list of (label, argv) to run
+    before the document builds, in order; ``documents`` the set of
+    documents to rebuild.
+    """
+    steps = []
+    dot_files = sorted(p for p in paths if p.suffix == '.dot')
+    drawio_files = sorted(p for p in paths if p.suffix == '.drawio' and p.exists())
+    index.ensure_fresh()
+    documents, _ = index.affected(paths)
+
+    if dot_files:
+        steps.append(('graphviz', [PYTHON, str(FIGURE_SCRIPTS / 'generate_seagap_diagram.py'),
+                                   *map(str, dot_files)]))
+    if drawio_files:
+        steps.append(('drawio', [PYTHON, str(FIGURE_SCRIPTS / 'drawio_render.py'),
+                                 *map(str, drawio_files)]))
+    if any(p.parent.name == 'png' or p.name == 'distribution.json' for p in paths):
+        steps.append(('distribute', [PYTHON, str(FIGURE_SCRIPTS / 'distribute_figures.py')]))
+    if any(p.parent == FIGURE_SCRIPTS and p.suffix == '.py' for p in paths):
+        steps.append(('figures', ['make', 'figures']))
+    return steps, documents
+
+
+def run_steps(steps, documents, all_formats=False):
+    """Run the figure steps, then the document builds; return the documents built."""
+    for label, argv in steps:
+        print(f"→ {label}: {' '.join(argv[1:] if argv[0] == PYTHON else argv)}", flush=True)
+        if subprocess.run(argv, cwd=REPO_ROOT).returncode != 0:
+            print(f"✗ {label} failed", flush=True)
+
+    built = set()
+    for document in sorted(documents):
+        target = document if all_formats else f"{document}-html"
+        print(f"→ make {target}", flush=True)
+        start = time.perf_counter()
+        if subprocess.run(['make', target], cwd=REPO_ROOT).returncode == 0:
+            print(f"✓ {document} ({time.perf_counter() - start:.1f}s)", flush=True)
+            built.add(document)
+        else:
+            print(f"✗ {document} failed", flush=True)
+    return built
+
+
+class ReloadHub:
+    """Fan out 'document rebuilt' events to every connected preview page."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.events = []
+
+    def publish(self, documents):
+        with self.cond:
+            self.events.extend(documents)
+            self.cond.notify_all()
+
+    def wait(self, seen, timeout=15):
+        """Events after index ``seen``; an empty list on timeout (keepalive)."""
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.events) > seen, timeout)
+            return self.events[seen:]
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    hub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/__reload':
+            return self.stream_events()
+        path = Path(self.translate_path(self.path))
+        if path.suffix == '.html' and path.is_file():
+            body = path.read_bytes().replace(b'</body>', RELOAD_SCRIPT + b'</body>', 1)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+            return None
+        return super().do_GET()
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        seen = len(self.hub.events)
+        try:
+            while True:
+                events = self.hub.wait(seen)
+                seen += len(events)
+                payload = ''.join(f"data: {e}\n\n" for e in events) or ": keepalive\n\n"
+                self.wfile.write(payload.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve(hub, port):
+    """Serve build/ with live reload on a daemon thread; return the server."""
+    BUILD_DIR.mkdir(exist_ok=True)
+    handler = partial(type('Handler', (PreviewHandler,), {'hub': hub}), directory=str(BUILD_DIR))
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def generated_by(steps):
+    """Predicate for paths the given steps write, so they are not seen as edits."""
+    writes_figures = any(label in ('graphviz', 'drawio', 'distribute') for label, _ in steps)
+    return lambda path: writes_figures and path.parent.name == 'figures'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild affected documents when sources change.")
+    parser.add_argument('--interval', type=float, default=0.5, help='poll interval in seconds')
+    parser.add_argument('--debounce', type=float, default=0.3,
+                        help='quiet time after the last change before building (seconds)')
+    parser.add_argument('--all-formats', action='store_true',
+                        help='rebuild HTML, PDF and DOCX (default: HTML only)')
+    parser.add_argument('--serve', action='store_true', help='serve build/ with live reload')
+    parser.add_argument('--port', type=int, default=8000, help='preview port (default: 8000)')
+    parser.add_argument('--no-render-server', action='store_true',
+                        help='do not start the warm figure render server')
+    args = parser.parse_args(argv)
+
+    if not args.no_render_server:
+        # Detached with an idle timeout, so it outlives a restart of the watcher but not the session
+        subprocess.run([PYTHON, str(FIGURE_SCRIPTS / 'render_server.py'), 'serve', '--detach',
+                        '--idle-timeout', '3600'], cwd=REPO_ROOT)
+
+    hub = ReloadHub()
+    if args.serve:
+        server = serve(hub, args.port)
+        print(f"Preview: http://127.0.0.1:{server.server_address[1]}/")
+
+    roots = watch_roots()
+    index = DependencyIndex().ensure_fresh()
+    state = snapshot(roots)
+    print(f"Watching {len(state)} files under {len(roots)} roots (Ctrl-C to stop)", flush=True)
+
+    pending = set()
+    last_change = 0.0
+    try:
+        while True:
+            time.sleep(args.interval)
+            current = snapshot(roots)
+            changes = changed_paths(state, current)
+            state = current
+            if changes:
+                pending |= changes
+                last_change = time.monotonic()
+                continue
+            if not pending or time.monotonic() - last_change < args.debounce:
+                continue
+
+            steps, documents = plan(pending, index)
+            for path in sorted(pending):
+                print(f"• {path.relative_to(REPO_ROOT)}")
+            pending.clear()
+            if not steps and not documents:
+                continue
+            built = run_steps(steps, documents, args.all_formats)
+            if built:
+                hub.publish(sorted(built))
+
+            # Edits made while building are queued; the build's own figure writes are not
+            current = snapshot(roots)
+            ignore = generated_by(steps)
+            pending = {p for p in changed_paths(state, current) if not ignore(p)}
+            state = current
+            last_change = time.monotonic()
+    except KeyboardInterrupt:
+        print()
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Word counts for every document, following its include tree.
+
+Each master document is walked through its ``include::`` directives, and
+every file is counted in one streaming pass that understands enough
+AsciiDoc to count prose only: attribute entries, comments, block
+attributes, listing/literal/passthrough blocks, cross references, URLs
+and stem expressions are skipped; headings, list items, table cells,
+footnotes and link text are counted.
+
+Counts and include lists are cached per file in .cache/word-count.json,
+keyed by size and mtime (falling back to the SHA-256), so a rerun in an
+edit loop only stats the files. The report gives per-section counts and
+a total for each document, plus the content shared between documents
+(the same file, or byte-identical copies, counted in more than one).
+
+Usage: scripts/word_count.py [--json] [research|engineering|brief|agentic|both|all ...]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from adoc_flatten import INCLUDE_RE, parse_include_attrs, substitute, track_attribute
+from atomic_file import atomic_write
+from documents import DOCUMENTS
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_FILE = REPO_ROOT / ".cache" / "word-count.json"
+COUNT_VERSION = 1
+
+ALIASES = {
+    'research': ['paper_research'],
+    'engineering': ['paper_engineering'],
+    'brief': ['engineering_brief'],
+    'agentic': ['agentic-nondeterminism'],
+    'both': ['paper_research', 'paper_engineering'],
+    'all': list(DOCUMENTS),
+}
+
+JOURNAL_LIMITS = [
+    ("IEEE Software", "6,000-8,000"),
+    ("J. Biomed. Informatics", "~10,000"),
+    ("Software Practice & Experience", "8,000-10,000"),
+]
+
+# Delimited blocks whose content is not prose
+SKIPPED_BLOCK_RE = re.compile(r'^(-{4,}|\.{4,}|/{4,}|\+{4,}|```)\s*$')
+# Delimited blocks whose content is counted; the delimiter line itself is not
+COUNTED_BLOCK_RE = re.compile(r'^(={4,}|\*{4,}|_{4,}|\|={3,}|-{2})\s*$')
+
+SKIPPED_LINE_RE = re.compile(
+    r'^(?:'
+    r':!?[\w-]+!?:.*'                 # attribute entry
+    r'|//.*'                          # line comment
+    r'|\[.*\]'                        # block attributes / anchor
+    r"|<<<|'{3,}"                     # page / thematic break
+    r'|\w+::\S*\[.*\]'                # block macro (image::, toc::, include::)
+    r')$'
+)
+PREFIX_RE = re.compile(r'^(?:=+|\.(?=\S)|\s*(?:\*+|\.+|-|\d+\.|<\d+>)(?=\s))\s*')
+
+INLINE_DROPS = [
+    re.compile(r'<<[^>]*>>'),                                # cross reference / citation
+    re.compile(r'\[\[[^\]]*\]\]'),                           # inline anchor
+    re.compile(r'(?:stem|latexmath|asciimath):\[[^\]]*\]'),  # math
+    re.compile(r'\{[\w-]+\}'),                               # attribute reference
+    re.compile(r'\+\+\+.*?\+\+\+|pass:\w*\[[^\]]*\]'),        # passthrough
+]
+# Macros and links whose bracketed text is prose: keep the text, drop the target
+LINK_RE = re.compile(r'(?:(?:link|mailto|xref|footnote|kbd|btn|menu|image)):\S*?\[([^\]]*)\]'
+                     r'|(?:https?|ftp|file)://[^\s\[]+(?:\[([^\]]*)\])?')
+WORD_RE = re.compile(r"[^\W_]+(?:['’.\-][^\W_]+)*")
+
+
+def count_line(line):
+    """Words of prose in one line of ordinary (counted) AsciiDoc."""
+    for pattern in INLINE_DROPS:
+        line = pattern.sub(' ', line)
+    line = LINK_RE.sub(lambda m: f" {m.group(1) or m.group(2) or ''} ", line)
+    return len(WORD_RE.findall(line))
+
+
+def scan(path):
+    """
+    Count ``path`` in one pass.
+
+    Returns (words, includes, attributes): the file's own word count (not
+    counting included files), its include directives as [target, attrs]
+    pairs in order, and the attributes it defines.
+    """
+    words = 0
+    includes = []
+    attributes = {}
+    closing = None          # delimiter that ends the skipped block we are in
+    with open(path, encoding='utf-8') as f:
+        for raw in f:
+            line = raw.rstrip()
+            if closing is not None:
+                if line == closing:
+                    closing = None
+                continue
+            m = INCLUDE_RE.match(line)
+            if m and not m.group(1):
+                includes.append([m.group(2), parse_include_attrs(m.group(3))])
+                continue
+            if SKIPPED_BLOCK_RE.match(line):
+                closing = line
+                continue
+            if COUNTED_BLOCK_RE.match(line) or SKIPPED_LINE_RE.match(line):
+                track_attribute(line, attributes)
+                continue
+            line = PREFIX_RE.sub('', line).replace('|', ' ')
+            if line.endswith(' +'):
+                line = line[:-2]
+            words += count_line(line)
+    return words, includes, attributes
+
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CountCache:
+    """Per-file scan results, keyed by path and validated by size/mtime, then hash."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == COUNT_VERSION:
+                self.entries = data['files']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def get(self, path):
+        """The cache entry for ``path``: {'sha256', 'words', 'includes', 'attributes', ...}."""
+        key = str(path)
+        st = os.stat(path)
+        entry = self.entries.get(key)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry
+        digest = _digest(path)
+        if not (entry and entry['sha256'] == digest):
+            words, includes, attributes = scan(path)
+            entry = {'sha256': digest, 'words': words, 'includes': includes,
+                     'attributes': attributes}
+        entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, json.dumps({'version': COUNT_VERSION, 'files': self.entries}).encode())
+
+
+def count_document(source, cache):
+    """
+    Walk ``source``'s include tree through the cache.
+
+    Returns a list of {'path', 'words', 'sha256'} for every file in document
+    order (the master first), each counted once per inclusion.
+    """
+    parts = []
+    missing = []
+
+    def walk(path, attributes, stack):
+        entry = cache.get(path)
+        parts.append({'path': path, 'words': entry['words'], 'sha256': entry['sha256']})
+        attributes = {**attributes, **entry['attributes']}
+        for target, include_attrs in entry['includes']:
+            child = (path.parent / substitute(target, attributes)).resolve()
+            if child in stack or 'lines' in include_attrs or 'tag' in include_attrs:
+                continue
+            if not child.is_file():
+                missing.append(child)
+                continue
+            walk(child, attributes, stack | {child})
+
+    source = source.resolve()
+    walk(source, {}, {source})
+    for path in missing:
+        print(f"⚠ Warning: include not found: {_rel(path)}", file=sys.stderr)
+    return parts
+
+
+def shared_content(counts):
+    """Content counted in more than one document, grouped by content hash."""
+    by_hash = defaultdict(lambda: {'paths': set(), 'documents': set(), 'words': 0})
+    for document, parts in counts.items():
+        for part in parts:
+            group = by_hash[part['sha256']]
+            group['paths'].add(_rel(part['path']))
+            group['documents'].add(document)
+            group['words'] = part['words']
+    shared = [{'paths': sorted(g['paths']), 'documents': sorted(g['documents']), 'words': g['words']}
+              for g in by_hash.values() if len(g['documents']) > 1 and g['words']]
+    return sorted(shared, key=lambda g: g['paths'])
+
+
+def _rel(path):
+    try:
+        return str(Path(path).relative_to(REPO_ROOT))
+    except ValueError:
+        return str(path)
+
+
+def print_report(counts, shared):
+    for document, parts in counts.items():
+        print()
+        print(f"Word count for {document} ({_rel(parts[0]['path'])}):")
+        print("=" * 48)
+        for part in parts:
+            print(f"{Path(part['path']).stem:<38} {part['words']:6d} words")
+        print("=" * 48)
+        print(f"{'TOTAL':<38} {sum(p['words'] for p in parts):6d} words")
+
+    if shared:
+        print()
+        print("Shared content (counted in more than one document):")
+        print("=" * 48)
+        for group in shared:
+            name = Path(group['paths'][0]).stem
+            print(f"{name:<38} {group['words']:6d} words  ({', '.join(group['documents'])})")
+        print("=" * 48)
+        print(f"{'TOTAL':<38} {sum(g['words'] for g in shared):6d} words")
+
+    print()
+    print("Typical journal word limits:")
+    for journal, limit in JOURNAL_LIMITS:
+        print(f"  - {journal}: {limit}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count words in each document's include tree.")
+    parser.add_argument('documents', nargs='*', metavar='document',
+                        help=f"document names or aliases ({', '.join(ALIASES)}); default: both")
+    parser.add_argument('--json', action='store_true', help='print the counts as JSON')
+    args = parser.parse_args(argv)
+
+    names = []
+    for name in args.documents or ['both']:
+        if name not in ALIASES and name not in DOCUMENTS:
+            parser.error(f"unknown document: {name}")
+        names += [n for n in ALIASES.get(name, [name]) if n not in names]
+
+    cache = CountCache()
+    counts = {name: count_document(REPO_ROOT / DOCUMENTS[name]['source'], cache) for name in names}
+    cache.save()
+    shared = shared_content(counts)
+
+    if args.json:
+        report = {
+            'documents': {name: {'total': sum(p['words'] for p in parts),
+                                 'sections': [{'path': _rel(p['path']), 'words': p['words']}
+                                              for p in parts]}
+                          for name, parts in counts.items()},
+            'shared': shared,
+        }
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(counts, shared)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())